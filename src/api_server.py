@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import llm_client
+import llm_scheduler
+import metrics
+from tier1_engine import _analyze_chunk
+from tier1_store import get_default_store, profile_key
+from tier2_engine import SolalendarTier2
+from tier3_engine import SolalendarTier3
+
+# ---------------------------------------------------------
+# Headless JSON API (Tier 1 / 2 / 3)
+#   POST /v1/tier1          {"record": {name, year, month, day, hour, minute, lat?, lng?, tz_str?}}
+#   POST /v1/tier1/batch    {"records": [...]}
+#   POST /v1/tier2          {"anchor": {...}, "free_text": "..."}
+#   POST /v1/tier2/batch    {"items": [{"anchor": ..., "free_text": ...}, ...]}
+#   POST /v1/tier3          {"tier1": {...}, "tier2": {...}, "narrative": "llm" | "bank"}
+#   POST /v1/tier3/batch    {"items": [...]}
+#   GET  /healthz, GET /metrics (Prometheus)
+#
+#   Tier 1 はプロセスプール（CPU）、Tier 2/3 は 1 本のイベントループ上の async ワーカーで処理する。
+#   同じ入力のリクエストが同時に来たらエンジンは 1 回だけ動かし、結果を全員に返す。
+#   各 Tier の待ち行列は上限付きで、溢れたら 429 + Retry-After を返す。
+#   Tier 2/3 の LLM 呼び出しは llm_scheduler を通る。単発は interactive、batch は batch 優先度で、
+#   X-Session-Id ヘッダ（無ければ接続元アドレス）ごとに公平に順番が回る。
+#   API キーはサーバ側 (OPENAI_API_KEY)。空ならモック応答。
+#   python api_server.py --port 8080
+#   python api_server.py --stub        (ローカルのスタブ LLM サーバに向けて起動)
+# ---------------------------------------------------------
+TIER1_REQUIRED = ("year", "month", "day", "hour", "minute")
+TIER2_ANCHOR_REQUIRED = ("curiosity_score", "confidence_score", "action_score", "social_norm_flag", "primary_driver")
+MAX_BATCH = 1000
+RETRY_AFTER = 1
+
+logger = logging.getLogger("solalendar.api")
+
+
+class Overloaded(Exception):
+    """The lane's queue is full (-> 429)."""
+
+
+class BadRequest(Exception):
+    """Malformed request body (-> 400)."""
+
+
+class Lane:
+    """
+    Tier ごとの実行レーン（イベントループのスレッドからだけ触る）。
+    concurrency: 同時にエンジンを動かす数 / max_pending: 実行中 + 待ちの上限
+    """
+
+    def __init__(self, name, concurrency, max_pending):
+        self.name = name
+        self.max_pending = max_pending
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.inflight = {}  # key -> Future（同じ key の後続リクエストはこれを待つ）
+        self.pending = 0
+
+    def admit(self, keys):
+        """新たに走らせる必要のある key が上限を超えるなら Overloaded"""
+        new = sum(1 for k in set(keys) if k not in self.inflight)
+        if self.pending + new > self.max_pending:
+            metrics.REGISTRY.inc("solalendar_api_rejected_total", (("lane", self.name),), help_text="Requests rejected with 429")
+            raise Overloaded(f"{self.name} queue is full")
+
+    def run(self, key, factory):
+        future = self.inflight.get(key)
+        if future is not None:
+            metrics.REGISTRY.inc("solalendar_api_coalesced_total", (("lane", self.name),),
+                                 help_text="Requests served by an identical in-flight execution")
+            return future
+        self.pending += 1
+        future = self.inflight[key] = asyncio.ensure_future(self._run(key, factory))
+        return future
+
+    async def _run(self, key, factory):
+        try:
+            async with self.semaphore:
+                with metrics.span(f"api.{self.name}"):
+                    return await factory()
+        finally:
+            self.pending -= 1
+            del self.inflight[key]
+
+
+def _json_key(*parts):
+    return json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class ReadingService:
+    """エンジン呼び出しをまとめるサービス本体（HTTP とは独立に使える）"""
+
+    def __init__(self, api_key=None, tier1_workers=None, llm_concurrency=32, max_pending=256, store="default"):
+        self.api_key = os.environ.get("OPENAI_API_KEY", "") if api_key is None else api_key
+        self.tier1_workers = tier1_workers or os.cpu_count() or 1
+        self.store = get_default_store() if store == "default" else store
+        self.pool = ProcessPoolExecutor(max_workers=self.tier1_workers)
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="api-loop", daemon=True)
+        self._thread.start()
+
+        async def _lanes():
+            return {
+                "tier1": Lane("tier1", self.tier1_workers * 2, max_pending),
+                "tier2": Lane("tier2", llm_concurrency, max_pending),
+                "tier3": Lane("tier3", llm_concurrency, max_pending),
+            }
+        self.lanes = self.call(_lanes())
+
+        self.tier2 = SolalendarTier2(self.api_key)
+        self.tier3_llm = SolalendarTier3(self.api_key)
+        self.tier3_bank = SolalendarTier3(self.api_key, narrative="bank")
+
+    def call(self, coro, timeout=None):
+        """HTTP ハンドラのスレッドからループ上のコルーチンを実行して結果を待つ"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def close(self):
+        # ループを止める前に、このループで作った AsyncOpenAI の接続を閉じる
+        asyncio.run_coroutine_threadsafe(llm_client.aclose_async_clients(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.pool.shutdown()
+
+    # ---------------------------------------------------------
+    # Tier 1 (process pool)
+    # ---------------------------------------------------------
+    async def tier1_many(self, records, session=None, priority=llm_scheduler.INTERACTIVE):
+        for r in records:
+            _require(r, TIER1_REQUIRED, "record")
+        records = [{"name": "", **r} for r in records]  # name は表示用で計算には使わないので省略可
+        lane = self.lanes["tier1"]
+        keys = [profile_key(r) for r in records]
+        lane.admit(keys)
+        return await asyncio.gather(*(lane.run(k, lambda r=r: self._decode(r)) for k, r in zip(keys, records)))
+
+    async def _decode(self, record):
+        # ストアは同期 SQLite なので、ループを塞がないよう既定のスレッドプールで引く
+        loop = asyncio.get_running_loop()
+        if self.store is not None:
+            found = await loop.run_in_executor(None, self.store.get, record)
+            if found is not None:
+                return found
+        result = (await loop.run_in_executor(self.pool, _analyze_chunk, [record]))[0]
+        if self.store is not None:
+            await loop.run_in_executor(None, self.store.put, record, result)
+        return result
+
+    # ---------------------------------------------------------
+    # Tier 2 / Tier 3 (async LLM workers)
+    # ---------------------------------------------------------
+    async def tier2_many(self, items, session=None, priority=llm_scheduler.INTERACTIVE):
+        for item in items:
+            _require(item, (), "item")
+            _require(item.get("anchor") or {}, TIER2_ANCHOR_REQUIRED, "anchor")
+        lane = self.lanes["tier2"]
+        keys = [_json_key(item["anchor"], item.get("free_text", "")) for item in items]
+        lane.admit(keys)
+        with llm_scheduler.context(session=session, priority=priority):
+            return await asyncio.gather(*(
+                lane.run(k, lambda i=i: self.tier2.analyze_async(i["anchor"], i.get("free_text", "")))
+                for k, i in zip(keys, items)
+            ))
+
+    async def tier3_many(self, items, session=None, priority=llm_scheduler.INTERACTIVE):
+        for item in items:
+            _require(item, (), "item")
+            if not isinstance(item.get("tier1"), dict) or not isinstance(item.get("tier2"), dict):
+                raise BadRequest("tier3 items need 'tier1' and 'tier2' objects")
+            if item.get("narrative", "llm") not in ("llm", "bank"):
+                raise BadRequest("narrative must be 'llm' or 'bank'")
+        lane = self.lanes["tier3"]
+        keys = [_json_key(i["tier1"], i["tier2"], i.get("narrative", "llm")) for i in items]
+        lane.admit(keys)
+
+        def _factory(item):
+            engine = self.tier3_bank if item.get("narrative") == "bank" else self.tier3_llm
+            return engine.integrate_async(item["tier1"], item["tier2"])
+        with llm_scheduler.context(session=session, priority=priority):
+            return await asyncio.gather(*(lane.run(k, lambda i=i: _factory(i)) for k, i in zip(keys, items)))
+
+    def stats(self):
+        async def _stats():
+            return {name: {"pending": lane.pending, "inflight": len(lane.inflight)} for name, lane in self.lanes.items()}
+        return self.call(_stats())
+
+
+def _require(obj, keys, what):
+    if not isinstance(obj, dict):
+        raise BadRequest(f"{what} must be an object")
+    missing = [k for k in keys if k not in obj]
+    if missing:
+        raise BadRequest(f"{what} is missing {', '.join(missing)}")
+
+
+# ---------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------
+# path -> (method, body key, single?)
+ROUTES = {
+    "/v1/tier1": ("tier1_many", "record", True),
+    "/v1/tier1/batch": ("tier1_many", "records", False),
+    "/v1/tier2": ("tier2_many", None, True),
+    "/v1/tier2/batch": ("tier2_many", "items", False),
+    "/v1/tier3": ("tier3_many", None, True),
+    "/v1/tier3/batch": ("tier3_many", "items", False),
+}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    service = None  # make_server で束縛
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, obj, headers=()):
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            return self._send_json(200, {"status": "ok", "lanes": self.service.stats(),
+                                         "llm_scheduler": llm_scheduler.get_scheduler().status()})
+        if self.path == "/metrics":
+            data = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            return self.wfile.write(data)
+        self._send_json(404, {"error": f"Not found: {self.path}"})
+
+    def do_POST(self):
+        route = ROUTES.get(self.path)
+        if route is None:
+            return self._send_json(404, {"error": f"Not found: {self.path}"})
+        method, key, single = route
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if not isinstance(body, dict):
+                raise BadRequest("body must be a JSON object")
+            if single:
+                items = [body[key] if key else body]
+            else:
+                items = body.get(key)
+                if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH:
+                    raise BadRequest(f"'{key}' must be a list of 1-{MAX_BATCH} items")
+            session = self.headers.get("X-Session-Id") or self.client_address[0]
+            priority = llm_scheduler.INTERACTIVE if single else llm_scheduler.BATCH
+            results = self.service.call(getattr(self.service, method)(items, session, priority))
+        except (ValueError, KeyError, BadRequest) as e:
+            return self._send_json(400, {"error": str(e)})
+        except Overloaded as e:
+            return self._send_json(429, {"error": str(e)}, [("Retry-After", str(RETRY_AFTER))])
+        except Exception as e:
+            # エンジン側の想定外の失敗（swisseph / OpenAI / キャッシュ）でも応答は返す
+            logger.exception("%s failed", self.path)
+            metrics.REGISTRY.inc("solalendar_api_errors_total", (("path", self.path),), help_text="API requests failed with 500")
+            return self._send_json(500, {"error": f"Internal error: {type(e).__name__}"})
+        metrics.REGISTRY.inc("solalendar_api_requests_total", (("path", self.path),), help_text="API requests served")
+        self._send_json(200, {"result": results[0]} if single else {"results": results})
+
+
+class ApiHTTPServer(ThreadingHTTPServer):
+    # 既定の listen backlog (5) では同時接続が溢れ、429 を返す前に接続が待たされる
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def make_server(host="127.0.0.1", port=0, **service_kwargs):
+    """port=0 で空きポート。server.service.close() と server.shutdown() で止める"""
+    service = ReadingService(**service_kwargs)
+    handler = type("BoundApiHandler", (ApiHandler,), {"service": service})
+    server = ApiHTTPServer((host, port), handler)
+    server.service = service
+    return server
+
+
+def serve_in_background(**kwargs):
+    """(server, base_url) を返す"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solalendar headless JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--tier1-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--llm-concurrency", type=int, default=32, help="Concurrent LLM calls per tier")
+    parser.add_argument("--max-pending", type=int, default=256, help="Queue bound per tier before 429")
+    parser.add_argument("--stub", action="store_true", help="Start a local LLM stub server and use it")
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    api_key = None
+    if args.stub:
+        from llm_stub_server import serve_in_background as serve_stub
+        _, base_url = serve_stub(latency=args.stub_latency)
+        os.environ["OPENAI_BASE_URL"] = base_url
+        api_key = "stub"
+        print(f"LLM stub on {base_url}")
+
+    server = make_server(args.host, args.port, api_key=api_key, tier1_workers=args.tier1_workers,
+                         llm_concurrency=args.llm_concurrency, max_pending=args.max_pending)
+    print(f"API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,43 @@
 import streamlit as st
+import contextvars
 import json
-from tier1_engine import SolalendarTier1
-from tier2_engine import SolalendarTier2
-from tier3_engine import SolalendarTier3
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import llm_scheduler
+import metrics
+from app_views import APP_CSS, gap_text, tier1_html, wisdom_card_html
+from engine_loader import load_engine, parse_tiers, warm_up
 
 # ---------------------------------------------------------
 # UI Configuration
 # ---------------------------------------------------------
 st.set_page_config(page_title="Solalendar v4.3 Full", page_icon="🌌", layout="wide")
 
-st.markdown("""
-<style>
-    .layer-box { padding: 15px; border-radius: 10px; background-color: #1E1E1E; border: 1px solid #333; margin-bottom: 10px; }
-    .layer-title { font-size: 0.9em; color: #888; text-transform: uppercase; letter-spacing: 1px; }
-    .layer-value { font-size: 1.4em; font-weight: bold; color: #FFF; }
-    .highlight { color: #00ADB5; }
-    
-    .vals-card { background: linear-gradient(135deg, #2C3E50 0%, #000000 100%); padding: 20px; border-radius: 10px; border-left: 5px solid #F39C12; margin-bottom: 10px; }
-    .vals-type { font-size: 2em; font-weight: bold; color: #F39C12; }
-    
-    /* Tier 3 Wisdom Card */
-    .wisdom-card {
-        background: linear-gradient(135deg, #4b1d52 0%, #0f0c29 100%);
-        padding: 30px; border-radius: 15px; border: 1px solid #8e44ad;
-        text-align: center; margin-top: 20px;
-        box-shadow: 0 0 20px rgba(142, 68, 173, 0.4);
-    }
-    .wisdom-headline { font-size: 2.5em; font-weight: bold; background: -webkit-linear-gradient(#eee, #999); -webkit-background-clip: text; -webkit-text-fill-color: transparent; margin-bottom: 20px; }
-    .wisdom-text { font-size: 1.1em; line-height: 1.8; color: #E0E0E0; font-family: serif; font-style: italic; margin-bottom: 30px; }
-    .wisdom-advice { background-color: rgba(255,255,255,0.1); padding: 15px; border-radius: 8px; color: #00ADB5; font-weight: bold; display: inline-block; }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# 任意: SOLALENDAR_WARMUP="1,2" / "all" でエンジンを裏で先読み（プロセスごとに1回）
+@st.cache_resource
+def _start_warmup():
+    return warm_up(parse_tiers(os.environ.get("SOLALENDAR_WARMUP", "")))
+
+_start_warmup()
+
+# Tier 1 の結果は出生入力ごとに SQLite に保存し、再起動後・他レプリカとも共有する
+# （SOLALENDAR_PROFILE_PATH="" で無効）
+@st.cache_resource
+def _profile_store():
+    from tier1_store import get_default_store
+    return get_default_store()
+
+# 任意: SOLALENDAR_METRICS_LOG="info" / "debug" で計測イベントを JSON ログとして stderr に出す
+@st.cache_resource
+def _metrics_logging():
+    level = os.environ.get("SOLALENDAR_METRICS_LOG", "").upper()
+    return metrics.configure_json_logging(level) if level else None
+
+_metrics_logging()
 
 st.title("🌌 Solalendar Core v4.3")
 st.caption("Integrated Fate Architecture: Tier 1, 2 & 3")
@@ -38,6 +45,11 @@ st.caption("Integrated Fate Architecture: Tier 1, 2 & 3")
 # ---------------------------------------------------------
 # Sidebar
 # ---------------------------------------------------------
+@st.cache_resource
+def _timezones():
+    import pytz  # 一覧を出すときに初めて読む（起動時の import を増やさない）
+    return tuple(pytz.common_timezones)
+
 with st.sidebar:
     st.header("🔑 System Access")
     api_key = st.text_input("OpenAI API Key", type="password")
@@ -51,53 +63,146 @@ with st.sidebar:
     tc1, tc2 = st.columns(2)
     hour = tc1.number_input("Hour", 0, 23, 7)
     minute = tc2.number_input("Minute", 0, 59, 0)
+    # 出生地（既定は東京）。経緯度は Ascendant、タイムゾーンは UT 変換に使う
+    lc1, lc2 = st.columns(2)
+    lat = lc1.number_input("Latitude", -90.0, 90.0, 35.6895, format="%.4f")
+    lng = lc2.number_input("Longitude", -180.0, 180.0, 139.6917, format="%.4f")
+    tz_str = st.selectbox("Timezone", _timezones(), index=_timezones().index("Asia/Tokyo"))
     tier1_btn = st.button("Decode Tier 1 (PSC) 🚀", type="primary")
 
+# ---------------------------------------------------------
+# Engine calls (cached data layer)
+#   同じ入力ならエンジンに二度届かない。エラー（通信失敗など）はキャッシュしない。
+# ---------------------------------------------------------
+class _Uncached(Exception):
+    def __init__(self, result):
+        self.result = result
+
+def _uncached_errors(fn):
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except _Uncached as e:
+            return e.result
+    return wrapper
+
+@st.cache_data(ttl=3600, max_entries=1024, show_spinner=False)
+def _decode_tier1(birth):
+    # Layer 2 は現在の年に依存するので ttl で作り直す
+    store = _profile_store()
+    if store is not None:
+        return store.decode_many([birth])[0]
+    SolalendarTier1 = load_engine(1)
+    return SolalendarTier1(**birth).analyze()
+
+@_uncached_errors
+@st.cache_data(ttl=3600, max_entries=1024, show_spinner=False)
+def _run_tier2(api_key, anchor, text, scorer):
+    SolalendarTier2 = load_engine(2)
+    result = SolalendarTier2(api_key, scorer=scorer).analyze(anchor, text)
+    # ローカル採点は一瞬なので、次回 LLM の結果（裏でキャッシュ済み）を使えるよう保持しない
+    if "error" in result or (api_key and result.get("score_source") == "lexicon"):
+        raise _Uncached(result)
+    return result
+
+class _Tier3Results:
+    """完成した Tier 3 の結果（セッション＝スクリプトのスレッド間で共有するのでロックの中で触る）"""
+    MAX_ENTRIES = 512
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._results.get(key)
+
+    def put(self, key, wisdom):
+        with self._lock:
+            if key not in self._results and len(self._results) >= self.MAX_ENTRIES:
+                self._results.pop(next(iter(self._results)))  # 古いものから捨てる
+            self._results[key] = wisdom
+
+@st.cache_resource
+def _tier3_results():
+    # integrate_stream はジェネレータなので st.cache_data に載らない。完成した結果だけを共有する
+    return _Tier3Results()
+
+def _tier3_key(psc_data, tier2_result, narrative, has_key):
+    return json.dumps([psc_data, tier2_result, narrative, has_key], sort_keys=True, ensure_ascii=False, default=str)
+
+@st.cache_resource
+def _llm_wait_pool():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="app-llm")
+
+class _QueueStatus:
+    """
+    LLM の順番待ちの表示（on_queue）。ヘッジのプールなど別スレッドからも呼ばれるので、
+    そこでは最新の状態を覚えるだけにし、Streamlit にはスクリプトのスレッドからだけ描く。
+    """
+    def __init__(self, slot):
+        self.slot = slot
+        self._script_thread = threading.get_ident()
+        self._lock = threading.Lock()
+        self._status = None
+
+    def __call__(self, status):
+        with self._lock:
+            self._status = status
+        if threading.get_ident() == self._script_thread:
+            self.render()
+
+    def render(self):
+        with self._lock:
+            status, self._status = self._status, None
+        if status is not None:
+            eta = f" / ETA ~{status['eta_s']:.0f}s" if status['eta_s'] is not None else ""
+            self.slot.caption(f"⏳ Waiting for the LLM: #{status['position']} in queue{eta}")
+
+    def wait(self, fn, *args):
+        """fn を別スレッドで実行し、終わるまでスクリプトのスレッドで順番待ちを描き続ける"""
+        future = _llm_wait_pool().submit(contextvars.copy_context().run, fn, *args)
+        while True:
+            try:
+                return future.result(timeout=llm_scheduler.POLL_INTERVAL)
+            except FutureTimeout:
+                self.render()
+
+def _llm_context(queue):
+    # LLM の順番待ち中は順番と ETA を表示する（セッション間で公平に回る）
+    session = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+    return llm_scheduler.context(session=session, on_queue=queue)
+
+def _set_tier1(result):
+    st.session_state['psc_data'] = result
+    # レイヤーの HTML は結果ごとに一度だけ組み立てる
+    st.session_state['psc_html'] = None if "error" in result else tier1_html(result)
+
 # ---------------------------------------------------------
 # Tabs
+#   Tier 2 / Tier 3 は st.fragment なので、スライダーや入力欄を触っても
+#   そのタブだけが再実行される（サイドバーの入力だけがアプリ全体を再実行する）
 # ---------------------------------------------------------
 tab1, tab2, tab3 = st.tabs(["🧬 Tier 1: Nature", "🔭 Tier 2: Observation", "💎 Tier 3: Wisdom"])
 
 # --- TAB 1: Tier 1 (FIXED: All Layers 0-5 Restored) ---
 with tab1:
     if tier1_btn:
-        engine = SolalendarTier1(name, year, month, day, hour, minute)
-        st.session_state['psc_data'] = engine.analyze()
-        
+        birth = dict(name=name, year=year, month=month, day=day, hour=hour, minute=minute, lat=lat, lng=lng, tz_str=tz_str)
+        _set_tier1(_decode_tier1(birth))
+
     if 'psc_data' in st.session_state:
-        d = st.session_state['psc_data']
-        col_l, col_r = st.columns(2)
-        
-        with col_l:
-            # Layer 0 (Restored)
-            l0 = d['layer_0_kernel']
-            st.markdown(f"<div class='layer-box'><div class='layer-title'>Layer 0: Kernel</div><div class='layer-value'>{l0['jdn']:.2f} JDN</div></div>", unsafe_allow_html=True)
-
-            # Layer 1
-            l1 = d['layer_1_bios']
-            st.markdown(f"<div class='layer-box'><div class='layer-title'>Layer 1: BIOS</div><div class='layer-value'>LPN <span class='highlight'>{l1['lpn']}</span></div></div>", unsafe_allow_html=True)
-            
-            # Layer 2
-            l2 = d['layer_2_infra']
-            pin = l2['cycles'].get('pinnacle', {})
-            pin_html = f"<div style='margin-top:5px; border-left:3px solid #00ADB5; padding-left:10px; font-size:0.8em'>{pin.get('current_stage','-')}</div>" if pin else ""
-            st.markdown(f"<div class='layer-box'><div class='layer-title'>Layer 2: Infra</div><div class='layer-value'>{l2['cycles']['saturn_cycle']}</div>{pin_html}</div>", unsafe_allow_html=True)
-            
-        with col_r:
-            # Layer 3
-            l3 = d['layer_3_env']
-            st.markdown(f"<div class='layer-box'><div class='layer-title'>Layer 3: Env</div><div class='layer-value'>{l3['sun_sign']}</div></div>", unsafe_allow_html=True)
-            
-            # Layer 4 (Restored)
-            l4 = d['layer_4_runtime']
-            st.markdown(f"<div class='layer-box'><div class='layer-title'>Layer 4: Runtime</div><div class='layer-value'>{l4['eastern_root']}</div><div style='font-size:0.8em; color:#AAA'>Moon: {l4['moon_sign']} / Tone: {l4['texture']}</div></div>", unsafe_allow_html=True)
-            
-            # Layer 5
-            l5 = d['layer_5_skin']
-            st.markdown(f"<div class='layer-box'><div class='layer-title'>Layer 5: Skin</div><div class='layer-value'>{l5['ascendant']}</div></div>", unsafe_allow_html=True)
+        if st.session_state.get('psc_html'):
+            st.markdown(st.session_state['psc_html'], unsafe_allow_html=True)
+        else:
+            st.error(st.session_state['psc_data'].get('error'))
 
 # --- TAB 2: Tier 2 ---
-with tab2:
+SCORERS = {"LLM": "llm", "Hedged": "hedged", "Local": "lexicon"}
+DRIVER_MAP = {"Ideals (理想)": "Ideals", "Achievement (達成)": "Achievement", "Self-Expression (自己表現)": "Self-Expression"}
+
+@st.fragment
+def tier2_tab(api_key):
     with st.expander("📝 Assessment Form", expanded=True):
         col_q1, col_q2 = st.columns(2)
         with col_q1:
@@ -105,15 +210,25 @@ with tab2:
             q_confidence = st.slider("自信・自己効力感", 1, 5, 3)
             q_action = st.slider("行動力", 1, 5, 3)
             q_ryoshiki = st.checkbox("世間体・常識フィルター", value=True)
-            q_driver = st.selectbox("原動力", ["Ideals (理想)", "Achievement (達成)", "Self-Expression (自己表現)"])
-            driver_map = {"Ideals (理想)": "Ideals", "Achievement (達成)": "Achievement", "Self-Expression (自己表現)": "Self-Expression"}
+            q_driver = st.selectbox("原動力", list(DRIVER_MAP))
         with col_q2:
             q_text = st.text_area("最近の出来事・心情 (200文字程度)", height=200)
-            
+            scorer = st.radio("Big Five scoring", list(SCORERS), horizontal=True, index=1)
+
         if st.button("Run Tier 2 Diagnostics 🧠"):
-            t2_engine = SolalendarTier2(api_key)
-            anchor = {"curiosity_score": q_curiosity, "confidence_score": q_confidence, "action_score": q_action, "social_norm_flag": q_ryoshiki, "primary_driver": driver_map[q_driver]}
-            st.session_state['tier2_result'] = t2_engine.analyze(anchor, q_text)
+            anchor = {"curiosity_score": q_curiosity, "confidence_score": q_confidence, "action_score": q_action, "social_norm_flag": q_ryoshiki, "primary_driver": DRIVER_MAP[q_driver]}
+            # VALS（layer_7）はローカル計算なので LLM を待たずに表示できる
+            st.info(f"Motivation: {load_engine(2)(api_key).motivation(anchor)['vals_type']}")
+            queue = _QueueStatus(st.empty())
+            with st.spinner("Scoring Big Five..."), _llm_context(queue):
+                # hedged の LLM はヘッジのプールで順番を待つので、呼び出しごと別スレッドに出して表示はここで描く
+                result = queue.wait(_run_tier2, api_key, anchor, q_text, SCORERS[scorer])
+            queue.slot.empty()
+            first = 'tier2_result' not in st.session_state
+            st.session_state['tier2_result'] = result
+            if first and 'psc_data' in st.session_state:
+                # Tier 3 タブを「実行可能」にするため一度だけ全体を再実行する
+                st.rerun()
 
     if 'tier2_result' in st.session_state:
         res = st.session_state['tier2_result']
@@ -121,41 +236,95 @@ with tab2:
             l6 = res.get("layer_6_behavior", {})
             l7 = res.get("layer_7_motivation", {})
             st.success(f"Diagnosed: {l7.get('vals_type')} / {l6.get('dominant_element')}")
+            if res.get("score_source") == "lexicon":
+                st.caption("Big Five scored locally (lexicon estimate)")
             st.json(res)
+        else:
+            st.error(res['error'])
+
+with tab2:
+    tier2_tab(api_key)
 
 # --- TAB 3: Tier 3 ---
-with tab3:
+def _render_gap(slot, gap):
+    text = gap_text(gap)
+    if text:
+        slot.info(text)
+
+@st.fragment
+def tier3_tab(api_key):
     st.header("💎 The Integration")
     st.markdown("Tier 1（先天的運命）と Tier 2（後天的戦略）を統合し、構造的な解決策を提示します。")
-    
+
     # 実行条件のチェック
     ready = ('psc_data' in st.session_state) and ('tier2_result' in st.session_state)
-    
-    if ready:
-        if st.button("Generate Wisdom (Gap Analysis) ✨", type="primary"):
-            with st.spinner("Consulting the System Administrator of Fate..."):
-                t3_engine = SolalendarTier3(api_key)
-                wisdom = t3_engine.integrate(st.session_state['psc_data'], st.session_state['tier2_result'])
-                st.session_state['tier3_wisdom'] = wisdom
-        
-        if 'tier3_wisdom' in st.session_state:
-            w = st.session_state['tier3_wisdom']
-            if "error" in w:
-                st.error(w['error'])
-            else:
-                gap = w['gap_analysis']
-                msg = w['wisdom_message']
-                
-                # Gap Info
-                st.info(f"Analysis: Tier 1 [{gap['tier1_element']}] vs Tier 2 [{gap['tier2_element']}] = {gap['relationship_type']} (Stress: {gap['stress_level']})")
-                
-                # Wisdom Card
-                st.markdown(f"""
-                <div class="wisdom-card">
-                    <div class="wisdom-headline">{msg['headline']}</div>
-                    <div class="wisdom-text">{msg['narrative']}</div>
-                    <div class="wisdom-advice">💡 ACT: {msg['actionable_advice']}</div>
-                </div>
-                """, unsafe_allow_html=True)
-    else:
-        st.warning("⚠️ Please complete Tier 1 and Tier 2 analysis first.")
\ No newline at end of file
+    if not ready:
+        st.warning("⚠️ Please complete Tier 1 and Tier 2 analysis first.")
+        return
+
+    gap_slot = st.empty()
+    card_slot = st.empty()
+
+    use_bank = st.toggle("Instant narrative (no LLM)", value=not api_key)
+
+    if st.button("Generate Wisdom (Gap Analysis) ✨", type="primary"):
+        narrative = "bank" if use_bank else "llm"
+        key = _tier3_key(st.session_state['psc_data'], st.session_state['tier2_result'], narrative, bool(api_key))
+        results = _tier3_results()
+        wisdom = results.get(key)
+        if wisdom is None:
+            SolalendarTier3 = load_engine(3)
+            t3_engine = SolalendarTier3(api_key, narrative=narrative)
+            card_slot.markdown(wisdom_card_html({}, None), unsafe_allow_html=True)
+            # トークンが届くたびに、確定したフィールドから順に描画する
+            wisdom = {}
+            queue = _QueueStatus(st.empty())
+            with _llm_context(queue):
+                for wisdom, open_key in t3_engine.integrate_stream(st.session_state['psc_data'], st.session_state['tier2_result']):
+                    queue.slot.empty()
+                    if "error" in wisdom:
+                        break
+                    _render_gap(gap_slot, wisdom.get('gap_analysis', {}))
+                    card_slot.markdown(wisdom_card_html(wisdom.get('wisdom_message', {}), open_key), unsafe_allow_html=True)
+            if "error" not in wisdom:
+                results.put(key, wisdom)
+        st.session_state['tier3_wisdom'] = wisdom
+        st.session_state['tier3_html'] = None if "error" in wisdom else wisdom_card_html(wisdom['wisdom_message'], None)
+
+    if 'tier3_wisdom' in st.session_state:
+        w = st.session_state['tier3_wisdom']
+        if "error" in w:
+            st.error(w['error'])
+        else:
+            _render_gap(gap_slot, w['gap_analysis'])
+            card_slot.markdown(st.session_state['tier3_html'], unsafe_allow_html=True)
+
+with tab3:
+    tier3_tab(api_key)
+
+# ---------------------------------------------------------
+# Debug Panel (sidebar, optional)
+#   スクリプトの最後に描くので、今回の実行で記録した計測も含まれる
+# ---------------------------------------------------------
+with st.sidebar:
+    st.divider()
+    if st.toggle("🛠 Debug metrics", value=False):
+        snap = metrics.snapshot()
+        if snap["spans"]:
+            st.caption("Spans (ms)")
+            st.dataframe(
+                [{"span": k, "count": v["count"], "avg": round(v["avg_ms"], 3), "total": round(v["total_ms"], 1)}
+                 for k, v in sorted(snap["spans"].items())],
+                hide_index=True,
+            )
+        if snap["llm"]:
+            st.caption("LLM calls (ms)")
+            st.dataframe(
+                [{"operation": k, "count": v["count"], "avg": round(v["avg_ms"], 1)} for k, v in sorted(snap["llm"].items())],
+                hide_index=True,
+            )
+        st.json({k: v for k, v in sorted(snap["counters"].items())}, expanded=False)
+        with st.expander("Prometheus"):
+            st.code(metrics.render_prometheus(), language="text")
+        with st.expander("Recent events"):
+            st.code("\n".join(json.dumps(e, ensure_ascii=False) for e in reversed(snap["recent"][-20:])), language="json")
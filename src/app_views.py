@@ -0,0 +1,79 @@
+import html
+
+# ---------------------------------------------------------
+# Static markup for app.py
+#   app.py はウィジェット操作のたびに再実行されるが、このモジュールは
+#   一度だけ import される。CSS と HTML の組み立てはここに置き、
+#   結果ごとに一度だけ作って session_state に持たせる。
+# ---------------------------------------------------------
+APP_CSS = """
+<style>
+    .layer-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 0 16px; }
+    .layer-box { padding: 15px; border-radius: 10px; background-color: #1E1E1E; border: 1px solid #333; margin-bottom: 10px; }
+    .layer-title { font-size: 0.9em; color: #888; text-transform: uppercase; letter-spacing: 1px; }
+    .layer-value { font-size: 1.4em; font-weight: bold; color: #FFF; }
+    .highlight { color: #00ADB5; }
+
+    .vals-card { background: linear-gradient(135deg, #2C3E50 0%, #000000 100%); padding: 20px; border-radius: 10px; border-left: 5px solid #F39C12; margin-bottom: 10px; }
+    .vals-type { font-size: 2em; font-weight: bold; color: #F39C12; }
+
+    /* Tier 3 Wisdom Card */
+    .wisdom-card {
+        background: linear-gradient(135deg, #4b1d52 0%, #0f0c29 100%);
+        padding: 30px; border-radius: 15px; border: 1px solid #8e44ad;
+        text-align: center; margin-top: 20px;
+        box-shadow: 0 0 20px rgba(142, 68, 173, 0.4);
+    }
+    .wisdom-headline { font-size: 2.5em; font-weight: bold; background: -webkit-linear-gradient(#eee, #999); -webkit-background-clip: text; -webkit-text-fill-color: transparent; margin-bottom: 20px; }
+    .wisdom-text { font-size: 1.1em; line-height: 1.8; color: #E0E0E0; font-family: serif; font-style: italic; margin-bottom: 30px; }
+    .wisdom-advice { background-color: rgba(255,255,255,0.1); padding: 15px; border-radius: 8px; color: #00ADB5; font-weight: bold; display: inline-block; }
+</style>
+"""
+
+
+def _box(title, value, extra=""):
+    return f"<div class='layer-box'><div class='layer-title'>{title}</div><div class='layer-value'>{value}</div>{extra}</div>"
+
+
+def tier1_html(d):
+    """Layer 0-5 のボックス（左: 0-2 / 右: 3-5）を 1 つの HTML にまとめる"""
+    esc = lambda v: html.escape(str(v))
+    l0, l1, l2 = d['layer_0_kernel'], d['layer_1_bios'], d['layer_2_infra']
+    l3, l4, l5 = d['layer_3_env'], d['layer_4_runtime'], d['layer_5_skin']
+    pin = l2['cycles'].get('pinnacle', {})
+    pin_html = f"<div style='margin-top:5px; border-left:3px solid #00ADB5; padding-left:10px; font-size:0.8em'>{esc(pin.get('current_stage', '-'))}</div>" if pin else ""
+    left = (
+        _box("Layer 0: Kernel", f"{l0['jdn']:.2f} JDN")
+        + _box("Layer 1: BIOS", f"LPN <span class='highlight'>{esc(l1['lpn'])}</span>")
+        + _box("Layer 2: Infra", esc(l2['cycles']['saturn_cycle']), pin_html)
+    )
+    right = (
+        _box("Layer 3: Env", esc(l3['sun_sign']))
+        + _box("Layer 4: Runtime", esc(l4['eastern_root']),
+               f"<div style='font-size:0.8em; color:#AAA'>Moon: {esc(l4['moon_sign'])} / Tone: {esc(l4['texture'])}</div>")
+        + _box("Layer 5: Skin", esc(l5['ascendant']))
+    )
+    return f"<div class='layer-grid'><div>{left}</div><div>{right}</div></div>"
+
+
+def gap_text(gap):
+    """gap が揃っていれば 1 行の要約、まだなら None"""
+    keys = ('tier1_element', 'tier2_element', 'relationship_type', 'stress_level')
+    if all(gap.get(k) for k in keys):
+        return f"Analysis: Tier 1 [{gap['tier1_element']}] vs Tier 2 [{gap['tier2_element']}] = {gap['relationship_type']} (Stress: {gap['stress_level']})"
+    return None
+
+
+def wisdom_card_html(msg, open_key):
+    # headline は完成してから、narrative / advice は届いた分だけ表示（LLM の出力なのでエスケープ）
+    headline = msg.get('headline') if open_key != 'headline' else None
+    headline = html.escape(str(headline)) if headline else None
+    narrative = html.escape(str(msg.get('narrative') or ""))
+    advice = html.escape(str(msg.get('actionable_advice') or ""))
+    return f"""
+    <div class="wisdom-card">
+        <div class="wisdom-headline">{headline or "Consulting the System Administrator of Fate..."}</div>
+        <div class="wisdom-text">{narrative}</div>
+        {f'<div class="wisdom-advice">💡 ACT: {advice}</div>' if advice else ''}
+    </div>
+    """
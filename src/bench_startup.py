@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# ---------------------------------------------------------
+# Cold-Start Benchmark
+#   python bench_startup.py [--runs 5] [--json]
+#   1) 各モジュールの import 時間（毎回新しいプロセスで計測）
+#   2) app.py の初回レンダリングまでの時間（streamlit AppTest）
+#   3) Tier 1 だけを使ったときに openai が読み込まれていないか
+# ---------------------------------------------------------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = [
+    "streamlit", "pytz", "swisseph", "lunar_python", "kerykeion", "openai", "numpy",
+    "engine_loader", "tier1_engine", "tier2_engine", "tier3_engine",
+]
+
+_IMPORT_SNIPPET = """
+import time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+"""
+
+_RENDER_SNIPPET = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+t = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120).run()
+first_render = time.perf_counter() - t
+tier1_click = None
+if {click_tier1}:
+    t = time.perf_counter()
+    at.sidebar.button[0].click().run()
+    tier1_click = time.perf_counter() - t
+print(json.dumps({{"first_render": first_render, "tier1_click": tier1_click,
+                  "openai_loaded": "openai" in sys.modules, "kerykeion_loaded": "kerykeion" in sys.modules}}))
+"""
+
+
+def _run_python(code):
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, check=True,
+    )
+    return out.stdout.strip().splitlines()[-1]
+
+
+def measure_imports(runs):
+    results = {}
+    for module in MODULES:
+        samples = [float(_run_python(_IMPORT_SNIPPET.format(module=module))) for _ in range(runs)]
+        results[module] = {"median_ms": statistics.median(samples) * 1000, "min_ms": min(samples) * 1000}
+    return results
+
+
+def measure_render(runs, click_tier1=True):
+    samples = [json.loads(_run_python(_RENDER_SNIPPET.format(click_tier1=click_tier1))) for _ in range(runs)]
+    report = {"first_render_ms": statistics.median(s["first_render"] for s in samples) * 1000}
+    if click_tier1:
+        report["tier1_click_ms"] = statistics.median(s["tier1_click"] for s in samples) * 1000
+        report["openai_loaded_after_tier1"] = any(s["openai_loaded"] for s in samples)
+        report["kerykeion_loaded_after_tier1"] = any(s["kerykeion_loaded"] for s in samples)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solalendar cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--skip-render", action="store_true", help="Only measure imports")
+    args = parser.parse_args(argv)
+
+    report = {"imports": measure_imports(args.runs)}
+    if not args.skip_render:
+        report["render"] = measure_render(args.runs)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("== Import time (fresh process, median) ==")
+    for module, r in report["imports"].items():
+        print(f"  {module:16s} {r['median_ms']:8.1f} ms")
+    if "render" in report:
+        r = report["render"]
+        print("== App ==")
+        print(f"  first render      {r['first_render_ms']:8.1f} ms")
+        print(f"  tier1 decode      {r['tier1_click_ms']:8.1f} ms (incl. lazy engine import)")
+        print(f"  openai loaded after Tier 1 only: {r['openai_loaded_after_tier1']}")
+        print(f"  kerykeion loaded after Tier 1 only: {r['kerykeion_loaded_after_tier1']}")
+
+
+if __name__ == "__main__":
+    main()
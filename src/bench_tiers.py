@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+# ---------------------------------------------------------
+# Tier Benchmark Suite
+#   python bench_tiers.py [--quick] [-o report.json]
+#   python bench_tiers.py --save-baseline bench_baseline.json
+#   python bench_tiers.py --baseline bench_baseline.json --threshold 0.25   (遅くなったら exit 1)
+#
+#   Tier 1: JDN / numerology / chart (swisseph, kerykeion) / lunar (table, lunar_python) /
+#           analyze 単発 / analyze_many バッチ / numerology 列計算
+#   Tier 2/3: ローカルのスタブ LLM サーバ（遅延・エラー率を指定）に対して
+#           analyze / integrate を逐次と並行(async)で計測
+#   指標はすべて「小さいほど良い」時間 (*_us / *_ms)。比較対象はこの指標だけ。
+# ---------------------------------------------------------
+SEED = 7
+
+
+def _birth_records(n, seed=SEED):
+    rng = random.Random(seed)
+    zones = ("Asia/Tokyo", "America/New_York", "Europe/London", "Australia/Sydney", "Asia/Kolkata")
+    return [
+        {"name": f"user{i}", "year": rng.randint(1930, 2015), "month": rng.randint(1, 12), "day": rng.randint(1, 28),
+         "hour": rng.randint(0, 23), "minute": rng.randint(0, 59),
+         "lat": round(rng.uniform(-45, 60), 4), "lng": round(rng.uniform(-120, 150), 4), "tz_str": rng.choice(zones)}
+        for i in range(n)
+    ]
+
+
+def _time_per_op(fn, items, repeat):
+    """items を一巡する処理を repeat 回計り、最速回の 1 件あたり µs を返す"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e6
+
+
+# ---------------------------------------------------------
+# Tier 1
+# ---------------------------------------------------------
+def bench_tier1(n, repeat, batch_n, workers):
+    from lunar_python import Solar
+    from tier1_chart import compute_chart, julian_day_ut
+    from tier1_engine import SolalendarTier1
+    from tier1_lunar import get_table as get_lunar_table
+    from tier1_numerology import life_path, numerology_columns, pinnacles
+    from tier1_tz import local_to_utc
+
+    records = _birth_records(n)
+    engines = [SolalendarTier1(**r) for r in records]
+    jds = [e.jul_day_ut for e in engines]
+    lunar_table = get_lunar_table(build=True)
+
+    def jdn(r):
+        julian_day_ut(local_to_utc(r["tz_str"], r["year"], r["month"], r["day"], r["hour"], r["minute"]))
+
+    def numerology(r):
+        pinnacles(r["year"], r["month"], r["day"], life_path(r["year"], r["month"], r["day"]))
+
+    def chart(i):
+        compute_chart(jds[i], records[i]["lat"], records[i]["lng"], points=("Sun", "Moon"), ascendant=True)
+
+    def kerykeion_chart(e):
+        e.chart_mode = "kerykeion"
+        e._get_planetary_layers()
+
+    def lunar_lookup(r):
+        lunar_table.day_info(r["year"], r["month"], r["day"])
+
+    def lunar_python(r):
+        lunar = Solar.fromYmd(r["year"], r["month"], r["day"]).getLunar()
+        lunar.getDayInGanZhi(), lunar.getDayNaYin(), lunar.getMonth(), lunar.getDay()
+
+    # import と初回の初期化（kerykeion / lunar_python）は計測の外で済ませる
+    kerykeion_chart(SolalendarTier1(**records[0]))
+    lunar_python(records[0])
+
+    report = {
+        "jdn_us": _time_per_op(jdn, records, repeat),
+        "numerology_us": _time_per_op(numerology, records, repeat),
+        "chart_swisseph_us": _time_per_op(chart, range(n), repeat),
+        "chart_kerykeion_us": _time_per_op(kerykeion_chart, [SolalendarTier1(**r) for r in records[:max(n // 10, 10)]], 1),
+        "lunar_table_us": _time_per_op(lunar_lookup, records, repeat),
+        "lunar_python_us": _time_per_op(lunar_python, records[:max(n // 10, 10)], 1),
+        "analyze_single_us": _time_per_op(lambda r: SolalendarTier1(**r).analyze(), records, repeat),
+    }
+
+    batch = _birth_records(batch_n, seed=SEED + 1)
+    start = time.perf_counter()
+    list(SolalendarTier1.analyze_many(batch, workers=1))
+    report["analyze_batch_serial_us"] = (time.perf_counter() - start) / batch_n * 1e6
+    if workers > 1:
+        start = time.perf_counter()
+        list(SolalendarTier1.analyze_many(batch, workers=workers))
+        report["analyze_batch_pool_us"] = (time.perf_counter() - start) / batch_n * 1e6
+
+    import numpy as np
+    cols = [np.array([r[k] for r in batch]) for k in ("year", "month", "day")]
+    ages = 2026 - cols[0]
+    numerology_columns(*cols, ages)  # 表の準備
+    report["numerology_columns_us"] = _time_per_op(lambda _: numerology_columns(*cols, ages), [None], repeat) / batch_n
+    return report
+
+
+# ---------------------------------------------------------
+# Tier 2 / 3 (stub LLM server)
+# ---------------------------------------------------------
+ANCHOR = {"curiosity_score": 4, "confidence_score": 3, "action_score": 4, "social_norm_flag": True, "primary_driver": "Achievement"}
+
+
+def _summary(samples, prefix):
+    samples = sorted(samples)
+    return {
+        f"{prefix}_p50_ms": statistics.median(samples) * 1000,
+        f"{prefix}_p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+    }
+
+
+def bench_llm(calls, concurrency, latency, jitter, error_rate, error_status):
+    from llm_stub_server import serve_in_background
+    server, base_url = serve_in_background(latency=latency, jitter=jitter, error_rate=error_rate,
+                                           error_status=error_status, seed=SEED)
+    os.environ["OPENAI_BASE_URL"] = base_url  # OpenAI クライアントはこの環境変数を読む
+    try:
+        from llm_client import run_async
+        from tier1_engine import SolalendarTier1
+        from tier2_engine import SolalendarTier2
+        from tier3_engine import SolalendarTier3
+
+        api_key = f"bench-{os.getpid()}"  # ベンチ専用の breaker / client
+        tier2 = SolalendarTier2(api_key, cache=False)
+        tier3 = SolalendarTier3(api_key, cache=False)
+        tier1_data = SolalendarTier1(**_birth_records(1)[0]).analyze()
+
+        # クライアント生成・接続確立は計測の外で
+        tier2.analyze(ANCHOR, "warm-up")
+
+        report, errors = {}, 0
+        samples, tier2_results = [], []
+        for i in range(calls):
+            start = time.perf_counter()
+            result = tier2.analyze(ANCHOR, f"benchmark free text #{i}")
+            samples.append(time.perf_counter() - start)
+            errors += "error" in result
+            tier2_results.append(result)
+        report.update(_summary(samples, "tier2_analyze"))
+
+        samples = []
+        ok = [r for r in tier2_results if "error" not in r] or [tier2._local("", tier2.motivation(ANCHOR), "no_key")]
+        for i in range(calls):
+            start = time.perf_counter()
+            result = tier3.integrate(tier1_data, ok[i % len(ok)])
+            samples.append(time.perf_counter() - start)
+            errors += "error" in result
+        report.update(_summary(samples, "tier3_integrate"))
+
+        async def _concurrent():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def _one(i):
+                async with semaphore:
+                    return await tier2.analyze_async(ANCHOR, f"benchmark concurrent text #{i}")
+
+            await _one(-1)  # AsyncOpenAI はループごとに作られるので同じループで温める
+            start = time.perf_counter()
+            results = await asyncio.gather(*(_one(i) for i in range(calls)))
+            return results, time.perf_counter() - start
+
+        results, elapsed = run_async(_concurrent())
+        report["tier2_async_total_ms"] = elapsed * 1000
+        errors += sum("error" in r for r in results)
+
+        state = server.RequestHandlerClass.state
+        info = {"requests": state.stats["completions"], "injected_errors": state.stats["errors"], "failed_results": errors}
+        return report, info
+    finally:
+        server.shutdown()
+
+
+# ---------------------------------------------------------
+# Baseline
+# ---------------------------------------------------------
+def compare(metrics, baseline, threshold):
+    """threshold (0.25 = 25%) を超えて遅くなった指標の一覧"""
+    regressions = []
+    for name, value in metrics.items():
+        base = baseline.get(name)
+        if base and value > base * (1 + threshold):
+            regressions.append({"metric": name, "baseline": base, "current": value, "ratio": value / base})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solalendar tier benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Small sample sizes (smoke run)")
+    parser.add_argument("--n", type=int, default=2000, help="Records for per-stage timings")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=5000, help="Records for the batch timings")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--skip-llm", action="store_true")
+    parser.add_argument("--llm-calls", type=int, default=50)
+    parser.add_argument("--llm-concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub seconds per completion")
+    parser.add_argument("--llm-jitter", type=float, default=0.01)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-status", type=int, default=500)
+    parser.add_argument("-o", "--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="Write the metrics as a new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.n, args.repeat, args.batch, args.llm_calls = 200, 1, 500, 10
+
+    metrics = {f"tier1.{k}": v for k, v in bench_tier1(args.n, args.repeat, args.batch, args.workers).items()}
+    report = {"python": sys.version.split()[0], "config": vars(args), "metrics": metrics}
+    if not args.skip_llm:
+        llm, info = bench_llm(args.llm_calls, args.llm_concurrency, args.llm_latency, args.llm_jitter,
+                              args.llm_error_rate, args.llm_error_status)
+        metrics.update({f"llm.{k}": v for k, v in llm.items()})
+        report["llm_stub"] = info
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(metrics, baseline.get("metrics", baseline), args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"metrics": metrics}, f, indent=2)
+
+    for r in report.get("regressions", []):
+        print(f"REGRESSION {r['metric']}: {r['baseline']:.2f} -> {r['current']:.2f} ({r['ratio']:.2f}x)", file=sys.stderr)
+    if report.get("regressions"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import importlib
+import threading
+
+# ---------------------------------------------------------
+# Lazy Engine Loader
+#   app.py からは各 Tier を最初に使う時点で import する。
+#   重い依存（kerykeion / lunar_python / openai ...）の読み込みを
+#   サイドバー表示より後ろに回すためのもの。
+# ---------------------------------------------------------
+TIERS = {
+    1: ("tier1_engine", "SolalendarTier1"),
+    2: ("tier2_engine", "SolalendarTier2"),
+    3: ("tier3_engine", "SolalendarTier3"),
+}
+
+# 各 Tier が実行時に必要とする重い依存（ウォームアップ対象）
+TIER_DEPENDENCIES = {
+    1: ("pytz", "swisseph", "tier1_chart", "tier1_lunar", "tier1_tz"),
+    2: ("openai",),
+    3: ("openai",),
+}
+
+_lock = threading.Lock()
+
+
+def load_engine(tier):
+    """Tier 番号からエンジンクラスを返す（初回のみ import が走る）"""
+    module_name, class_name = TIERS[tier]
+    with _lock:
+        module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+
+def parse_tiers(spec):
+    """'1,2' / 'all' / '' -> (1, 2) / (1, 2, 3) / ()"""
+    spec = (spec or "").strip().lower()
+    if spec in ("", "off"):
+        return ()
+    if spec == "all":
+        return tuple(TIERS)
+    return tuple(int(t) for t in spec.split(",") if t.strip())
+
+
+def warm_up(tiers, background=True):
+    """
+    指定 Tier のエンジンと依存をバックグラウンドで先読みする。
+    Returns the started thread (or None when nothing to do / run inline).
+    """
+    def _run():
+        for tier in tiers:
+            for dep in TIER_DEPENDENCIES[tier]:
+                with _lock:
+                    importlib.import_module(dep)
+            load_engine(tier)
+
+    if not tiers:
+        return None
+    if not background:
+        _run()
+        return None
+    thread = threading.Thread(target=_run, name="solalendar-warmup", daemon=True)
+    thread.start()
+    return thread
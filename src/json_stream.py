@@ -0,0 +1,94 @@
+import json
+import re
+
+# ---------------------------------------------------------
+# Incremental JSON parser for streamed LLM completions
+#   トークン単位で届く JSON 文字列を「いま閉じれば有効な JSON」に補完して
+#   途中経過の dict を返す。書きかけの文字列フィールド名も返すので、
+#   UI 側は完成済みのフィールドだけを確定表示できる。
+# ---------------------------------------------------------
+_OPEN_KEY = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*$')
+
+
+class PartialJSONParser:
+    def __init__(self):
+        self.buffer = ""
+        self.value = {}
+        self.open_key = None
+
+    def feed(self, delta):
+        """delta を追加し (partial_value, open_key) を返す。open_key は書きかけの文字列値のキー"""
+        self.buffer += delta or ""
+        value, open_key = parse_partial(self.buffer)
+        if value is not None:
+            self.value, self.open_key = value, open_key
+        return self.value, self.open_key
+
+    def result(self):
+        """ストリーム終了後の最終値（壊れていれば ValueError）"""
+        return json.loads(self.buffer)
+
+
+def parse_partial(text):
+    stack = []
+    in_string = False
+    escaped = False
+    string_start = 0
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            string_start = i
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if not stack and not in_string:
+        try:
+            return json.loads(text), None
+        except ValueError:
+            return None, None
+
+    candidate = text
+    open_key = None
+    if in_string:
+        head = text[:string_start]
+        match = _OPEN_KEY.search(head)
+        if match:
+            # 値の文字列を書いている途中 -> 閉じて途中経過として見せる
+            open_key = match.group(1)
+            if escaped:
+                candidate = candidate[:-1]
+            candidate += '"'
+        elif head.rstrip().endswith(("{", ",")):
+            # キー名を書いている途中 -> まだ無かったことにする
+            candidate = head
+        else:
+            # 配列内の文字列など
+            if escaped:
+                candidate = candidate[:-1]
+            candidate += '"'
+
+    candidate = candidate.rstrip()
+    if candidate.endswith(","):
+        candidate = candidate[:-1]
+    elif candidate.endswith(":"):
+        candidate += "null"
+    closing = "".join(reversed(stack))
+
+    # 閉じ方の候補を順に試す（キーだけ届いている場合は null を補う）
+    for attempt in (candidate + closing, candidate + ":null" + closing):
+        try:
+            return json.loads(attempt), open_key
+        except ValueError:
+            continue
+    return None, None
+
@@ -0,0 +1,310 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+import llm_scheduler
+import metrics
+
+# ---------------------------------------------------------
+# Shared OpenAI Client Registry
+#   - API キーごとに 1 クライアント（HTTP 接続プールを使い回す）
+#   - connect / read タイムアウト
+#   - 429 / 5xx / 接続エラーは jitter 付き指数バックオフで再試行
+#   - 失敗が続いたら circuit breaker が開き、呼び出し側は即座にモックへ
+#   - 呼び出しごとにレイテンシ・トークン数・結果を metrics に記録（operation ラベル）
+#   - 各試行は llm_scheduler の順番待ち（RPM/TPM・同時実行数・優先度）を通る
+#   - stream は chat_completion_stream(): 受信し終えるまで枠を持ち、受信中の失敗も数える
+# ---------------------------------------------------------
+CONNECT_TIMEOUT = float(os.environ.get("SOLALENDAR_LLM_CONNECT_TIMEOUT", 5.0))
+READ_TIMEOUT = float(os.environ.get("SOLALENDAR_LLM_READ_TIMEOUT", 60.0))
+MAX_RETRIES = int(os.environ.get("SOLALENDAR_LLM_MAX_RETRIES", 3))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+
+class CircuitOpenError(Exception):
+    """Circuit breaker is open: the LLM backend is considered down."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None  # half-open で試しの 1 件を通した時刻
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        # half-open では試しの 1 件だけ通す（成功すれば閉じ、失敗すれば再び開く）。
+        # 試しの結果が記録されないまま reset_timeout 経ったら（呼び出し側の中断など）次の 1 件を通す
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            if self.probe_at is not None and now - self.probe_at < self.reset_timeout:
+                return False
+            self.probe_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_at = None
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()  # loop -> {api_key: AsyncOpenAI}
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_client(api_key):
+    """プロセス共通の OpenAI クライアント（キーごとに1つ）"""
+    with _lock:
+        client = _clients.get(api_key)
+        if client is None:
+            from openai import OpenAI, Timeout
+            client = OpenAI(
+                api_key=api_key,
+                timeout=Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                max_retries=0,  # 再試行はこのモジュールで行う
+            )
+            _clients[api_key] = client
+        return client
+
+
+def get_async_client(api_key):
+    """
+    AsyncOpenAI はイベントループごとに接続プールを持つので (ループ, キー) 単位で共有。
+    ループへの参照は弱参照（終わったループのクライアントは残らない）。
+    短命のループ（asyncio.run）では終了前に aclose_async_clients() を呼ぶ。
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(api_key)
+        if client is None:
+            from openai import AsyncOpenAI, Timeout
+            client = AsyncOpenAI(
+                api_key=api_key,
+                timeout=Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                max_retries=0,
+            )
+            clients[api_key] = client
+        return client
+
+
+async def aclose_async_clients():
+    """今のループで作った AsyncOpenAI をすべて閉じる（接続プールを解放）"""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+
+def run_async(coro):
+    """asyncio.run と同じだが、ループを閉じる前にそのループの AsyncOpenAI を閉じる"""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await aclose_async_clients()
+    return asyncio.run(_main())
+
+
+def get_breaker(api_key):
+    with _lock:
+        breaker = _breakers.get(api_key)
+        if breaker is None:
+            breaker = _breakers[api_key] = CircuitBreaker()
+        return breaker
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate_limit_pause(error):
+    """429 なら scheduler 全体を止める秒数（Retry-After が無ければ BACKOFF_BASE）"""
+    import openai
+    if isinstance(error, openai.RateLimitError):
+        return _retry_after(error) or BACKOFF_BASE
+    return None
+
+
+def is_retryable(error):
+    import openai
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def backoff_delay(attempt, error=None):
+    """Full jitter: uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)), Retry-After 優先"""
+    hint = _retry_after(error) if error is not None else None
+    if hint is not None:
+        return min(hint, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _used_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+
+def _record(operation, kwargs, start, outcome, attempt, usage=None):
+    metrics.record_llm(operation, time.perf_counter() - start, outcome, usage, attempt, kwargs.get("model"))
+
+
+def chat_completion(api_key, operation="llm", **kwargs):
+    """
+    client.chat.completions.create の再試行・遮断付きラッパー。
+    Raises CircuitOpenError without touching the network while the breaker is open.
+    operation: metrics のラベル ("tier2", "tier3", ...)
+    """
+    if kwargs.get("stream"):
+        raise ValueError("use chat_completion_stream() for stream=True")
+    start = time.perf_counter()
+    breaker = get_breaker(api_key)
+    if not breaker.allow():
+        _record(operation, kwargs, start, "circuit_open", 0)
+        raise CircuitOpenError("LLM circuit breaker is open")
+
+    client = get_client(api_key)
+    scheduler = llm_scheduler.get_scheduler()
+    request_context = llm_scheduler.current_context()
+    tokens = llm_scheduler.estimate_tokens(kwargs)
+    for attempt in range(MAX_RETRIES + 1):
+        ticket = scheduler.acquire(tokens, **request_context)
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except Exception as e:
+            scheduler.release(ticket, retry_after=_rate_limit_pause(e))
+            if not is_retryable(e):
+                _record(operation, kwargs, start, "error", attempt)
+                raise
+            if attempt < MAX_RETRIES:
+                time.sleep(backoff_delay(attempt, e))
+                continue
+            breaker.record_failure()
+            _record(operation, kwargs, start, "error", attempt)
+            raise
+        scheduler.release(ticket, used_tokens=_used_tokens(response))
+        breaker.record_success()
+        _record(operation, kwargs, start, "ok", attempt, getattr(response, "usage", None))
+        return response
+
+
+def chat_completion_stream(api_key, operation="llm", **kwargs):
+    """
+    chat_completion() の stream 版。チャンクを yield し、受信し終えるまで scheduler の枠を持つ。
+    最初のチャンクより前の失敗は chat_completion() と同じく再試行する。受信の途中で切れた場合は
+    届いた分を取り消せないので再試行せず、breaker と metrics に失敗として数えて送出する。
+    usage（include_usage の最終チャンク）は metrics と scheduler の精算に使う。
+    """
+    start = time.perf_counter()
+    breaker = get_breaker(api_key)
+    if not breaker.allow():
+        _record(operation, kwargs, start, "circuit_open", 0)
+        raise CircuitOpenError("LLM circuit breaker is open")
+
+    client = get_client(api_key)
+    scheduler = llm_scheduler.get_scheduler()
+    request_context = llm_scheduler.current_context()
+    tokens = llm_scheduler.estimate_tokens(kwargs)
+    kwargs = {**kwargs, "stream": True}
+    for attempt in range(MAX_RETRIES + 1):
+        ticket = scheduler.acquire(tokens, **request_context)
+        usage = None
+        received = False
+        try:
+            with client.chat.completions.create(**kwargs) as stream:
+                for chunk in stream:
+                    usage = getattr(chunk, "usage", None) or usage
+                    received = True
+                    yield chunk
+        except Exception as e:
+            scheduler.release(ticket, retry_after=_rate_limit_pause(e))
+            if received or is_retryable(e):
+                if not received and attempt < MAX_RETRIES:
+                    time.sleep(backoff_delay(attempt, e))
+                    continue
+                breaker.record_failure()
+            _record(operation, kwargs, start, "error", attempt)
+            raise
+        except BaseException:
+            # 呼び出し側が途中で読むのをやめた（GeneratorExit）など: 枠だけ返す
+            scheduler.release(ticket, used_tokens=getattr(usage, "total_tokens", None))
+            raise
+        scheduler.release(ticket, used_tokens=getattr(usage, "total_tokens", None))
+        breaker.record_success()
+        _record(operation, kwargs, start, "ok", attempt, usage)
+        return
+
+
+async def chat_completion_async(api_key, operation="llm", **kwargs):
+    """chat_completion() の asyncio 版（同じ breaker を共有する）"""
+    if kwargs.get("stream"):
+        raise ValueError("use chat_completion_stream() for stream=True")
+    start = time.perf_counter()
+    breaker = get_breaker(api_key)
+    if not breaker.allow():
+        _record(operation, kwargs, start, "circuit_open", 0)
+        raise CircuitOpenError("LLM circuit breaker is open")
+
+    client = get_async_client(api_key)
+    scheduler = llm_scheduler.get_scheduler()
+    request_context = llm_scheduler.current_context()
+    tokens = llm_scheduler.estimate_tokens(kwargs)
+    for attempt in range(MAX_RETRIES + 1):
+        ticket = await scheduler.acquire_async(tokens, **request_context)
+        try:
+            response = await client.chat.completions.create(**kwargs)
+        except asyncio.CancelledError:
+            scheduler.release(ticket)
+            raise
+        except Exception as e:
+            scheduler.release(ticket, retry_after=_rate_limit_pause(e))
+            if not is_retryable(e):
+                _record(operation, kwargs, start, "error", attempt)
+                raise
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(backoff_delay(attempt, e))
+                continue
+            breaker.record_failure()
+            _record(operation, kwargs, start, "error", attempt)
+            raise
+        scheduler.release(ticket, used_tokens=_used_tokens(response))
+        breaker.record_success()
+        _record(operation, kwargs, start, "ok", attempt, getattr(response, "usage", None))
+        return response
@@ -0,0 +1,323 @@
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import metrics
+
+# ---------------------------------------------------------
+# LLM Request Scheduler
+#   llm_client の全呼び出しがここで順番待ちをする（プロセス内で共有）。
+#   - RPM / TPM を token bucket で制限（SOLALENDAR_LLM_RPM / SOLALENDAR_LLM_TPM、未設定なら無制限）
+#   - 同時実行数の上限（SOLALENDAR_LLM_CONCURRENCY）
+#   - 優先度: interactive (UI) > batch。同じ優先度の中ではセッションごとに順番に回す
+#   - 429 の Retry-After を受けたら全体を一時停止して、一斉再試行の連鎖を防ぐ
+#   - 待っている間は on_queue(status) で順番 (position) と待ち時間の目安 (eta_s) を知らせる
+#   トークン数は送信前に見積もり、応答の usage で差分を精算する。
+#   stream の場合は本文を受信し終えるまで枠を持つ（llm_client.chat_completion_stream）。
+# ---------------------------------------------------------
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+DEFAULT_COMPLETION_TOKENS = 400  # max_tokens 指定がないときの応答トークンの見積もり
+POLL_INTERVAL = 0.5               # 待機中に on_queue を呼ぶ間隔
+
+_context = contextvars.ContextVar("llm_scheduler_context", default=None)
+
+
+@contextmanager
+def context(session=None, priority=INTERACTIVE, on_queue=None):
+    """
+    with context(session="abc", priority="batch"): ... の中の LLM 呼び出しに属性を付ける。
+    on_queue(status) は待機中に呼ばれる（status = {"position", "eta_s", "waited_s"}）。
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {PRIORITIES}")
+    token = _context.set({"session": session, "priority": priority, "on_queue": on_queue})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def current_context():
+    return _context.get() or {"session": None, "priority": INTERACTIVE, "on_queue": None}
+
+
+def estimate_tokens(kwargs):
+    """送信前の粗い見積もり（英数字 ≒ 4 文字 / token、日本語はもっと多いので 3 文字で割る）"""
+    prompt = sum(len(m.get("content") or "") if isinstance(m.get("content"), str) else len(json.dumps(m.get("content")))
+                 for m in kwargs.get("messages", ()))
+    return prompt // 3 + int(kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """rate_per_min / 60 ずつ溜まり、最大 capacity。tokens は精算で負になることがある"""
+
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity or rate_per_min
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """amount を取れるまでの秒数（0 なら今取れる）。capacity を超える要求は満タンで通す"""
+        self._refill(now)
+        need = min(amount, self.capacity) - self.tokens
+        return max(need, 0) / self.rate
+
+    def take(self, amount):
+        self.tokens -= amount
+
+
+class Ticket:
+    __slots__ = ("session", "priority", "tokens", "enqueued", "granted_at", "event", "future", "loop")
+
+    def __init__(self, session, priority, tokens):
+        self.session = session
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted_at = None
+        self.event = None
+        self.future = None
+        self.loop = None
+
+
+class LLMScheduler:
+    def __init__(self, rpm=None, tpm=None, concurrency=64):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = concurrency
+        self.running = 0
+        self.paused_until = 0.0
+        self.latency = None  # 1 リクエストあたりの平均所要時間（EWMA, ETA 用）
+        self.avg_tokens = None
+        self.stats = {"granted": 0, "rate_limited": 0}
+
+        self._lock = threading.Lock()
+        # priority -> OrderedDict(session -> deque[Ticket])（先頭のセッションが次の番）
+        self._queues = {p: OrderedDict() for p in PRIORITIES}
+
+    # ---------------------------------------------------------
+    # Acquire / release
+    # ---------------------------------------------------------
+    def acquire(self, tokens, session=None, priority=INTERACTIVE, on_queue=None):
+        """順番が来るまでブロックして Ticket を返す（終わったら release）"""
+        ticket = self._enqueue(tokens, session, priority)
+        ticket.event = threading.Event()
+        try:
+            while True:
+                wait = self._dispatch()
+                if ticket.granted_at is not None:
+                    return self._granted(ticket)
+                ticket.event.wait(min(wait or POLL_INTERVAL, POLL_INTERVAL))
+                if ticket.granted_at is not None:
+                    return self._granted(ticket)
+                if on_queue:
+                    on_queue(self.status(ticket))
+        except BaseException:
+            # on_queue から Streamlit の RerunException などが飛んでも枠を失わない
+            self._abandon(ticket)
+            raise
+
+    async def acquire_async(self, tokens, session=None, priority=INTERACTIVE, on_queue=None):
+        """acquire() の asyncio 版（イベントループを塞がない）"""
+        ticket = self._enqueue(tokens, session, priority)
+        ticket.loop = asyncio.get_running_loop()
+        ticket.future = ticket.loop.create_future()
+        try:
+            while True:
+                wait = self._dispatch()
+                if ticket.granted_at is not None:
+                    return self._granted(ticket)
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.future), min(wait or POLL_INTERVAL, POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    if on_queue:
+                        on_queue(self.status(ticket))
+                if ticket.granted_at is not None:
+                    return self._granted(ticket)
+        except asyncio.CancelledError:
+            self._abandon(ticket)
+            raise
+
+    def release(self, ticket, used_tokens=None, retry_after=None):
+        """
+        used_tokens: 応答の実トークン数（見積もりとの差を精算）
+        retry_after: 429 を受けたときの待ち秒数（全体を止める）
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.running -= 1
+            elapsed = now - ticket.granted_at
+            self.latency = elapsed if self.latency is None else self.latency * 0.8 + elapsed * 0.2
+            if used_tokens is not None and self.tokens is not None:
+                self.tokens.take(used_tokens - ticket.tokens)
+            if retry_after:
+                self.stats["rate_limited"] += 1
+                self.paused_until = max(self.paused_until, now + retry_after)
+        self._dispatch()
+
+    def _enqueue(self, tokens, session, priority):
+        ticket = Ticket(session, priority, tokens)
+        with self._lock:
+            self._queues[priority].setdefault(session, deque()).append(ticket)
+        return ticket
+
+    def _granted(self, ticket):
+        wait = ticket.granted_at - ticket.enqueued
+        metrics.REGISTRY.observe("solalendar_llm_queue_seconds", wait, (("priority", ticket.priority),),
+                                 "Time LLM requests waited in the scheduler")
+        return ticket
+
+    def _abandon(self, ticket):
+        """キャンセルされた待ち。もう枠を得ていたら返す"""
+        with self._lock:
+            queue = self._queues[ticket.priority].get(ticket.session)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.priority][ticket.session]
+                return
+        if ticket.granted_at is not None:
+            self.release(ticket)
+
+    # ---------------------------------------------------------
+    # Dispatch
+    # ---------------------------------------------------------
+    def _dispatch(self):
+        """
+        出せるだけ枠を割り当てる。
+        Returns seconds until the head of the queue could run (None when idle / capacity-bound).
+        """
+        granted = []
+        wait = None
+        with self._lock:
+            now = time.monotonic()
+            while self.running < self.concurrency:
+                head = self._head()
+                if head is None:
+                    break
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                    break
+                wait = max(self.requests.wait_time(1, now) if self.requests else 0,
+                           self.tokens.wait_time(head.tokens, now) if self.tokens else 0)
+                if wait > 0:
+                    break
+                wait = None
+                if self.requests:
+                    self.requests.take(1)
+                if self.tokens:
+                    self.tokens.take(head.tokens)
+                self._pop(head)
+                self.running += 1
+                self.stats["granted"] += 1
+                head.granted_at = now
+                self.avg_tokens = head.tokens if self.avg_tokens is None else self.avg_tokens * 0.8 + head.tokens * 0.2
+                granted.append(head)
+        for ticket in granted:
+            if ticket.event is not None:
+                ticket.event.set()
+            else:
+                ticket.loop.call_soon_threadsafe(_resolve, ticket.future)
+        return wait
+
+    def _head(self):
+        for priority in PRIORITIES:
+            sessions = self._queues[priority]
+            if sessions:
+                return sessions[next(iter(sessions))][0]
+        return None
+
+    def _pop(self, ticket):
+        # 取り出したセッションは列の最後へ（セッション間のラウンドロビン）
+        sessions = self._queues[ticket.priority]
+        queue = sessions.pop(ticket.session)
+        queue.popleft()
+        if queue:
+            sessions[ticket.session] = queue
+
+    # ---------------------------------------------------------
+    # Queue position / ETA
+    # ---------------------------------------------------------
+    def _order(self):
+        """今の状態で割り当てられる順に並べた Ticket の列"""
+        order = []
+        for priority in PRIORITIES:
+            queues = [list(q) for q in self._queues[priority].values()]
+            for round_ in itertools.zip_longest(*queues):
+                order.extend(t for t in round_ if t is not None)
+        return order
+
+    def throughput(self):
+        """1 秒あたりに捌けるリクエスト数の目安（RPM / TPM / 同時実行数の最も厳しいもの）"""
+        rates = []
+        if self.requests:
+            rates.append(self.requests.rate)
+        if self.tokens:
+            rates.append(self.tokens.rate / (self.avg_tokens or DEFAULT_COMPLETION_TOKENS))
+        if self.latency:
+            rates.append(self.concurrency / self.latency)
+        return min(rates) if rates else None
+
+    def status(self, ticket=None):
+        """ticket の順番と ETA（ticket なしなら全体の状態）"""
+        with self._lock:
+            order = self._order()
+            rate = self.throughput()
+            now = time.monotonic()
+            pause = max(self.paused_until - now, 0)
+            if ticket is None:
+                return {"queued": len(order), "running": self.running, "paused_s": round(pause, 1),
+                        "per_second": rate, **self.stats}
+            position = order.index(ticket) if ticket in order else 0
+            eta = pause + (position + 1) / rate if rate else None
+            return {"position": position + 1, "eta_s": None if eta is None else round(eta, 1),
+                    "waited_s": round(now - ticket.enqueued, 1)}
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# ---------------------------------------------------------
+# Process-wide scheduler
+# ---------------------------------------------------------
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def _env_int(name):
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else None
+
+
+def get_scheduler():
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = LLMScheduler(
+                rpm=_env_int("SOLALENDAR_LLM_RPM"),
+                tpm=_env_int("SOLALENDAR_LLM_TPM"),
+                concurrency=_env_int("SOLALENDAR_LLM_CONCURRENCY") or 64,
+            )
+        return _SCHEDULER
+
+
+def set_scheduler(scheduler):
+    """テスト・ベンチ用に差し替える"""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        _SCHEDULER = scheduler
@@ -0,0 +1,262 @@
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------------------------------------
+# Local OpenAI-compatible stand-in server (for tests / offline runs)
+#   POST /v1/chat/completions      (stream 対応, 遅延・エラー率を設定可能)
+#   POST /v1/files                 (multipart, purpose=batch)
+#   GET  /v1/files/{id}/content
+#   POST /v1/batches
+#   GET  /v1/batches/{id}
+#   GET  /v1/batches               (新しい順、1 ページ)
+#   バッチは裏のスレッドで処理し validating -> in_progress -> completed と進む。
+#   python llm_stub_server.py --port 8765
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 で SDK から使える
+# ---------------------------------------------------------
+BIG_FIVE_KEYS = ("openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism")
+
+
+def fake_completion(body):
+    """
+    リクエスト本文から決定論的なダミー応答を作る。
+    Tier 2 (Big Five) は入力のハッシュからスコアを作り、それ以外は空の wisdom を返す。
+    """
+    messages = body.get("messages", [])
+    user_text = messages[-1]["content"] if messages else ""
+    system_text = messages[0]["content"] if messages else ""
+    digest = hashlib.sha256(user_text.encode("utf-8")).digest()
+
+    if "big_five_scores" in system_text and "wisdom_message" not in system_text:
+        content = {"big_five_scores": {k: 20 + digest[i] % 61 for i, k in enumerate(BIG_FIVE_KEYS)}}
+    else:
+        content = {"wisdom_message": {"headline": "Stub Wisdom", "narrative": "stub narrative", "actionable_advice": "stub advice"}}
+
+    text = json.dumps(content, ensure_ascii=False)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(system_text + user_text) // 4, "completion_tokens": len(text) // 4,
+                  "total_tokens": (len(system_text + user_text) + len(text)) // 4},
+    }
+
+
+class StubState:
+    def __init__(self, responder=fake_completion, batch_delay=0.2, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=500, seed=None):
+        self.responder = responder
+        self.batch_delay = batch_delay
+        # /v1/chat/completions: latency ± jitter 秒待ってから応答、error_rate の割合で error_status を返す
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.stats = {"completions": 0, "errors": 0}
+        self.files = {}    # id -> (meta, bytes)
+        self.batches = {}  # id -> batch object
+        self.lock = threading.RLock()
+
+    def completion_plan(self):
+        """(待ち時間, エラーにするか) をスレッド安全に決める"""
+        with self.lock:
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            fail = self.rng.random() < self.error_rate
+            self.stats["completions"] += 1
+            self.stats["errors"] += fail
+        return delay, fail
+
+    def add_file(self, content, filename, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:16]}"
+        meta = {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+        with self.lock:
+            self.files[file_id] = (meta, content)
+        return meta
+
+    def create_batch(self, params):
+        batch_id = f"batch_{uuid.uuid4().hex[:16]}"
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": params.get("endpoint"),
+            "input_file_id": params["input_file_id"], "completion_window": params.get("completion_window", "24h"),
+            "status": "validating", "created_at": int(time.time()), "output_file_id": None, "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0}, "metadata": params.get("metadata"),
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._process, args=(batch_id,), daemon=True).start()
+        return dict(batch)
+
+    def _process(self, batch_id):
+        batch = self.batches[batch_id]
+        time.sleep(self.batch_delay)
+        _, content = self.files[batch["input_file_id"]]
+        lines = [json.loads(l) for l in content.decode("utf-8").splitlines() if l.strip()]
+        with self.lock:
+            batch["status"] = "in_progress"
+            batch["request_counts"]["total"] = len(lines)
+
+        outputs, errors = [], []
+        for line in lines:
+            try:
+                body = self.responder(line["body"])
+                outputs.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": line["custom_id"],
+                                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": body}, "error": None})
+            except Exception as e:
+                errors.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": line.get("custom_id"),
+                               "response": None, "error": {"code": "stub_error", "message": str(e)}})
+        time.sleep(self.batch_delay)
+
+        def _dump(rows):
+            return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode("utf-8")
+
+        with self.lock:
+            batch["output_file_id"] = self.add_file(_dump(outputs), "output.jsonl", "batch_output")["id"] if outputs else None
+            batch["error_file_id"] = self.add_file(_dump(errors), "errors.jsonl", "batch_output")["id"] if errors else None
+            batch["request_counts"].update(completed=len(outputs), failed=len(errors))
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state = None  # make_server() で差し込む
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, obj):
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        m = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+        if m and m.group(1) in self.state.files:
+            data = self.state.files[m.group(1)][1]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        m = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+        if m and m.group(1) in self.state.batches:
+            with self.state.lock:
+                return self._send_json(200, dict(self.state.batches[m.group(1)]))
+        if self.path.split("?")[0] == "/v1/batches":
+            with self.state.lock:
+                data = [dict(b) for b in reversed(list(self.state.batches.values()))]
+            return self._send_json(200, {"object": "list", "data": data, "has_more": False})
+        self._send_json(404, {"error": {"message": f"Not found: {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.path == "/v1/chat/completions":
+            return self._chat_completion(json.loads(body or b"{}"))
+        if self.path == "/v1/files":
+            # multipart/form-data を email パーサで分解する
+            msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body
+            )
+            fields, content, filename = {}, b"", "upload.jsonl"
+            for part in msg.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if name == "file":
+                    content = part.get_payload(decode=True)
+                    filename = part.get_filename() or filename
+                else:
+                    fields[name] = part.get_content().strip()
+            return self._send_json(200, self.state.add_file(content, filename, fields.get("purpose", "batch")))
+        if self.path == "/v1/batches":
+            params = json.loads(body or b"{}")
+            if params.get("input_file_id") not in self.state.files:
+                return self._send_json(400, {"error": {"message": "Unknown input_file_id", "type": "invalid_request_error"}})
+            return self._send_json(200, self.state.create_batch(params))
+        self._send_json(404, {"error": {"message": f"Not found: {self.path}", "type": "invalid_request_error"}})
+
+    def _chat_completion(self, params):
+        delay, fail = self.state.completion_plan()
+        time.sleep(delay)
+        if fail:
+            status = self.state.error_status
+            return self._send_json(status, {"error": {"message": f"Stub error ({status})", "type": "server_error"}})
+
+        completion = self.state.responder(params)
+        if not params.get("stream"):
+            return self._send_json(200, completion)
+
+        # SSE: content を数文字ずつの delta に分けて送る
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        text = completion["choices"][0]["message"]["content"]
+        base = {k: completion[k] for k in ("id", "created", "model")}
+        pieces = [{"role": "assistant", "content": ""}] + [{"content": text[i:i + 8]} for i in range(0, len(text), 8)]
+        for i, delta in enumerate(pieces + [{}]):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None if i < len(pieces) else "stop"}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        if (params.get("stream_options") or {}).get("include_usage"):
+            # OpenAI と同じく choices が空で usage だけの最終チャンク
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": completion["usage"]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # 既定の listen backlog (5) だと並行ベンチの同時接続が溢れ、SYN 再送で 1 秒待たされる
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def make_server(host="127.0.0.1", port=0, **state_kwargs):
+    """テスト用: port=0 で空きポートに立てる。server.server_address で URL が分かる"""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": StubState(**state_kwargs)})
+    return StubHTTPServer((host, port), handler)
+
+
+def serve_in_background(**kwargs):
+    """(server, base_url) を返す。終わったら server.shutdown()"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=0.2, help="Seconds per batch state transition")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each chat completion response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± seconds added to --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of chat completions that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status for failed completions (e.g. 429)")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, batch_delay=args.batch_delay, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, error_status=args.error_status)
+    print(f"Stub listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import bisect
+import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ---------------------------------------------------------
+# Instrumentation (spans / LLM usage / cache)
+#   span("tier1.planets") で所要時間をヒストグラムに記録し、
+#   LLM 呼び出しはレイテンシ・トークン数・結果を、キャッシュはヒット/ミスを数える。
+#   出力: render_prometheus() (text format 0.0.4) / JSON ログ (logger "solalendar.metrics")
+#         / snapshot() (app のデバッグパネル用)
+#   プロセス内で集計するだけなので、複数プロセスの合算は Prometheus 側で行う。
+# ---------------------------------------------------------
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("solalendar.metrics")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}    # (name, labels) -> float
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.help = {}
+        self.recent = deque(maxlen=100)  # 直近のイベント（デバッグパネル用）
+
+    def inc(self, name, labels=(), value=1, help_text=""):
+        key = (name, tuple(sorted(labels)))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.help.setdefault(name, help_text)
+
+    def observe(self, name, value, labels=(), help_text=""):
+        key = (name, tuple(sorted(labels)))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+            self.help.setdefault(name, help_text)
+
+    def event(self, event, level=logging.DEBUG):
+        """直近イベントに積み、ロガーが有効なら JSON 1 行で出す"""
+        event["ts"] = round(time.time(), 3)
+        self.recent.append(event)
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps(event, ensure_ascii=False))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.recent.clear()
+
+
+REGISTRY = Registry()
+
+
+# ---------------------------------------------------------
+# Recording API
+# ---------------------------------------------------------
+@contextmanager
+def span(name, **fields):
+    """with span("tier1.planets"): ...  所要時間と例外を記録する"""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe("solalendar_span_seconds", elapsed, (("span", name),), "Duration of instrumented code spans")
+        if error:
+            REGISTRY.inc("solalendar_span_errors_total", (("span", name),), help_text="Spans that raised")
+        REGISTRY.event({"type": "span", "span": name, "ms": round(elapsed * 1000, 3), "error": error, **fields})
+
+
+def record_llm(operation, latency, outcome="ok", usage=None, retries=0, model=None):
+    """1 回の LLM 呼び出し（再試行込み）の結果"""
+    labels = (("operation", operation),)
+    REGISTRY.inc("solalendar_llm_requests_total", labels + (("outcome", outcome),), help_text="LLM calls by outcome")
+    REGISTRY.observe("solalendar_llm_latency_seconds", latency, labels, "LLM call latency including retries")
+    if retries:
+        REGISTRY.inc("solalendar_llm_retries_total", labels, retries, "LLM retry attempts")
+    event = {"type": "llm", "operation": operation, "model": model, "outcome": outcome,
+             "ms": round(latency * 1000, 1), "retries": retries}
+    if usage is not None:
+        event.update(record_usage(operation, usage, log=False))
+    REGISTRY.event(event, logging.INFO)
+
+
+def record_usage(operation, usage, log=True):
+    """response.usage (prompt_tokens / completion_tokens) をトークン数として加算"""
+    tokens = {
+        "prompt_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "completion_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
+    }
+    for kind, value in tokens.items():
+        REGISTRY.inc("solalendar_llm_tokens_total", (("operation", operation), ("kind", kind.split("_")[0])), value,
+                     "LLM tokens by kind")
+    if log:
+        REGISTRY.event({"type": "llm_usage", "operation": operation, **tokens}, logging.INFO)
+    return tokens
+
+
+def record_cache(operation, hit):
+    REGISTRY.inc("solalendar_llm_cache_total", (("operation", operation), ("result", "hit" if hit else "miss")),
+                 help_text="LLM response cache lookups")
+
+
+# ---------------------------------------------------------
+# Export
+# ---------------------------------------------------------
+def _fmt_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs) + "}"
+
+
+def render_prometheus(registry=REGISTRY):
+    """Prometheus text exposition format"""
+    lines = []
+    with registry._lock:
+        counters = sorted(registry.counters.items())
+        histograms = sorted(registry.histograms.items(), key=lambda kv: kv[0])
+        help_text = dict(registry.help)
+
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            lines += [f"# HELP {name} {help_text.get(name, '')}", f"# TYPE {name} counter"]
+        lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+
+    for (name, labels), hist in histograms:
+        if name not in seen:
+            seen.add(name)
+            lines += [f"# HELP {name} {help_text.get(name, '')}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {hist.sum:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {hist.count}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot(registry=REGISTRY):
+    """{"spans": {name: {count, avg_ms, total_ms}}, "llm": {...}, "counters": {...}, "recent": [...]}"""
+    with registry._lock:
+        spans, llm = {}, {}
+        for (name, labels), hist in registry.histograms.items():
+            label = dict(labels)
+            row = {"count": hist.count, "avg_ms": hist.sum / hist.count * 1000 if hist.count else 0.0,
+                   "total_ms": hist.sum * 1000}
+            if name == "solalendar_span_seconds":
+                spans[label["span"]] = row
+            elif name == "solalendar_llm_latency_seconds":
+                llm[label["operation"]] = row
+        counters = {name + _fmt_labels(labels): value for (name, labels), value in registry.counters.items()}
+        recent = list(registry.recent)
+    return {"spans": spans, "llm": llm, "counters": counters, "recent": recent}
+
+
+def configure_json_logging(level=logging.INFO, stream=None):
+    """solalendar.metrics のイベントを 1 行 1 JSON で出す（DEBUG で span も出る）"""
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
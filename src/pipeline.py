@@ -0,0 +1,52 @@
+import asyncio
+import llm_client
+from tier1_engine import SolalendarTier1
+from tier2_engine import SolalendarTier2
+from tier3_engine import SolalendarTier3
+
+# ---------------------------------------------------------
+# Full Reading Pipeline (asyncio)
+#   Tier 1 (CPU, executor) と Tier 2 (LLM) を同時に走らせ、
+#   両方揃った時点で Tier 3 を開始する。
+#   合計時間 ≒ max(Tier 1, Tier 2) + Tier 3
+# ---------------------------------------------------------
+
+
+async def run_reading(tier1_args, anchor_data, free_text, api_key, executor=None):
+    """
+    tier1_args: SolalendarTier1 の引数 dict (name, year, month, day, hour, minute, ...)
+    Returns {"tier1": ..., "tier2": ..., "tier3": ...}
+    """
+    tier1 = SolalendarTier1(**tier1_args)
+    tier2 = SolalendarTier2(api_key)
+
+    psc_data, tier2_result = await asyncio.gather(
+        tier1.analyze_async(executor),
+        tier2.analyze_async(anchor_data, free_text),
+    )
+
+    if "error" in tier2_result:
+        # Tier 2 が失敗したら統合はできない（UI と同じ扱い）
+        return {"tier1": psc_data, "tier2": tier2_result, "tier3": {"error": "Tier 2 failed"}}
+
+    wisdom = await SolalendarTier3(api_key).integrate_async(psc_data, tier2_result)
+    return {"tier1": psc_data, "tier2": tier2_result, "tier3": wisdom}
+
+
+async def run_readings(requests, api_key, executor=None, concurrency=32):
+    """
+    複数の鑑定を1つのイベントループで並行処理する。
+    requests: iterable of (tier1_args, anchor_data, free_text)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(args):
+        async with semaphore:
+            return await run_reading(*args, api_key=api_key, executor=executor)
+
+    return await asyncio.gather(*(_one(args) for args in requests))
+
+
+def run_reading_sync(tier1_args, anchor_data, free_text, api_key):
+    """同期コード（Streamlit など）から呼ぶための入口"""
+    return llm_client.run_async(run_reading(tier1_args, anchor_data, free_text, api_key))
@@ -0,0 +1,348 @@
+import json
+import struct
+from tier1_chart import SIGNS
+from tier1_engine import ENGINE_VERSION
+from tier1_numerology import STAGE_NAMES, pinnacle_range, reduce_single
+from tier2_engine import build_behavior, calculate_motivation
+from tier3_gap import ELEMENTS
+
+# ---------------------------------------------------------
+# Compact Reading Results (Tier 1 / 2 / 3)
+#   __slots__ のオブジェクトに、星座・エレメント・VALS などを小さな整数で持つ。
+#   desc 文字列や診断文のように入力から決まる部分は保存せず、to_dict() で組み立て直す。
+#   組み立て直した結果が元の dict と一致しない部分（モック応答など）だけを
+#   extra に生の値で残すので、from_dict(d).to_dict() == d が常に成り立つ。
+#
+#   encode() / decode()   : 固定長 struct + (必要なら) extra の JSON
+#   write_stream / read_stream : 型タグ + 長さ付きでファイルに連結
+#   to_columns()          : 分析用の numpy 列（enum はコード値、名前は *_CODES）
+# ---------------------------------------------------------
+GANZHI = tuple("甲乙丙丁戊己庚辛壬癸"[i % 10] + "子丑寅卯辰巳午未申酉戌亥"[i % 12] for i in range(60))
+NAYIN_PAIRS = (
+    "海中金", "炉中火", "大林木", "路旁土", "剑锋金", "山头火", "涧下水", "城头土", "白蜡金", "杨柳木",
+    "泉中水", "屋上土", "霹雳火", "松柏木", "长流水", "沙中金", "山下火", "平地木", "壁上土", "金箔金",
+    "覆灯火", "天河水", "大驿土", "钗钏金", "桑柘木", "大溪水", "沙中土", "天上火", "石榴木", "大海水",
+)  # 干支 2 つごとに 1 つ
+BIG_FIVE_KEYS = ("openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism")
+DRIVERS = ("Ideals", "Achievement", "Self-Expression")
+
+ELEMENT_CODES = ELEMENTS + ("Mutable",)
+RESOURCE_LEVEL_CODES = ("High", "Moderate", "Low", "Unknown")
+VALS_CODES = ("Innovator", "Thinker", "Achiever", "Experiencer", "Believer", "Striver", "Maker", "Survivor", "Unknown")
+RELATIONSHIP_CODES = ("Identity", "Complement", "Conflict", "Undetermined")  # 追加は末尾に（保存済みのコードを変えない）
+STRESS_CODES = ("Low", "Moderate", "High")
+
+
+def _code(codes, value):
+    """名前 -> コード（一覧にない値は ValueError -> extra 行き）"""
+    return codes.index(value)
+
+
+def _pack_extra(extra):
+    blob = json.dumps(extra, ensure_ascii=False, separators=(",", ":")).encode("utf-8") if extra else b""
+    return struct.pack("<I", len(blob)) + blob
+
+
+def _unpack_extra(buf, offset):
+    (n,) = struct.unpack_from("<I", buf, offset)
+    offset += 4
+    return (json.loads(bytes(buf[offset:offset + n])) if n else None), offset + n
+
+
+def _pack_str(value):
+    blob = value.encode("utf-8")
+    return struct.pack("<I", len(blob)) + blob
+
+
+def _unpack_str(buf, offset):
+    (n,) = struct.unpack_from("<I", buf, offset)
+    offset += 4
+    return bytes(buf[offset:offset + n]).decode("utf-8"), offset + n
+
+
+# ---------------------------------------------------------
+# Tier 1
+# ---------------------------------------------------------
+class Tier1Result:
+    __slots__ = ("jdn", "lat", "lng", "lpn", "saturn_round", "jupiter_year", "stage", "pins",
+                 "sun", "moon", "ascendant", "ganzhi", "extra")
+    _STRUCT = struct.Struct("<dddBbBB4BBBBB")  # saturn_round は未来の生年で負になる
+
+    def __init__(self, jdn, lat, lng, lpn, saturn_round, jupiter_year, stage, pins, sun, moon, ascendant, ganzhi, extra=None):
+        self.jdn, self.lat, self.lng = jdn, lat, lng
+        self.lpn, self.saturn_round, self.jupiter_year, self.stage, self.pins = lpn, saturn_round, jupiter_year, stage, tuple(pins)
+        self.sun, self.moon, self.ascendant, self.ganzhi = sun, moon, ascendant, ganzhi
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d):
+        """analyze() の出力から作る"""
+        if "error" in d:
+            raise ValueError(f"Cannot encode an error result: {d['error']}")
+        try:
+            cycles = d["layer_2_infra"]["cycles"]
+            pinnacle = cycles["pinnacle"]
+            lat, lng = (float(v) for v in d["layer_0_kernel"]["vector"].split(","))
+            obj = cls(
+                jdn=float(d["layer_0_kernel"]["jdn"]), lat=lat, lng=lng,
+                lpn=d["layer_1_bios"]["lpn"],
+                saturn_round=int(cycles["saturn_cycle"].split()[-1]),
+                jupiter_year=int(cycles["jupiter_phase"].split()[-1].split("/")[0]),
+                stage=STAGE_NAMES.index(pinnacle["current_stage"]),
+                pins=pinnacle["all_pins"],
+                sun=_code(SIGNS, d["layer_3_env"]["sun_sign"]),
+                moon=_code(SIGNS, d["layer_4_runtime"]["moon_sign"]),
+                ascendant=_code(SIGNS, d["layer_5_skin"]["ascendant"]),
+                ganzhi=_code(GANZHI, d["layer_4_runtime"]["eastern_root"]),
+            )
+        except (KeyError, ValueError, TypeError, IndexError):
+            # 想定外の形（kerykeion の別表記など）は全体を extra に入れる
+            obj = cls(0.0, 0.0, 0.0, 1, 1, 0, 0, (1, 1, 1, 1), 0, 0, 0, 0)
+        # 組み立て直しで一致しないフィールド（整数で渡された緯度経度など）だけ生で残す
+        rebuilt = obj.to_dict()
+        extra = {k: d[k] for k in d if rebuilt.get(k) != d[k]}
+        obj.extra = extra or None
+        return obj
+
+    def to_dict(self):
+        age_end_1 = 36 - reduce_single(self.lpn)
+        age_ends = (age_end_1, age_end_1 + 9, age_end_1 + 18)
+        d = {
+            "meta": {"version": ENGINE_VERSION, "type": "PSC_Decode"},
+            "layer_0_kernel": {"desc": "The Absolute", "jdn": self.jdn, "vector": f"{self.lat}, {self.lng}"},
+            "layer_1_bios": {"desc": "Source Numerology", "lpn": self.lpn},
+            "layer_2_infra": {
+                "desc": "Social Cycles & Chapters",
+                "cycles": {
+                    "saturn_cycle": f"Round {self.saturn_round}",
+                    "jupiter_phase": f"Year {self.jupiter_year}/12",
+                    "pinnacle": {
+                        "current_number": self.pins[self.stage],
+                        "current_stage": STAGE_NAMES[self.stage],
+                        "period_range": pinnacle_range(self.stage, age_ends),
+                        "all_pins": list(self.pins)
+                    }
+                }
+            },
+            "layer_3_env": {"desc": "Display Environment", "sun_sign": SIGNS[self.sun]},
+            "layer_4_runtime": {
+                "desc": "System Clock",
+                "moon_sign": SIGNS[self.moon],
+                "eastern_root": GANZHI[self.ganzhi],
+                "texture": NAYIN_PAIRS[self.ganzhi // 2]
+            },
+            "layer_5_skin": {"desc": "Interface", "ascendant": SIGNS[self.ascendant]}
+        }
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def encode(self):
+        return self._STRUCT.pack(self.jdn, self.lat, self.lng, self.lpn, self.saturn_round, self.jupiter_year, self.stage,
+                                 *self.pins, self.sun, self.moon, self.ascendant, self.ganzhi) + _pack_extra(self.extra)
+
+    @classmethod
+    def decode(cls, buf):
+        v = cls._STRUCT.unpack_from(buf, 0)
+        extra, _ = _unpack_extra(buf, cls._STRUCT.size)
+        return cls(*v[:7], v[7:11], *v[11:], extra=extra)
+
+
+# ---------------------------------------------------------
+# Tier 2
+# ---------------------------------------------------------
+class Tier2Result:
+    __slots__ = ("scores", "element", "resource_score", "resource_level", "vals_type", "ryoshiki", "driver", "extra")
+    _STRUCT = struct.Struct("<5BBBBB?B")
+
+    def __init__(self, scores, element, resource_score, resource_level, vals_type, ryoshiki, driver, extra=None):
+        self.scores = tuple(scores)
+        self.element, self.resource_score, self.resource_level = element, resource_score, resource_level
+        self.vals_type, self.ryoshiki, self.driver = vals_type, ryoshiki, driver
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d):
+        """SolalendarTier2.analyze() の出力から作る"""
+        if "error" in d:
+            raise ValueError(f"Cannot encode an error result: {d['error']}")
+        behavior, motivation = d["layer_6_behavior"], d["layer_7_motivation"]
+        raw = behavior["big_five_scores"]
+        scores = tuple(min(max(int(raw.get(k, 0)), 0), 255) for k in BIG_FIVE_KEYS)
+
+        def code_or_last(codes, value):
+            return codes.index(value) if value in codes else len(codes) - 1
+
+        # 診断文は ANCHOR の原動力から決まるので、一致する原動力を探して持つ
+        driver = 0
+        for i, name in enumerate(DRIVERS):
+            anchor = {"curiosity_score": motivation.get("resource_score", 0), "primary_driver": name,
+                      "social_norm_flag": motivation.get("ryoshiki_filter_active", False)}
+            if calculate_motivation(anchor) == motivation:
+                driver = i
+                break
+        element = behavior.get("dominant_element", "Mutable").split(" ")[0]
+        obj = cls(
+            scores=scores,
+            element=code_or_last(ELEMENT_CODES, element),
+            resource_score=min(max(int(motivation.get("resource_score", 0)), 0), 255),
+            resource_level=code_or_last(RESOURCE_LEVEL_CODES, motivation.get("resource_level")),
+            vals_type=code_or_last(VALS_CODES, motivation.get("vals_type")),
+            ryoshiki=bool(motivation.get("ryoshiki_filter_active", False)),
+            driver=driver,
+        )
+        rebuilt = obj.to_dict()
+        extra = {k: d[k] for k in d if rebuilt.get(k) != d[k]}
+        obj.extra = extra or None
+        return obj
+
+    def to_dict(self):
+        d = {
+            "layer_6_behavior": build_behavior(dict(zip(BIG_FIVE_KEYS, self.scores))),
+            "layer_7_motivation": calculate_motivation({
+                "curiosity_score": self.resource_score,
+                "primary_driver": DRIVERS[self.driver],
+                "social_norm_flag": self.ryoshiki,
+            })
+        }
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def encode(self):
+        return self._STRUCT.pack(*self.scores, self.element, self.resource_score, self.resource_level,
+                                 self.vals_type, self.ryoshiki, self.driver) + _pack_extra(self.extra)
+
+    @classmethod
+    def decode(cls, buf):
+        v = cls._STRUCT.unpack_from(buf, 0)
+        extra, _ = _unpack_extra(buf, cls._STRUCT.size)
+        return cls(v[:5], *v[5:], extra=extra)
+
+
+# ---------------------------------------------------------
+# Tier 3
+# ---------------------------------------------------------
+class Tier3Result:
+    __slots__ = ("tier1_element", "distribution", "tier2_element", "relationship", "stress",
+                 "headline", "narrative", "advice", "extra")
+    _STRUCT = struct.Struct("<B4BBBB")
+
+    def __init__(self, tier1_element, distribution, tier2_element, relationship, stress, headline, narrative, advice, extra=None):
+        self.tier1_element, self.distribution, self.tier2_element = tier1_element, tuple(distribution), tier2_element
+        self.relationship, self.stress = relationship, stress
+        self.headline, self.narrative, self.advice = headline, narrative, advice
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, d):
+        """SolalendarTier3.integrate() の出力から作る"""
+        if "error" in d:
+            raise ValueError(f"Cannot encode an error result: {d['error']}")
+        gap, message = d.get("gap_analysis", {}), d.get("wisdom_message", {})
+        try:
+            fields = dict(
+                tier1_element=_code(ELEMENT_CODES, gap["tier1_element"]),
+                distribution=[gap["tier1_distribution"][e] for e in ELEMENTS],
+                tier2_element=_code(ELEMENT_CODES, gap["tier2_element"]),
+                relationship=_code(RELATIONSHIP_CODES, gap["relationship_type"]),
+                stress=_code(STRESS_CODES, gap["stress_level"]),
+            )
+        except (KeyError, ValueError, TypeError):
+            # モックなど gap が欠けている場合は gap を丸ごと extra に入れる
+            fields = dict(tier1_element=0, distribution=(0, 0, 0, 0), tier2_element=0, relationship=0, stress=0)
+        obj = cls(headline=str(message.get("headline", "")), narrative=str(message.get("narrative", "")),
+                  advice=str(message.get("actionable_advice", "")), **fields)
+        rebuilt = obj.to_dict()
+        extra = {k: d[k] for k in d if rebuilt.get(k) != d[k]}
+        obj.extra = extra or None
+        return obj
+
+    def to_dict(self):
+        d = {
+            "gap_analysis": {
+                "tier1_element": ELEMENT_CODES[self.tier1_element],
+                "tier1_distribution": dict(zip(ELEMENTS, self.distribution)),
+                "tier2_element": ELEMENT_CODES[self.tier2_element],
+                "relationship_type": RELATIONSHIP_CODES[self.relationship],
+                "stress_level": STRESS_CODES[self.stress]
+            },
+            "wisdom_message": {"headline": self.headline, "narrative": self.narrative, "actionable_advice": self.advice}
+        }
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def encode(self):
+        return (self._STRUCT.pack(self.tier1_element, *self.distribution, self.tier2_element, self.relationship, self.stress)
+                + _pack_str(self.headline) + _pack_str(self.narrative) + _pack_str(self.advice) + _pack_extra(self.extra))
+
+    @classmethod
+    def decode(cls, buf):
+        v = cls._STRUCT.unpack_from(buf, 0)
+        offset = cls._STRUCT.size
+        headline, offset = _unpack_str(buf, offset)
+        narrative, offset = _unpack_str(buf, offset)
+        advice, offset = _unpack_str(buf, offset)
+        extra, _ = _unpack_extra(buf, offset)
+        return cls(v[0], v[1:5], *v[5:], headline, narrative, advice, extra=extra)
+
+
+# ---------------------------------------------------------
+# Streams / Columns
+# ---------------------------------------------------------
+RESULT_TYPES = {1: Tier1Result, 2: Tier2Result, 3: Tier3Result}
+_TYPE_TAGS = {cls: tag for tag, cls in RESULT_TYPES.items()}
+_HEADER = struct.Struct("<BI")  # 型タグ, レコード長
+
+
+def write_stream(fp, results):
+    """results: iterable of Tier*Result -> バイナリファイルに追記（戻り値は件数）"""
+    count = 0
+    for result in results:
+        blob = result.encode()
+        fp.write(_HEADER.pack(_TYPE_TAGS[type(result)], len(blob)))
+        fp.write(blob)
+        count += 1
+    return count
+
+
+def read_stream(fp):
+    """write_stream で書いたファイルから 1 件ずつ取り出す"""
+    while True:
+        header = fp.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        tag, n = _HEADER.unpack(header)
+        yield RESULT_TYPES[tag].decode(fp.read(n))
+
+
+def to_columns(results):
+    """
+    同じ型の結果のリスト -> {列名: numpy 配列}（分析用、extra は含めない）。
+    Enum columns hold codes; decode them with SIGNS / ELEMENT_CODES / VALS_CODES etc.
+    np.savez_compressed(path, **columns) で保存できる。
+    """
+    import numpy as np
+    results = list(results)
+    if not results:
+        return {}
+    cls = type(results[0])
+    columns = {}
+    for name in cls.__slots__:
+        if name == "extra":
+            continue
+        values = [getattr(r, name) for r in results]
+        if isinstance(values[0], str):
+            columns[name] = np.array(values, dtype=object)
+        elif isinstance(values[0], tuple):
+            columns[name] = np.array(values, dtype=np.uint8)
+        elif isinstance(values[0], float):
+            columns[name] = np.array(values, dtype=np.float64)
+        elif isinstance(values[0], bool):
+            columns[name] = np.array(values, dtype=bool)
+        else:
+            # enum / 小さな整数は値の範囲に収まる最小の型にする（saturn_round は負もある）
+            arr = np.array(values)
+            columns[name] = arr.astype(np.result_type(np.min_scalar_type(arr.min()), np.min_scalar_type(arr.max())))
+    return columns
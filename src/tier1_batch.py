@@ -0,0 +1,103 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from tier1_engine import SolalendarTier1
+
+# ---------------------------------------------------------
+# Tier 1 Bulk Decoder (CLI)
+#   python tier1_batch.py members.csv --workers 8 -o out.jsonl
+#   python tier1_batch.py members.csv --store -o out.jsonl   (reuse the PSC profile store)
+# Input:  JSONL or CSV with name, year, month, day, hour, minute
+#         (+ optional lat, lng, tz_str)
+# Output: JSONL, one analyze() result per input record, same order
+# ---------------------------------------------------------
+INT_FIELDS = ("year", "month", "day", "hour", "minute")
+FLOAT_FIELDS = ("lat", "lng")
+STR_FIELDS = ("name", "tz_str")
+
+
+def normalize_record(raw):
+    """CSVの文字列やJSONの余計なキーを SolalendarTier1 の引数に揃える"""
+    record = {}
+    for key in INT_FIELDS:
+        record[key] = int(raw[key])
+    for key in FLOAT_FIELDS:
+        if raw.get(key) not in (None, ""):
+            record[key] = float(raw[key])
+    for key in STR_FIELDS:
+        if raw.get(key) not in (None, ""):
+            record[key] = str(raw[key])
+    record.setdefault("name", "")
+    return record
+
+
+def read_records(stream, fmt):
+    """JSONL / CSV を1行ずつ読み出す（全件をメモリに載せない）"""
+    if fmt == "csv":
+        rows = csv.DictReader(stream)
+    else:
+        rows = (line for line in stream if line.strip())
+
+    for raw in rows:
+        try:
+            if fmt != "csv":
+                raw = json.loads(raw)
+            yield normalize_record(raw)
+        except (KeyError, TypeError, ValueError) as e:
+            # 壊れた行も順序を保ったまま error として出力させる
+            yield {"error": f"Invalid record: {e}"}
+
+
+def _detect_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _decode_with_store(records, args):
+    """ブロック単位でストアを引き、未登録の出生だけを計算する"""
+    from tier1_store import PSCProfileStore, get_default_store
+    store = get_default_store() if args.store == "default" else PSCProfileStore(args.store)
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) >= args.store_block:
+            yield from store.decode_many(block, workers=args.workers, chunksize=args.chunksize)
+            block = []
+    if block:
+        yield from store.decode_many(block, workers=args.workers, chunksize=args.chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk Tier 1 (PSC) decoder")
+    parser.add_argument("input", help="JSONL or CSV file of birth records ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output path (default: stdout)")
+    parser.add_argument("-f", "--format", choices=["jsonl", "csv"], help="Input format (default: by extension)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Process pool size")
+    parser.add_argument("--chunksize", type=int, default=64, help="Records per worker task")
+    parser.add_argument("--chart-mode", choices=["swisseph", "kerykeion"], default="swisseph", help="Chart engine for Layer 3/5")
+    parser.add_argument("--store", nargs="?", const="default", help="Reuse/save results in the PSC profile store (optional SQLite path)")
+    parser.add_argument("--store-block", type=int, default=10000, help="Records per profile store lookup")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.input == "-" else _detect_format(args.input))
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    try:
+        records = (dict(r, chart_mode=args.chart_mode) if "error" not in r else r for r in read_records(src, fmt))
+        if args.store:
+            results = _decode_with_store(records, args)
+        else:
+            results = SolalendarTier1.analyze_many(records, workers=args.workers, chunksize=args.chunksize)
+        for result in results:
+            dst.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import importlib.util
+import os
+import swisseph as swe
+
+# ---------------------------------------------------------
+# Tier 1 Lean Chart Engine
+#   swe.calc_ut / swe.houses を直接呼び、レイヤーが要求した点だけを計算する。
+#   kerykeion AstrologicalSubject と同じ設定（Tropical / Geocentric / Placidus）
+# ---------------------------------------------------------
+POINTS = {
+    "Sun": swe.SUN,
+    "Moon": swe.MOON,
+    "Mercury": swe.MERCURY,
+    "Venus": swe.VENUS,
+    "Mars": swe.MARS,
+    "Jupiter": swe.JUPITER,
+    "Saturn": swe.SATURN,
+    "Uranus": swe.URANUS,
+    "Neptune": swe.NEPTUNE,
+    "Pluto": swe.PLUTO,
+}
+HOUSE_SYSTEM = b"P"
+CALC_FLAGS = swe.FLG_SWIEPH
+
+# kerykeion と同じ略称（Tier 1 の出力互換のため）
+SIGNS = ("Ari", "Tau", "Gem", "Can", "Leo", "Vir", "Lib", "Sco", "Sag", "Cap", "Aqu", "Pis")
+
+
+def configure_ephe_path():
+    """SOLALENDAR_EPHE_PATH か kerykeion 同梱の sweph を使う（無ければ Moshier）"""
+    path = os.environ.get("SOLALENDAR_EPHE_PATH")
+    if not path:
+        # find_spec なら kerykeion 本体を import せずに場所だけ分かる
+        spec = importlib.util.find_spec("kerykeion")
+        if spec and spec.origin:
+            path = os.path.join(os.path.dirname(spec.origin), "sweph")
+    if path and os.path.isdir(path):
+        swe.set_ephe_path(path)
+
+
+def sign_of(lon):
+    return SIGNS[int(lon // 30) % 12]
+
+
+configure_ephe_path()
+
+
+def julian_day_ut(utc_dt):
+    """kerykeion と同じく UTC の datetime から JD(UT) を求める"""
+    hour = utc_dt.hour + utc_dt.minute / 60.0 + utc_dt.second / 3600.0
+    return swe.julday(utc_dt.year, utc_dt.month, utc_dt.day, hour)
+
+
+def compute_chart(jd_ut, lat, lng, points=("Sun", "Moon"), ascendant=True):
+    """
+    必要な点だけを返す:
+    {"Sun": {"sign": "Sco", "lon": 11.5}, ..., "Ascendant": "Sco"}
+    lon is the position inside the sign (same as kerykeion's `position`).
+    """
+    chart = {}
+    for point in points:
+        abs_pos = swe.calc_ut(jd_ut, POINTS[point], CALC_FLAGS)[0][0]
+        chart[point] = {"sign": SIGNS[int(abs_pos // 30)], "lon": abs_pos % 30}
+
+    if ascendant:
+        cusps, _ = swe.houses(jd_ut, lat, lng, HOUSE_SYSTEM)
+        chart["Ascendant"] = SIGNS[int(cusps[0] // 30)]
+    return chart
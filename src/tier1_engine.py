@@ -1,9 +1,17 @@
+import asyncio
 import datetime
-import math
-import pytz
-import swisseph as swe
-from kerykeion import AstrologicalSubject
-from lunar_python import Solar, Lunar
+import metrics
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from tier1_chart import compute_chart, julian_day_ut, sign_of
+from tier1_lunar import get_built_table as get_lunar_table
+from tier1_tz import local_to_utc
+from tier1_numerology import STAGE_NAMES, life_path, pinnacle_range, pinnacles, reduce_number, reduce_single, stage_index
+
+# analyze() の meta.version（プロファイルストアのスキーマ版も兼ねる）
+ENGINE_VERSION = "Solalendar Tier1 v4.1"
+
 
 class SolalendarTier1:
     """
@@ -11,7 +19,7 @@ class SolalendarTier1:
     Added: Layer 2 'The Pinnacles' (Life Chapters)
     """
 
-    def __init__(self, name, year, month, day, hour, minute, lat=35.6895, lng=139.6917, tz_str="Asia/Tokyo"):
+    def __init__(self, name, year, month, day, hour, minute, lat=35.6895, lng=139.6917, tz_str="Asia/Tokyo", chart_mode="swisseph"):
         self.name = name
         self.year = year
         self.month = month
@@ -21,104 +29,115 @@ class SolalendarTier1:
         self.lat = lat
         self.lng = lng
         self.tz_str = tz_str
+        # "swisseph": lean direct path / "kerykeion": AstrologicalSubject (compat)
+        self.chart_mode = chart_mode
         
-        # Datetime Setup
-        local = pytz.timezone(tz_str)
-        local_dt = local.localize(datetime.datetime(year, month, day, hour, minute))
-        self.utc_dt = local_dt.astimezone(pytz.utc)
         self.current_year = datetime.datetime.now().year
-        self.current_age = self.current_year - self.year
         
-        # Layer 0: JDN Calculation
-        self.jul_day_ut = swe.julday(year, month, day, hour + minute/60.0 - 9.0)
+        # 各ノードの (入力キー, 値, 版) を保持し、入力が変わったノードだけ再計算する
+        self._memo = {}
+        self.recomputed = []
+        # Datetime Setup / Layer 0 は入力チェックを兼ねて即時に解決しておく
+        self._resolve("jdn")
 
     # ---------------------------------------------------------
-    # Helper: Numerology Reducer
+    # Layer Dependency Graph
+    #   node: (input attributes, upstream nodes, method)
+    #   method は上流ノードの値を位置引数で受け取る。
+    #   name はどの数値にも使われないので、どのノードの入力にも含めない。
+    # ---------------------------------------------------------
+    LAYER_GRAPH = {
+        "utc_dt": (("tz_str", "year", "month", "day", "hour", "minute"), (), "_compute_utc_dt"),
+        "jdn": ((), ("utc_dt",), "_compute_jdn"),
+        "lpn": (("year", "month", "day"), (), "_calculate_lpn"),
+        "infra": (("year", "month", "day", "current_year"), ("lpn",), "_get_infra_layer"),
+        "planets": (("chart_mode", "lat", "lng", "year", "month", "day", "hour", "minute", "tz_str"), ("utc_dt",), "_get_planetary_layers"),
+        "runtime": (("year", "month", "day"), (), "_get_runtime_layer"),
+    }
+
+    def _resolve(self, node):
+        """node の値を返す（入力と上流の版が前回と同じならメモを返す）"""
+        attrs, upstream, method = self.LAYER_GRAPH[node]
+        deps = [self._resolve(u) for u in upstream]
+        key = tuple(getattr(self, a) for a in attrs) + tuple(self._memo[u][2] for u in upstream)
+        memo = self._memo.get(node)
+        if memo is not None and memo[0] == key:
+            return memo[1]
+
+        with metrics.span(f"tier1.{node}"):
+            value = getattr(self, method)(*deps)
+        version = memo[2] + 1 if memo is not None else 0
+        self._memo[node] = (key, value, version)
+        self.recomputed.append(node)
+        return value
+
+    def _compute_utc_dt(self):
+        # Datetime Setup (cached per-zone transition tables, see tier1_tz)
+        return local_to_utc(self.tz_str, self.year, self.month, self.day, self.hour, self.minute)
+
+    def _compute_jdn(self, utc_dt):
+        # Layer 0: JDN Calculation (from the birthplace's UTC time)
+        return julian_day_ut(utc_dt)
+
+    @property
+    def utc_dt(self):
+        return self._resolve("utc_dt")
+
+    @property
+    def jul_day_ut(self):
+        return self._resolve("jdn")
+
+    @property
+    def current_age(self):
+        return self.current_year - self.year
+
+    @current_age.setter
+    def current_age(self, age):
+        self.current_year = self.year + age
+
+    # ---------------------------------------------------------
+    # Helper: Numerology Reducer (table lookups, see tier1_numerology)
     # ---------------------------------------------------------
     def _reduce(self, n):
         """Standard recursive reduction (11, 22, 33 preserved)"""
-        while n > 9 and n not in [11, 22, 33]:
-            n = sum(int(d) for d in str(n))
-        return n
+        return reduce_number(n)
     
     def _reduce_single(self, n):
         """Force reduction to single digit (for Pinnacle calc base)"""
-        while n > 9:
-            n = sum(int(d) for d in str(n))
-        return n
+        return reduce_single(n)
 
     # ---------------------------------------------------------
     # Layer 1: BIOS (Numerology)
     # ---------------------------------------------------------
     def _calculate_lpn(self):
         # Sum of Y+M+D
-        total = self.year + self.month + self.day
-        lpn = self._reduce(total)
-        return lpn
+        return life_path(self.year, self.month, self.day)
 
     # ---------------------------------------------------------
     # Layer 2: Infra (Cycles & Pinnacles)
     # ---------------------------------------------------------
     def _get_infra_layer(self, lpn):
-        # 1. Planetary Cycles (Saturn/Jupiter)
-        saturn_cycle_count = int(self.current_age // 29.5) + 1
-        jupiter_phase = self.current_age % 12
-        
-        # 2. The Pinnacles (Life Chapters)
-        # Base numbers (Single digit reduction required for calculation)
-        m_base = self._reduce_single(self.month)
-        d_base = self._reduce_single(self.day)
-        y_base = self._reduce_single(self.year)
-        
-        # Calculate 4 Pinnacles
-        pin1 = self._reduce(m_base + d_base)
-        pin2 = self._reduce(d_base + y_base)
-        pin3 = self._reduce(pin1 + pin2)
-        pin4 = self._reduce(m_base + y_base)
-        
-        # Calculate Timeline (Ages)
-        # 1st Pinnacle ends at (36 - LPN)
-        # If LPN is Master Number, reduce it for calculation (e.g. 11->2, 22->4)
-        lpn_single = self._reduce_single(lpn)
-        age_end_1 = 36 - lpn_single
-        age_end_2 = age_end_1 + 9
-        age_end_3 = age_end_2 + 9
-        
-        # Identify Current Stage
-        current_pin = 0
-        stage_name = ""
-        if self.current_age <= age_end_1:
-            current_pin = pin1
-            stage_name = "1st Pinnacle (Formation)"
-            range_str = f"Age 0 - {age_end_1}"
-        elif self.current_age <= age_end_2:
-            current_pin = pin2
-            stage_name = "2nd Pinnacle (Production)"
-            range_str = f"Age {age_end_1+1} - {age_end_2}"
-        elif self.current_age <= age_end_3:
-            current_pin = pin3
-            stage_name = "3rd Pinnacle (Maturation)"
-            range_str = f"Age {age_end_2+1} - {age_end_3}"
-        else:
-            current_pin = pin4
-            stage_name = "4th Pinnacle (Integration)"
-            range_str = f"Age {age_end_3+1}+"
-
-        return {
-            "saturn_cycle": f"Round {saturn_cycle_count}",
-            "jupiter_phase": f"Year {jupiter_phase}/12",
-            "pinnacle": {
-                "current_number": current_pin,
-                "current_stage": stage_name,
-                "period_range": range_str,
-                "all_pins": [pin1, pin2, pin3, pin4]
-            }
-        }
+        return infra_layer(self.year, self.month, self.day, self.current_age, lpn)
 
     # ---------------------------------------------------------
     # Layer 3 & 5: Env & Skin
     # ---------------------------------------------------------
-    def _get_planetary_layers(self):
+    def _get_planetary_layers(self, utc_dt=None):
+        if self.chart_mode == "swisseph":
+            jd = julian_day_ut(utc_dt or self.utc_dt)
+            # 1900-2100 の Sun / Moon は mmap テーブルを O(1) で引く（未生成・範囲外は swisseph）。
+            # Ascendant は観測地に依存するので常に swe.houses
+            from tier1_ephemeris import get_built_table
+            table = get_built_table()
+            if table is not None and table.covers(jd, "Sun") and table.covers(jd, "Moon"):
+                chart = compute_chart(jd, self.lat, self.lng, points=(), ascendant=True)
+                for point in ("Sun", "Moon"):
+                    abs_pos = table.longitude(point, jd)
+                    chart[point] = {"sign": sign_of(abs_pos), "lon": abs_pos % 30}
+                return chart
+            return compute_chart(jd, self.lat, self.lng, points=("Sun", "Moon"), ascendant=True)
+
+        from kerykeion import AstrologicalSubject
         subj = AstrologicalSubject(self.name, self.year, self.month, self.day, self.hour, self.minute, lat=self.lat, lng=self.lng, tz_str=self.tz_str, online=False)
         return {
             "Sun": {"sign": subj.sun.sign, "lon": subj.sun.position},
@@ -126,10 +145,29 @@ class SolalendarTier1:
             "Ascendant": subj.first_house.sign
         }
 
+    @staticmethod
+    def lookup_longitudes(body, jds):
+        """
+        Vectorized ephemeris lookup (1900-2100) from the mmap tables.
+        body: "Sun", "Moon", ... / jds: array of Julian days (UT)
+        テーブルは事前に作っておく: python tier1_ephemeris.py build
+        """
+        from tier1_ephemeris import get_built_table
+        table = get_built_table()
+        if table is None:
+            raise RuntimeError("Ephemeris tables are not built; run `python tier1_ephemeris.py build`")
+        return table.longitudes(body, jds)
+
     # ---------------------------------------------------------
     # Layer 4: Runtime
     # ---------------------------------------------------------
     def _get_runtime_layer(self):
+        # 1900-2100 は日単位テーブルを O(1) で引く（未生成・範囲外は lunar_python で変換）
+        table = get_lunar_table()
+        if table is not None and table.covers(self.year, self.month, self.day):
+            return table.day_info(self.year, self.month, self.day)
+
+        from lunar_python import Solar
         solar = Solar.fromYmd(self.year, self.month, self.day)
         lunar = solar.getLunar()
         return {
@@ -142,13 +180,19 @@ class SolalendarTier1:
     # MAIN ANALYZE
     # ---------------------------------------------------------
     def analyze(self):
-        lpn = self._calculate_lpn()
-        infra = self._get_infra_layer(lpn)
-        planets = self._get_planetary_layers()
-        runtime = self._get_runtime_layer()
+        """
+        Layer 0-5 を返す。2回目以降は入力が変わったノードだけを再計算する
+        (self.recomputed に今回再計算したノード名が入る)。
+        """
+        self.recomputed = []
+        with metrics.span("tier1.analyze"):
+            lpn = self._resolve("lpn")
+            infra = self._resolve("infra")
+            planets = self._resolve("planets")
+            runtime = self._resolve("runtime")
         
         return {
-            "meta": {"version": "Solalendar Tier1 v4.1", "type": "PSC_Decode"},
+            "meta": {"version": ENGINE_VERSION, "type": "PSC_Decode"},
             "layer_0_kernel": {
                 "desc": "The Absolute",
                 "jdn": self.jul_day_ut,
@@ -176,4 +220,106 @@ class SolalendarTier1:
                 "desc": "Interface",
                 "ascendant": planets["Ascendant"]
             }
-        }
\ No newline at end of file
+        }
+
+    def refresh(self, current_year=None):
+        """
+        Nightly refresh: 年が変わった時点で年齢依存の Layer 2 (Saturn/Jupiter/Pinnacle) だけを更新する。
+        Chart and lunar layers are served from the memo.
+        """
+        self.current_year = current_year or datetime.datetime.now().year
+        return self.analyze()
+
+    async def analyze_async(self, executor=None):
+        """
+        analyze() を executor 上で実行する（イベントループを塞がない）。
+        executor=None uses the loop's default thread pool; pass a ProcessPoolExecutor for CPU isolation.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.analyze)
+
+    # ---------------------------------------------------------
+    # BATCH ANALYZE
+    # ---------------------------------------------------------
+    @classmethod
+    def analyze_many(cls, records, workers=None, chunksize=64):
+        """
+        Decode many birth records across a process pool.
+        records: iterable of dicts with the __init__ keyword arguments.
+        Results are yielded in input order; a failed record yields {"error": ...}.
+        Only a bounded window of chunks is in flight, so memory stays flat.
+        """
+        workers = workers or os.cpu_count() or 1
+        chunks = _chunked(records, chunksize)
+
+        if workers == 1:
+            for chunk in chunks:
+                yield from _analyze_chunk(chunk)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_analyze_chunk, chunk))
+                # 先頭のチャンクから順に吐き出す（順序保証 + 滞留上限）
+                while len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+
+# ---------------------------------------------------------
+# Layer 2 builder (module level: the profile store re-derives it per read)
+# ---------------------------------------------------------
+def infra_layer(year, month, day, current_age, lpn):
+    # 1. Planetary Cycles (Saturn/Jupiter)
+    saturn_cycle_count = int(current_age // 29.5) + 1
+    jupiter_phase = current_age % 12
+    
+    # 2. The Pinnacles (Life Chapters) + Timeline (1st ends at 36 - LPN)
+    pins, age_ends = pinnacles(year, month, day, lpn)
+    
+    # Identify Current Stage
+    stage = stage_index(current_age, age_ends)
+    current_pin = pins[stage]
+    stage_name = STAGE_NAMES[stage]
+    range_str = pinnacle_range(stage, age_ends)
+
+    return {
+        "saturn_cycle": f"Round {saturn_cycle_count}",
+        "jupiter_phase": f"Year {jupiter_phase}/12",
+        "pinnacle": {
+            "current_number": current_pin,
+            "current_stage": stage_name,
+            "period_range": range_str,
+            "all_pins": list(pins)
+        }
+    }
+
+
+# ---------------------------------------------------------
+# Batch Workers (module level so they can be pickled)
+# ---------------------------------------------------------
+def _chunked(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _analyze_chunk(chunk):
+    results = []
+    for record in chunk:
+        if "error" in record:
+            # 入力段階で壊れていたレコードはそのまま返す
+            results.append(record)
+            continue
+        try:
+            results.append(SolalendarTier1(**record).analyze())
+        except Exception as e:
+            results.append({"error": str(e)})
+    return results
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import tempfile
+import numpy as np
+import swisseph as swe
+from tier1_chart import configure_ephe_path, sign_of
+
+# ---------------------------------------------------------
+# Tier 1 Ephemeris Tables (1900-2100)
+#   Geocentric tropical longitudes stored as piecewise Chebyshev
+#   coefficients, one .npy per body, opened with mmap so every
+#   worker process shares the same page cache.
+#   Accuracy: |table - swe.calc_ut| <= tolerance per body (checked by verify())
+# ---------------------------------------------------------
+JD_START = 2415020.5  # 1900-01-01 00:00 UT
+JD_END = 2488434.5    # 2101-01-01 00:00 UT
+DEGREE = 12
+
+# body: (swisseph id, segment length in days, tolerance in degrees)
+# 惑星は太陽との合の前後で光の偏向補正が急変するため 1e-3 度(3.6")止まり
+BODIES = {
+    "Sun": (swe.SUN, 16, 1e-6),
+    "Moon": (swe.MOON, 4, 1e-6),
+    "Mercury": (swe.MERCURY, 8, 1e-3),
+    "Venus": (swe.VENUS, 16, 1e-3),
+    "Mars": (swe.MARS, 16, 1e-3),
+    "Jupiter": (swe.JUPITER, 32, 1e-3),
+    "Saturn": (swe.SATURN, 32, 1e-3),
+    "Uranus": (swe.URANUS, 64, 1e-3),
+    "Neptune": (swe.NEPTUNE, 64, 1e-3),
+    "Pluto": (swe.PLUTO, 64, 1e-3),
+}
+
+DEFAULT_DIR = os.environ.get(
+    "SOLALENDAR_EPHEMERIS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ephemeris"),
+)
+
+
+# ---------------------------------------------------------
+# Build
+# ---------------------------------------------------------
+def _fit_body(body_id, seg_days, jd_start=JD_START, jd_end=JD_END):
+    n_seg = int(np.ceil((jd_end - jd_start) / seg_days))
+    # Chebyshev nodes (1st kind) on [-1, 1]
+    k = np.arange(DEGREE + 1)
+    x = np.cos(np.pi * (k + 0.5) / (DEGREE + 1))[::-1]
+    coeffs = np.empty((n_seg, DEGREE + 1), dtype=np.float64)
+
+    for i in range(n_seg):
+        jd0 = jd_start + i * seg_days
+        jds = jd0 + (x + 1.0) * (seg_days / 2.0)
+        lons = np.array([swe.calc_ut(jd, body_id, swe.FLG_SWIEPH)[0][0] for jd in jds])
+        # 0/360 をまたぐ区間は連続化してからフィット
+        lons = np.degrees(np.unwrap(np.radians(lons)))
+        coeffs[i] = np.polynomial.chebyshev.chebfit(x, lons, DEGREE)
+    return coeffs
+
+
+def _replace_atomically(path, write):
+    """同じディレクトリの一意な一時ファイルに書いてから置き換える（並行ビルドでも混ざらない）"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_tables(out_dir=DEFAULT_DIR, bodies=None, jd_start=JD_START, jd_end=JD_END):
+    """jd_start / jd_end はテスト用に狭い範囲で作るときだけ変える"""
+    configure_ephe_path()
+    os.makedirs(out_dir, exist_ok=True)
+    meta = {"jd_start": jd_start, "jd_end": jd_end, "degree": DEGREE, "swisseph": swe.version, "bodies": {}}
+    # 一部の天体だけ作り直すときは、生成済みの他の天体を meta に残す
+    meta_path = os.path.join(out_dir, "meta.json")
+    if bodies and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            old = json.load(f)
+        if (old["jd_start"], old["jd_end"], old["degree"]) == (jd_start, jd_end, DEGREE):
+            meta["bodies"].update(old["bodies"])
+
+    for body in bodies or BODIES:
+        body_id, seg_days, _ = BODIES[body]
+        path = os.path.join(out_dir, f"{body.lower()}.npy")
+        coeffs = _fit_body(body_id, seg_days, jd_start, jd_end)
+        _replace_atomically(path, lambda f: np.save(f, coeffs))  # 並行ワーカーが中途半端なファイルを読まないように
+        meta["bodies"][body] = {"segment_days": seg_days, "file": os.path.basename(path)}
+
+    _replace_atomically(meta_path, lambda f: f.write(json.dumps(meta, indent=2).encode("utf-8")))
+    return meta
+
+
+# ---------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------
+class EphemerisTable:
+    def __init__(self, table_dir=DEFAULT_DIR):
+        with open(os.path.join(table_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.jd_start = self.meta["jd_start"]
+        self.jd_end = self.meta["jd_end"]
+        self._coeffs = {}
+        self._seg_days = {}
+        for body, info in self.meta["bodies"].items():
+            self._coeffs[body] = np.load(os.path.join(table_dir, info["file"]), mmap_mode="r")
+            self._seg_days[body] = info["segment_days"]
+
+    def covers(self, jd, body=None):
+        return self.jd_start <= jd < self.jd_end and (body is None or body in self._coeffs)
+
+    def _body(self, body):
+        if body not in self._coeffs:
+            raise ValueError(f"No ephemeris table for {body!r} (built: {', '.join(self._coeffs) or 'none'})")
+        return self._coeffs[body], self._seg_days[body]
+
+    def longitude(self, body, jd):
+        """O(1): 区間を特定して Clenshaw で評価（スカラー版）"""
+        coeffs, seg_days = self._body(body)
+        if not self.covers(jd):
+            raise ValueError(f"JD {jd} outside table range {self.jd_start}-{self.jd_end}")
+        i = int((jd - self.jd_start) // seg_days)
+        c = coeffs[i].tolist()
+        x = 2.0 * (jd - self.jd_start - i * seg_days) / seg_days - 1.0
+
+        b1 = b2 = 0.0
+        for ck in reversed(c[1:]):
+            b1, b2 = 2.0 * x * b1 - b2 + ck, b1
+        return (x * b1 - b2 + c[0]) % 360.0
+
+    def longitudes(self, body, jds):
+        """Vectorized: array of Julian days -> array of longitudes"""
+        coeffs, seg_days = self._body(body)
+        jds = np.asarray(jds, dtype=np.float64)
+        if jds.size and (jds.min() < self.jd_start or jds.max() >= self.jd_end):
+            raise ValueError(f"JD outside table range {self.jd_start}-{self.jd_end}")
+        idx = ((jds - self.jd_start) // seg_days).astype(np.intp)
+        c = coeffs[idx]
+        x = 2.0 * (jds - self.jd_start - idx * seg_days) / seg_days - 1.0
+
+        b1 = np.zeros_like(x)
+        b2 = np.zeros_like(x)
+        for k in range(c.shape[1] - 1, 0, -1):
+            b1, b2 = 2.0 * x * b1 - b2 + c[:, k], b1
+        return np.mod(x * b1 - b2 + c[:, 0], 360.0)
+
+    def sign(self, body, jd):
+        return sign_of(self.longitude(body, jd))
+
+    def signs(self, body, jds):
+        """Vectorized sign index (0=Ari ... 11=Pis)"""
+        return (self.longitudes(body, jds) // 30).astype(np.int8) % 12
+
+
+_TABLE = None
+
+
+def get_table(table_dir=DEFAULT_DIR, build=False):
+    """プロセス内で1つだけ開く。build=True なら未生成時に作成する"""
+    global _TABLE
+    if _TABLE is None:
+        if build and not os.path.exists(os.path.join(table_dir, "meta.json")):
+            build_tables(table_dir)
+        _TABLE = EphemerisTable(table_dir)
+    return _TABLE
+
+
+def get_built_table(table_dir=DEFAULT_DIR):
+    """生成済みならテーブルを、未生成なら None を返す（呼び出し側は swisseph にフォールバック）"""
+    if _TABLE is None and not os.path.exists(os.path.join(table_dir, "meta.json")):
+        return None
+    return get_table(table_dir)
+
+
+def verify(table_dir=DEFAULT_DIR, samples=20000, seed=0):
+    """ランダムな JD で swisseph と比較し、天体ごとの最大誤差(度)を返す"""
+    configure_ephe_path()
+    table = EphemerisTable(table_dir)
+    rng = np.random.default_rng(seed)
+    jds = rng.uniform(table.jd_start, table.jd_end, samples)
+    report = {}
+    for body in table.meta["bodies"]:
+        body_id = BODIES[body][0]
+        ref = np.array([swe.calc_ut(jd, body_id, swe.FLG_SWIEPH)[0][0] for jd in jds])
+        diff = np.abs((table.longitudes(body, jds) - ref + 180.0) % 360.0 - 180.0)
+        report[body] = float(diff.max())
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build / verify Tier 1 ephemeris tables (1900-2100)")
+    parser.add_argument("command", choices=["build", "verify"])
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--bodies", nargs="+", choices=sorted(BODIES), help="Build only these bodies (Tier 1 needs Sun Moon)")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(json.dumps(build_tables(args.dir, args.bodies), indent=2))
+    else:
+        report = verify(args.dir, args.samples)
+        failed = False
+        for body, err in report.items():
+            tolerance = BODIES[body][2]
+            failed = failed or err > tolerance
+            print(f"{body:8s} max_err={err:.2e} deg (tol {tolerance:.0e})  {'OK' if err <= tolerance else 'FAIL'}")
+        if failed:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
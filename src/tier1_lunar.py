@@ -0,0 +1,193 @@
+import argparse
+import datetime
+import json
+import mmap
+import os
+import tempfile
+
+# ---------------------------------------------------------
+# Tier 1 Lunar Day Table (1900-2100)
+#   Layer 4 が使う「日の干支・納音・旧暦の月日」を日単位の固定長レコードで保存し、
+#   mmap で開いて添字だけで引く（lunar_python は生成時と検証時にしか使わない）。
+#   1 record = 3 bytes: [干支 index 0..59, 旧暦月 (閏月は負, int8), 旧暦日]
+#   python tier1_lunar.py build | verify [--step N]
+#   デプロイ時に build しておく。未生成の間は Layer 4 が lunar_python で計算する
+# ---------------------------------------------------------
+DATE_START = datetime.date(1900, 1, 1)
+DATE_END = datetime.date(2101, 1, 1)  # exclusive
+RECORD_SIZE = 3
+
+DEFAULT_DIR = os.environ.get(
+    "SOLALENDAR_LUNAR_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lunar"),
+)
+DATA_FILE = "lunar_days.bin"
+
+
+def _replace_atomically(path, data):
+    """同じディレクトリの一意な一時ファイルに書いてから置き換える（並行ビルドでも混ざらない）"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _jdn(date):
+    """その日の正午のユリウス日（整数）"""
+    return date.toordinal() + 1721425
+
+
+# ---------------------------------------------------------
+# Build
+# ---------------------------------------------------------
+def build_table(out_dir=DEFAULT_DIR):
+    from lunar_python import LunarYear, Solar
+    from lunar_python.util import LunarUtil
+
+    jd_start, jd_end = _jdn(DATE_START), _jdn(DATE_END)
+    records = bytearray(RECORD_SIZE * (jd_end - jd_start))
+    filled = 0
+
+    # 旧暦年ごとに月の初日と日数を取り出して日単位に展開する
+    for year in range(DATE_START.year - 1, DATE_END.year + 1):
+        for month in LunarYear.fromYear(year).getMonths():
+            first = int(month.getFirstJulianDay())
+            for day in range(month.getDayCount()):
+                jd = first + day
+                if jd_start <= jd < jd_end:
+                    i = (jd - jd_start) * RECORD_SIZE
+                    records[i + 1] = month.getMonth() & 0xFF
+                    records[i + 2] = day + 1
+
+    # 日の干支は 60 日周期なので、基準日 1 日ぶんから決まる
+    ganzhi_start = LunarUtil.JIA_ZI.index(Solar.fromYmd(DATE_START.year, DATE_START.month, DATE_START.day).getLunar().getDayInGanZhi())
+    for n in range(jd_end - jd_start):
+        records[n * RECORD_SIZE] = (ganzhi_start + n) % 60
+        filled += records[n * RECORD_SIZE + 2] != 0
+    if filled != jd_end - jd_start:
+        raise RuntimeError(f"Lunar table incomplete: {filled}/{jd_end - jd_start} days")
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, DATA_FILE)
+    _replace_atomically(path, records)  # 並行ワーカーが中途半端なファイルを読まないように
+
+    meta = {
+        "date_start": DATE_START.isoformat(),
+        "date_end": DATE_END.isoformat(),
+        "record_size": RECORD_SIZE,
+        "file": DATA_FILE,
+        "ganzhi": list(LunarUtil.JIA_ZI),
+        "nayin": [LunarUtil.NAYIN[g] for g in LunarUtil.JIA_ZI],
+    }
+    _replace_atomically(os.path.join(out_dir, "meta.json"), json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"))
+    return {k: meta[k] for k in ("date_start", "date_end", "file")}
+
+
+# ---------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------
+class LunarTable:
+    def __init__(self, table_dir=DEFAULT_DIR):
+        with open(os.path.join(table_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.ordinal_start = datetime.date.fromisoformat(self.meta["date_start"]).toordinal()
+        self.ordinal_end = datetime.date.fromisoformat(self.meta["date_end"]).toordinal()
+        self.ganzhi_names = self.meta["ganzhi"]
+        self.nayin_names = self.meta["nayin"]
+        with open(os.path.join(table_dir, self.meta["file"]), "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def covers(self, year, month, day):
+        try:
+            ordinal = datetime.date(year, month, day).toordinal()
+        except ValueError:
+            return False
+        return self.ordinal_start <= ordinal < self.ordinal_end
+
+    def record(self, year, month, day):
+        """O(1): (干支 index, 旧暦月 (閏月は負), 旧暦日)"""
+        n = datetime.date(year, month, day).toordinal() - self.ordinal_start
+        if not 0 <= n < self.ordinal_end - self.ordinal_start:
+            raise ValueError(f"{year}-{month}-{day} outside lunar table range")
+        i = n * RECORD_SIZE
+        ganzhi, lunar_month, lunar_day = self._data[i:i + RECORD_SIZE]
+        return ganzhi, lunar_month - 256 if lunar_month > 127 else lunar_month, lunar_day
+
+    def day_info(self, year, month, day):
+        """Layer 4 と同じ形: {"eto_day", "nayin", "lunar_date"}"""
+        ganzhi, lunar_month, lunar_day = self.record(year, month, day)
+        return {
+            "eto_day": self.ganzhi_names[ganzhi],
+            "nayin": self.nayin_names[ganzhi],
+            "lunar_date": f"{lunar_month}月{lunar_day}日"
+        }
+
+    def as_array(self):
+        """バッチ用: (days, 3) の int8 配列ビュー（コピーなし）"""
+        import numpy as np
+        return np.frombuffer(self._data, dtype=np.int8).reshape(-1, RECORD_SIZE)
+
+
+_TABLE = None
+
+
+def get_table(table_dir=DEFAULT_DIR, build=False):
+    """プロセス内で1つだけ開く。build=True なら未生成時に作成する"""
+    global _TABLE
+    if _TABLE is None:
+        if build and not os.path.exists(os.path.join(table_dir, "meta.json")):
+            build_table(table_dir)
+        _TABLE = LunarTable(table_dir)
+    return _TABLE
+
+
+def get_built_table(table_dir=DEFAULT_DIR):
+    """生成済みならテーブルを、未生成なら None を返す（呼び出し側は lunar_python にフォールバック）"""
+    if _TABLE is None and not os.path.exists(os.path.join(table_dir, "meta.json")):
+        return None
+    return get_table(table_dir)
+
+
+def verify(table_dir=DEFAULT_DIR, step=1):
+    """lunar_python と日ごとに突き合わせる（step=1 で全期間）"""
+    from lunar_python import Solar
+    table = LunarTable(table_dir)
+    checked, mismatches = 0, []
+    for ordinal in range(table.ordinal_start, table.ordinal_end, step):
+        date = datetime.date.fromordinal(ordinal)
+        lunar = Solar.fromYmd(date.year, date.month, date.day).getLunar()
+        expected = {
+            "eto_day": lunar.getDayInGanZhi(),
+            "nayin": lunar.getDayNaYin(),
+            "lunar_date": f"{lunar.getMonth()}月{lunar.getDay()}日"
+        }
+        got = table.day_info(date.year, date.month, date.day)
+        checked += 1
+        if got != expected:
+            mismatches.append({"date": date.isoformat(), "table": got, "lunar_python": expected})
+    return {"checked": checked, "mismatches": mismatches}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build / verify the Tier 1 lunar day table (1900-2100)")
+    parser.add_argument("command", choices=["build", "verify"])
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    parser.add_argument("--step", type=int, default=1, help="Check every N-th day (verify)")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(json.dumps(build_table(args.dir), indent=2))
+    else:
+        report = verify(args.dir, args.step)
+        print(json.dumps({"checked": report["checked"], "mismatches": len(report["mismatches"])}))
+        for row in report["mismatches"][:20]:
+            print(json.dumps(row, ensure_ascii=False))
+        raise SystemExit(1 if report["mismatches"] else 0)
+
+
+if __name__ == "__main__":
+    main()
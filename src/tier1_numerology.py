@@ -0,0 +1,200 @@
+import argparse
+import time
+
+# ---------------------------------------------------------
+# Tier 1 Numerology Kernel (Layer 1 LPN / Layer 2 Pinnacles)
+#   縮約の入力は 年+月+日 程度の小さな整数なので、0..TABLE_SIZE-1 の縮約結果を
+#   起動時に一度だけ表にしておき、あとは引くだけにする。
+#   スカラー版は list の添字、ベクトル版は numpy の fancy indexing。
+#   python tier1_numerology.py --n 1000000
+# ---------------------------------------------------------
+MASTER_NUMBERS = (11, 22, 33)
+TABLE_SIZE = 10100  # 年 9999 + 月 + 日 まで収まる（それ以上はスカラー版のみループで処理）
+STAGE_NAMES = (
+    "1st Pinnacle (Formation)",
+    "2nd Pinnacle (Production)",
+    "3rd Pinnacle (Maturation)",
+    "4th Pinnacle (Integration)",
+)
+
+
+def _build_tables(size):
+    digit_sum = [0] * size
+    for n in range(1, size):
+        digit_sum[n] = digit_sum[n // 10] + n % 10
+
+    reduce_table = list(range(size))
+    single_table = list(range(size))
+    for n in range(10, size):
+        # 桁和は n より小さいので、すでに確定した値を引ける
+        s = digit_sum[n]
+        reduce_table[n] = n if n in MASTER_NUMBERS else reduce_table[s]
+        single_table[n] = single_table[s]
+    return reduce_table, single_table
+
+
+REDUCE_TABLE, SINGLE_TABLE = _build_tables(TABLE_SIZE)
+
+
+# ---------------------------------------------------------
+# Scalar API
+# ---------------------------------------------------------
+def reduce_number(n):
+    """Standard reduction (11, 22, 33 preserved)"""
+    if 0 <= n < TABLE_SIZE:
+        return REDUCE_TABLE[n]
+    while n > 9 and n not in MASTER_NUMBERS:
+        n = sum(int(d) for d in str(n))
+    return n
+
+
+def reduce_single(n):
+    """Force reduction to a single digit (Pinnacle base)"""
+    if 0 <= n < TABLE_SIZE:
+        return SINGLE_TABLE[n]
+    while n > 9:
+        n = sum(int(d) for d in str(n))
+    return n
+
+
+def life_path(year, month, day):
+    return reduce_number(year + month + day)
+
+
+def pinnacles(year, month, day, lpn=None):
+    """
+    Returns (pins, age_ends): pins = (pin1..pin4), age_ends = (end1, end2, end3).
+    Pass lpn if it is already known.
+    """
+    m_base, d_base, y_base = reduce_single(month), reduce_single(day), reduce_single(year)
+    pin1 = reduce_number(m_base + d_base)
+    pin2 = reduce_number(d_base + y_base)
+    pin3 = reduce_number(pin1 + pin2)
+    pin4 = reduce_number(m_base + y_base)
+
+    # 1st Pinnacle ends at (36 - LPN); master numbers are reduced (11->2, 22->4)
+    lpn = life_path(year, month, day) if lpn is None else lpn
+    age_end_1 = 36 - reduce_single(lpn)
+    return (pin1, pin2, pin3, pin4), (age_end_1, age_end_1 + 9, age_end_1 + 18)
+
+
+def stage_index(age, age_ends):
+    """0..3 (which Pinnacle the given age falls in)"""
+    for i, end in enumerate(age_ends):
+        if age <= end:
+            return i
+    return 3
+
+
+def pinnacle_range(stage, age_ends):
+    """Period label for a stage: Age 0 - 33 / Age 34 - 42 / ... / Age 52+"""
+    if stage == 0:
+        return f"Age 0 - {age_ends[0]}"
+    if stage < 3:
+        return f"Age {age_ends[stage - 1] + 1} - {age_ends[stage]}"
+    return f"Age {age_ends[2] + 1}+"
+
+
+# ---------------------------------------------------------
+# Vectorized API (columnar)
+# ---------------------------------------------------------
+_NP_TABLES = None
+
+
+def _np_tables():
+    global _NP_TABLES
+    if _NP_TABLES is None:
+        import numpy as np
+        _NP_TABLES = (np.asarray(REDUCE_TABLE, dtype=np.uint8), np.asarray(SINGLE_TABLE, dtype=np.uint8))
+    return _NP_TABLES
+
+
+def numerology_columns(years, months, days, ages):
+    """
+    years / months / days / ages: array-likes of the same length.
+    Returns a dict of numpy arrays:
+      lpn, pin1..pin4, age_end_1..age_end_3, stage (0..3), current_pin
+    """
+    import numpy as np
+    reduce_t, single_t = _np_tables()
+    years = np.asarray(years, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    ages = np.asarray(ages)
+
+    lpn = reduce_t[years + months + days]
+    m_base, d_base, y_base = single_t[months], single_t[days], single_t[years]
+    # 基数は 1 桁なので和は 18 以下、pin 同士の和も 66 以下 -> uint8 のまま引ける
+    pin1 = reduce_t[m_base + d_base]
+    pin2 = reduce_t[d_base + y_base]
+    pin3 = reduce_t[pin1 + pin2]
+    pin4 = reduce_t[m_base + y_base]
+
+    age_end_1 = 36 - single_t[lpn].astype(np.int16)
+    age_end_2 = age_end_1 + 9
+    age_end_3 = age_end_1 + 18
+    stage = (ages > age_end_1).astype(np.uint8) + (ages > age_end_2) + (ages > age_end_3)
+    current_pin = np.choose(stage, (pin1, pin2, pin3, pin4))
+
+    return {
+        "lpn": lpn,
+        "pin1": pin1, "pin2": pin2, "pin3": pin3, "pin4": pin4,
+        "age_end_1": age_end_1, "age_end_2": age_end_2, "age_end_3": age_end_3,
+        "stage": stage,
+        "current_pin": current_pin,
+    }
+
+
+# ---------------------------------------------------------
+# Verify / Benchmark
+# ---------------------------------------------------------
+def _legacy_reduce(n, keep_master=True):
+    while n > 9 and not (keep_master and n in MASTER_NUMBERS):
+        n = sum(int(d) for d in str(n))
+    return n
+
+
+def verify(years=range(1800, 2201)):
+    """全ての (年, 月, 日) についてベクトル版・スカラー版を旧ループ実装と突き合わせる"""
+    import numpy as np
+    grid = np.array([(y, m, d) for y in years for m in range(1, 13) for d in range(1, 32)])
+    ages = np.random.default_rng(0).integers(-5, 120, len(grid))
+    cols = numerology_columns(grid[:, 0], grid[:, 1], grid[:, 2], ages)
+
+    mismatches = 0
+    for i, (y, m, d) in enumerate(grid.tolist()):
+        lpn = _legacy_reduce(y + m + d)
+        mb, db, yb = (_legacy_reduce(v, False) for v in (m, d, y))
+        p1 = _legacy_reduce(mb + db)
+        p2 = _legacy_reduce(db + yb)
+        expected = (lpn, p1, p2, _legacy_reduce(p1 + p2), _legacy_reduce(mb + yb), 36 - _legacy_reduce(lpn, False))
+        scalar_pins, scalar_ends = pinnacles(y, m, d)
+        got = tuple(int(cols[k][i]) for k in ("lpn", "pin1", "pin2", "pin3", "pin4", "age_end_1"))
+        if got != expected or (life_path(y, m, d),) + scalar_pins + scalar_ends[:1] != expected:
+            mismatches += 1
+        elif stage_index(int(ages[i]), scalar_ends) != cols["stage"][i]:
+            mismatches += 1
+    return {"checked": len(grid), "mismatches": mismatches}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify / benchmark the Tier 1 numerology kernel")
+    parser.add_argument("--n", type=int, default=1000000, help="Rows for the columnar benchmark")
+    args = parser.parse_args(argv)
+
+    import numpy as np
+    print(verify())
+    rng = np.random.default_rng(1)
+    years = rng.integers(1900, 2100, args.n)
+    months = rng.integers(1, 13, args.n)
+    days = rng.integers(1, 29, args.n)
+    ages = 2026 - years
+    numerology_columns(years[:10], months[:10], days[:10], ages[:10])  # テーブル準備
+
+    start = time.perf_counter()
+    numerology_columns(years, months, days, ages)
+    print(f"{args.n} rows in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
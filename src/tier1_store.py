@@ -0,0 +1,186 @@
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from tier1_engine import ENGINE_VERSION, SolalendarTier1, infra_layer
+
+# ---------------------------------------------------------
+# PSC Profile Store (Tier 1)
+#   Key   = 正規化した出生入力 (日時, 緯度経度, タイムゾーン, chart_mode)。name は含めない
+#   Value = analyze() の出力。年齢依存の Layer 2 だけは読み出し時に現在の年で作り直すので、
+#           年が変わっても古くならない
+#   Version = ENGINE_VERSION。行は (key, version) ごとに持ち、読み出しは自分の版だけを見る。
+#             ローリングデプロイ中に新旧のレプリカが同じファイルを使っても互いの行を消さない。
+#             古い版の行は保守コマンドで消す: python tier1_store.py purge [--keep VERSION ...]
+#   SQLite (WAL) なので複数プロセス・共有ボリューム上のレプリカから同時に使える
+# ---------------------------------------------------------
+DEFAULT_PATH = os.environ.get(
+    "SOLALENDAR_PROFILE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profiles.sqlite3"),
+)
+BIRTH_DEFAULTS = {"lat": 35.6895, "lng": 139.6917, "tz_str": "Asia/Tokyo", "chart_mode": "swisseph"}
+_SQL_CHUNK = 500  # SQLite のプレースホルダ上限より十分小さく
+
+
+def profile_key(record):
+    """同じ出生の瞬間・場所なら同じキーになる文字列"""
+    r = {**BIRTH_DEFAULTS, **{k: v for k, v in record.items() if v is not None}}
+    return "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}|{}|{}|{}|{}".format(
+        int(r["year"]), int(r["month"]), int(r["day"]), int(r["hour"]), int(r["minute"]),
+        round(float(r["lat"]), 6), round(float(r["lng"]), 6), r["tz_str"], r["chart_mode"],
+    )
+
+
+class PSCProfileStore:
+    def __init__(self, path=DEFAULT_PATH, version=ENGINE_VERSION):
+        self.path = path
+        self.version = version
+        self.stats = {"hits": 0, "misses": 0, "puts": 0, "invalidated": 0}
+
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " key TEXT NOT NULL, version TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (key, version))"
+        )
+        self._db.commit()
+
+    # ---------------------------------------------------------
+    def get_many(self, records, current_year=None):
+        """records と同じ順序で analyze() 互換の結果（未登録は None）を返す"""
+        keys = [profile_key(r) for r in records]
+        rows = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _SQL_CHUNK):
+                chunk = unique[start:start + _SQL_CHUNK]
+                rows.update(self._db.execute(
+                    f"SELECT key, value FROM profiles WHERE version = ? AND key IN ({','.join('?' * len(chunk))})",
+                    (self.version, *chunk),
+                ).fetchall())
+
+        current_year = current_year or datetime.datetime.now().year
+        results = []
+        for record, key in zip(records, keys):
+            if key in rows:
+                self.stats["hits"] += 1
+                if isinstance(rows[key], str):
+                    rows[key] = json.loads(rows[key])  # 同じ出生の行は1回だけパース
+                results.append(_with_infra(rows[key], record, current_year))
+            else:
+                self.stats["misses"] += 1
+                results.append(None)
+        return results
+
+    def get(self, record, current_year=None):
+        return self.get_many([record], current_year)[0]
+
+    def put_many(self, pairs):
+        """pairs: iterable of (record, analyze() result)。error の結果は保存しない"""
+        now = datetime.datetime.now().timestamp()
+        rows = []
+        for record, result in pairs:
+            if result and "error" not in result:
+                rows.append((profile_key(record), self.version, json.dumps(result, ensure_ascii=False), now))
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO profiles (key, version, value, created) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+            self.stats["puts"] += len(rows)
+
+    def put(self, record, result):
+        self.put_many([(record, result)])
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM profiles")
+            self._db.commit()
+
+    def versions(self):
+        """{version: 行数}"""
+        with self._lock:
+            return dict(self._db.execute("SELECT version, COUNT(*) FROM profiles GROUP BY version").fetchall())
+
+    def purge(self, keep=None):
+        """keep（省略時は自分の版）以外の版の行を削除して件数を返す（保守用。稼働中の他の版の行も消える）"""
+        keep = tuple(keep or (self.version,))
+        with self._lock:
+            cur = self._db.execute(
+                f"DELETE FROM profiles WHERE version NOT IN ({','.join('?' * len(keep))})", keep
+            )
+            self._db.commit()
+            self.stats["invalidated"] += cur.rowcount
+        return cur.rowcount
+
+    # ---------------------------------------------------------
+    def decode_many(self, records, workers=1, chunksize=64):
+        """
+        ストアにあるものは読み出し、無いものだけを出生入力の重複を除いて analyze_many で計算して保存する。
+        records: list of SolalendarTier1 keyword dicts ({"error": ...} はそのまま返す)
+        """
+        records = list(records)
+        valid = [i for i, r in enumerate(records) if "error" not in r]
+        results = list(records)
+        found = self.get_many([records[i] for i in valid])
+
+        todo = {}
+        for i, result in zip(valid, found):
+            if result is None:
+                todo.setdefault(profile_key(records[i]), []).append(i)
+            else:
+                results[i] = result
+
+        if todo:
+            first = [indices[0] for indices in todo.values()]
+            computed = list(SolalendarTier1.analyze_many([records[i] for i in first], workers=workers, chunksize=chunksize))
+            self.put_many((records[i], result) for i, result in zip(first, computed))
+            for indices, result in zip(todo.values(), computed):
+                for i in indices:
+                    results[i] = result if "error" in result else _with_infra(result, records[i])
+        return results
+
+
+def _with_infra(result, record, current_year=None):
+    """保存済みの結果の Layer 2 を現在の年で作り直す"""
+    current_year = current_year or datetime.datetime.now().year
+    year, month, day = int(record["year"]), int(record["month"]), int(record["day"])
+    infra = infra_layer(year, month, day, current_year - year, result["layer_1_bios"]["lpn"])
+    return {**result, "layer_2_infra": {**result["layer_2_infra"], "cycles": infra}}
+
+
+_DEFAULT_STORE = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_default_store():
+    """プロセス共通のストア（SOLALENDAR_PROFILE_PATH="" で無効 -> None）"""
+    global _DEFAULT_STORE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_STORE is None and DEFAULT_PATH:
+            _DEFAULT_STORE = PSCProfileStore(DEFAULT_PATH)
+        return _DEFAULT_STORE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PSC profile store maintenance")
+    parser.add_argument("command", choices=["versions", "purge"])
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--keep", nargs="+", help=f"Versions to keep on purge (default: {ENGINE_VERSION!r})")
+    args = parser.parse_args(argv)
+
+    store = PSCProfileStore(args.path)
+    if args.command == "purge":
+        print(json.dumps({"deleted": store.purge(args.keep), "versions": store.versions()}, ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(store.versions(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
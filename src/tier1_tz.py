@@ -0,0 +1,158 @@
+import argparse
+import bisect
+import datetime
+import functools
+import json
+import pytz
+
+# ---------------------------------------------------------
+# Tier 1 Timezone Resolver
+#   pytz の遷移表（UTC の切替時刻とオフセット）をゾーンごとに一度だけ
+#   整数配列へ展開してキャッシュし、ローカル時刻 -> UTC を二分探索で解く。
+#   曖昧な時刻（夏時間終了の重複）と存在しない時刻（開始時の欠落）は
+#   pytz.localize(is_dst=False) と同じ結果になるように選ぶ。
+#   python tier1_tz.py verify
+# ---------------------------------------------------------
+EPOCH = datetime.datetime(1970, 1, 1)
+JD_UNIX_EPOCH = 2440587.5
+SECONDS_PER_DAY = 86400.0
+
+
+class ZoneTable:
+    """
+    transitions[i]: 区間 i が始まる UTC 秒 (transitions[0] は -inf 扱い)
+    offsets[i] / dst[i]: 区間 i の UTC オフセット秒と夏時間フラグ
+    """
+
+    def __init__(self, tz_str):
+        tz = pytz.timezone(tz_str)
+        self.tz_str = tz_str
+        if hasattr(tz, "_utc_transition_times"):
+            self.transitions = [int((t - EPOCH).total_seconds()) for t in tz._utc_transition_times]
+            self.offsets = [int(info[0].total_seconds()) for info in tz._transition_info]
+            self.dst = [bool(info[1]) for info in tz._transition_info]
+        else:
+            # 固定オフセット（UTC / Etc/GMT+5 など）
+            offset = tz.utcoffset(EPOCH)
+            self.transitions = [int((datetime.datetime(1, 1, 1) - EPOCH).total_seconds())]
+            self.offsets = [int(offset.total_seconds())]
+            self.dst = [False]
+        # 各区間がローカル時刻で始まる秒（ローカル時刻で二分探索するため）
+        self.local_starts = [t + o for t, o in zip(self.transitions, self.offsets)]
+        self._arrays = None
+
+    def utc_offset(self, local_seconds):
+        """ローカル時刻（1970-01-01 からの壁時計の秒）に適用する UTC オフセット秒"""
+        i = max(bisect.bisect_right(self.local_starts, local_seconds) - 1, 0)
+        # 直前の区間の終わりがまだ来ていない = 重複時刻。夏時間でない方を選ぶ
+        if i > 0 and local_seconds < self.transitions[i] + self.offsets[i - 1] and self.dst[i] and not self.dst[i - 1]:
+            return self.offsets[i - 1]
+        return self.offsets[i]
+
+    def utc_offsets(self, local_seconds):
+        """Vectorized utc_offset (numpy int64 array in, int64 array out)"""
+        import numpy as np
+        if self._arrays is None:
+            self._arrays = tuple(np.asarray(a, dtype=np.int64) for a in (self.local_starts, self.transitions, self.offsets, self.dst))
+        local_starts, transitions, offsets, dst = self._arrays
+        local_seconds = np.asarray(local_seconds, dtype=np.int64)
+
+        i = np.maximum(np.searchsorted(local_starts, local_seconds, side="right") - 1, 0)
+        prev = np.maximum(i - 1, 0)
+        use_prev = (i > 0) & (local_seconds < transitions[i] + offsets[prev]) & (dst[i] != 0) & (dst[prev] == 0)
+        return np.where(use_prev, offsets[prev], offsets[i])
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(tz_str):
+    """ゾーンごとの遷移表（プロセス内で一度だけ作る）"""
+    return ZoneTable(tz_str)
+
+
+# ---------------------------------------------------------
+# Scalar API
+# ---------------------------------------------------------
+def local_to_utc(tz_str, year, month, day, hour, minute, second=0):
+    """ローカルの生年月日時 -> UTC の aware datetime"""
+    local = datetime.datetime(year, month, day, hour, minute, second)
+    offset = get_zone(tz_str).utc_offset(int((local - EPOCH).total_seconds()))
+    return (local - datetime.timedelta(seconds=offset)).replace(tzinfo=datetime.timezone.utc)
+
+
+# ---------------------------------------------------------
+# Vectorized API
+# ---------------------------------------------------------
+def _days_from_civil(years, months, days):
+    """グレゴリオ暦の日付 -> 1970-01-01 からの日数（配列対応）"""
+    y = years - (months <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (months + 12 * (months <= 2) - 3) + 2) // 5 + days - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def julian_days_ut(tz_strs, years, months, days, hours, minutes):
+    """
+    Bulk local birth time -> JD(UT).
+    tz_strs: one zone name for every row, or a sequence of names (one per row).
+    Rows are grouped by zone so each transition table is searched once per group.
+    """
+    import numpy as np
+    years, months, days, hours, minutes = (np.asarray(a, dtype=np.int64) for a in (years, months, days, hours, minutes))
+    local = _days_from_civil(years, months, days) * 86400 + hours * 3600 + minutes * 60
+
+    if isinstance(tz_strs, str):
+        offsets = get_zone(tz_strs).utc_offsets(local)
+    else:
+        zones, inverse = np.unique(np.asarray(tz_strs, dtype=object).astype(str), return_inverse=True)
+        offsets = np.empty_like(local)
+        for z, zone in enumerate(zones):
+            rows = inverse == z
+            offsets[rows] = get_zone(zone).utc_offsets(local[rows])
+    return (local - offsets) / SECONDS_PER_DAY + JD_UNIX_EPOCH
+
+
+# ---------------------------------------------------------
+# Verify
+# ---------------------------------------------------------
+def verify(zones=None, samples=20000, seed=0):
+    """ランダムな時刻と遷移前後の時刻で pytz.localize と比較し、ゾーンごとの不一致数を返す"""
+    import random
+    rng = random.Random(seed)
+    zones = zones or pytz.common_timezones
+    report = {}
+    for tz_str in zones:
+        tz, table = pytz.timezone(tz_str), get_zone(tz_str)
+        # 遷移の直前直後を重点的に
+        times = [EPOCH + datetime.timedelta(seconds=t + o + d)
+                 for t, o in zip(table.transitions[1:], table.offsets[1:]) for d in (-5400, -1800, 0, 1800, 5400)]
+        times += [datetime.datetime(1900, 1, 1) + datetime.timedelta(minutes=rng.randrange(201 * 525960))
+                  for _ in range(samples // len(zones) + 1)]
+        times = [t.replace(second=0) for t in times if 1900 <= t.year <= 2100]
+
+        mismatches = 0
+        for t in times:
+            expected = tz.localize(t, is_dst=False).astimezone(pytz.utc).replace(tzinfo=None)
+            got = local_to_utc(tz_str, t.year, t.month, t.day, t.hour, t.minute).replace(tzinfo=None)
+            mismatches += got != expected
+        report[tz_str] = {"checked": len(times), "mismatches": mismatches}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the Tier 1 timezone resolver against pytz")
+    parser.add_argument("command", choices=["verify"])
+    parser.add_argument("--zones", nargs="*", help="Default: pytz.common_timezones")
+    parser.add_argument("--samples", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    report = verify(args.zones, args.samples)
+    failed = {k: v for k, v in report.items() if v["mismatches"]}
+    print(json.dumps({"zones": len(report), "checked": sum(v["checked"] for v in report.values()),
+                      "failed": failed}, indent=2))
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
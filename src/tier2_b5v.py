@@ -1,11 +1,33 @@
 # src/tier2_b5v.py
+import csv
+from tier3_gap import SIGN_ELEMENT, SIGN_FULL_NAME
+
+FACTORS = ("Openness", "Conscientiousness", "Extraversion", "Agreeableness", "Neuroticism")
+NEUTRAL = 3          # 1(同意しない) ~ 5(同意する) の中央
+POINTS_PER_STEP = 5  # 1 段階 = 5 点（±4 段階で ±20 点）
+
+
+def build_loadings(questions):
+    """
+    質問 dict -> (item_ids, loadings)
+    loadings[i][f] は項目 i の因子 f への符号（+1 / 反転項目 -1 / 無関係 0）。
+    """
+    item_ids, loadings = [], []
+    for f, factor in enumerate(FACTORS):
+        for q in questions.get(factor, ()):
+            row = [0] * len(FACTORS)
+            row[f] = q["score"]
+            item_ids.append(q["id"])
+            loadings.append(row)
+    return tuple(item_ids), loadings
+
 
 class SolalendarB5V:
     """
     Tier 2: The Dynamic Probe (Solalendar B5V)
     Managing Questions for BigFive (OS) and VALS (Drive).
     """
-    
+
     def __init__(self):
         # BigFive簡易診断（各因子2問ずつ）
         self.bigfive_questions = {
@@ -30,30 +52,65 @@ class SolalendarB5V:
                 {"id": "N2", "text": "プレッシャーがかかる状況でも、冷静でいられる", "score": -1}
             ]
         }
+        # 項目 x 因子の負荷行列（反転項目は -1）
+        self.item_ids, self.loadings = build_loadings(self.bigfive_questions)
+        self._loading_array = None
 
     def calculate_bigfive(self, answers):
         """回答（1-5）を受け取り、各因子のスコア（0-100）を算出する"""
-        scores = {"Openness": 50, "Conscientiousness": 50, "Extraversion": 50, "Agreeableness": 50, "Neuroticism": 50}
-        
-        # answers = {"O1": 5, "O2": 2, ...}
-        for factor, questions in self.bigfive_questions.items():
-            raw_score = 0
-            for q in questions:
-                if q['id'] in answers:
-                    val = answers[q['id']]
-                    # 1(同意しない) ~ 5(同意する) を -2 ~ +2 に変換
-                    norm_val = val - 3
-                    # 反転項目の処理（scoreが-1の場合は値を反転）
-                    if q['score'] == -1:
-                        norm_val = -norm_val
-                    raw_score += norm_val
-            
-            # スコアへの反映（簡易ロジック: ±4の範囲を±20点として加算）
-            scores[factor] += raw_score * 5
-            # 0-100の範囲に収める
-            scores[factor] = max(0, min(100, scores[factor]))
-            
-        return scores
+        # answers = {"O1": 5, "O2": 2, ...}  未回答の項目は中立（0 点）扱い
+        raw = [0] * len(FACTORS)
+        for item_id, row in zip(self.item_ids, self.loadings):
+            if item_id in answers:
+                norm_val = answers[item_id] - NEUTRAL
+                for f, sign in enumerate(row):
+                    raw[f] += sign * norm_val
+        return {factor: max(0, min(100, 50 + r * POINTS_PER_STEP)) for factor, r in zip(FACTORS, raw)}
+
+    # ---------------------------------------------------------
+    # Bulk scoring (respondents x items)
+    # ---------------------------------------------------------
+    def score_matrix(self, answers):
+        """
+        answers: respondents x items の配列（列は self.item_ids の順、値は 1-5、未回答は NaN）
+        Returns a respondents x 5 float array (columns in FACTORS order), clipped to 0-100.
+        """
+        import numpy as np
+        if self._loading_array is None:
+            self._loading_array = np.asarray(self.loadings, dtype=np.float64)
+        answers = np.asarray(answers, dtype=np.float64)
+        if answers.ndim != 2 or answers.shape[1] != len(self.item_ids):
+            raise ValueError(f"expected a (respondents, {len(self.item_ids)}) array, got {answers.shape}")
+        centered = np.nan_to_num(answers - NEUTRAL, nan=0.0)
+        return np.clip(50 + centered @ self._loading_array * POINTS_PER_STEP, 0, 100)
+
+    def score_csv(self, source, id_column=None, chunksize=10000):
+        """
+        ヘッダ付き CSV（項目 ID の列 + 任意の列）をチャンクごとに採点する。
+        source: path or text file object / 空欄は未回答
+        Yields (ids, scores): ids は id_column の値のリスト（指定なしなら None）、scores は score_matrix の出力。
+        """
+        import numpy as np
+        f = open(source, newline="", encoding="utf-8") if isinstance(source, str) else source
+        try:
+            reader = csv.reader(f)
+            header = next(reader)
+            missing = [i for i in self.item_ids if i not in header]
+            if missing:
+                raise ValueError(f"CSV is missing item columns: {', '.join(missing)}")
+            cols = [header.index(i) for i in self.item_ids]
+            id_col = header.index(id_column) if id_column else None
+
+            while True:
+                rows = [row for _, row in zip(range(chunksize), reader)]
+                if not rows:
+                    return
+                answers = np.array([[float(row[c]) if row[c].strip() else np.nan for c in cols] for row in rows])
+                ids = [row[id_col] for row in rows] if id_col is not None else None
+                yield ids, self.score_matrix(answers)
+        finally:
+            if f is not source:
+                f.close()
 
     def get_tier1_prediction(self, tier1_data):
         """Tier 1の星座データから、BigFiveの傾向を予測する（仮説生成）"""
@@ -62,24 +119,20 @@ class SolalendarB5V:
         # 土(Earth): 誠実性(C)高
         # 風(Air): 開放性(O)高
         # 水(Water): 協調性(A)高 / 神経症傾向(N)高
-        
-        elem_map = {
-            "Fire": ["Aries", "Leo", "Sagittarius"],
-            "Earth": ["Taurus", "Virgo", "Capricorn"],
-            "Air": ["Gemini", "Libra", "Aquarius"],
-            "Water": ["Cancer", "Scorpio", "Pisces"]
-        }
-        
-        sun_sign = tier1_data['raw_data']['western']['sun_sign']
-        
+
+        # SolalendarTier1.analyze() の layer_3_env（略称 "Tau" / フルネームどちらも可）
+        sign = tier1_data.get('layer_3_env', {}).get('sun_sign')
+        element = SIGN_ELEMENT.get(sign)
+        sun_sign = SIGN_FULL_NAME.get(sign, sign)
+
         prediction = ""
-        if sun_sign in elem_map['Fire']:
+        if element == "Fire":
             prediction = f"あなたの太陽星座（{sun_sign}）は『情熱と行動（火）』の性質を持っています。本来は外向的でエネルギッシュなはずですが、現状はいかがですか？"
-        elif sun_sign in elem_map['Earth']:
+        elif element == "Earth":
             prediction = f"あなたの太陽星座（{sun_sign}）は『感覚と物質（土）』の性質を持っています。本来は堅実で慎重なはずですが、現状はいかがですか？"
-        elif sun_sign in elem_map['Air']:
+        elif element == "Air":
             prediction = f"あなたの太陽星座（{sun_sign}）は『知性と論理（風）』の性質を持っています。本来は好奇心旺盛でドライなはずですが、現状はいかがですか？"
-        elif sun_sign in elem_map['Water']:
+        elif element == "Water":
             prediction = f"あなたの太陽星座（{sun_sign}）は『感情と融合（水）』の性質を持っています。本来は共感力が高く繊細なはずですが、現状はいかがですか？"
-            
-        return prediction
\ No newline at end of file
+
+        return prediction
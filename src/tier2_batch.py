@@ -0,0 +1,246 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from tier2_engine import SolalendarTier2, calculate_motivation, parse_big_five
+
+# ---------------------------------------------------------
+# Tier 2 Bulk Diagnostics (Batch API)
+#   Big Five 採点だけを JSONL バッチにまとめて送り、完了をポーリングし、
+#   custom_id（= 自由記述のキャッシュキー）で結果を各レコードに戻す。
+#   状態ファイルに提出済みバッチと取得済み結果を記録するので、
+#   途中で落ちても同じコマンドを再実行すれば続きから再開できる。
+#   失敗・期限切れのバッチの行は保存しないので、再実行で提出し直される。
+#   バッチ作成の前に submit_id を状態ファイルに書き、metadata にも付けて送る。
+#   作成直後に落ちた場合は、再開時に submit_id でバッチを探してから作り直す（二重提出しない）。
+#
+#   python tier2_batch.py cohort.jsonl --state run1.state.json -o out.jsonl
+#   Input lines: {"id": ..., "anchor_data": {...}, "free_text": "..."}
+# ---------------------------------------------------------
+MAX_REQUESTS_PER_BATCH = 50000
+SUBMIT_ID_KEY = "solalendar_submit_id"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class OpenAIBatchTransport:
+    """
+    OpenAI Batch API 用の transport（base_url を変えればローカルのスタブにも向けられる）。
+    Any object with the same five methods can be used as a transport.
+    """
+
+    def __init__(self, api_key, base_url=None):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+
+    def upload(self, jsonl_bytes):
+        return self.client.files.create(file=("tier2_batch.jsonl", io.BytesIO(jsonl_bytes)), purpose="batch").id
+
+    def create_batch(self, input_file_id, metadata=None):
+        return self.client.batches.create(
+            input_file_id=input_file_id, endpoint="/v1/chat/completions", completion_window="24h", metadata=metadata
+        ).id
+
+    def find_batch(self, metadata, created_after):
+        """metadata が一致するバッチの id（新しい順に created_after まで探す。無ければ None）"""
+        for batch in self.client.batches.list(limit=100):
+            if batch.created_at < created_after:
+                return None
+            if all((batch.metadata or {}).get(k) == v for k, v in metadata.items()):
+                return batch.id
+        return None
+
+    def get_batch(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        return {"status": batch.status, "output_file_id": batch.output_file_id, "error_file_id": batch.error_file_id}
+
+    def download(self, file_id):
+        return self.client.files.content(file_id).content
+
+
+class Tier2BatchRunner:
+    def __init__(self, transport, state_path, cache=None, max_requests_per_batch=MAX_REQUESTS_PER_BATCH, poll_interval=30.0):
+        self.transport = transport
+        self.state_path = state_path
+        self.results_path = state_path + ".results.jsonl"
+        self.max_requests_per_batch = max_requests_per_batch
+        self.poll_interval = poll_interval
+        # 取得した Big Five はオンライン側のキャッシュにも入れておく
+        self.engine = SolalendarTier2(api_key=None, cache=cache)
+        self.state = self._load_state()
+        self.scores = self._load_results()
+        self._pending = {}  # cache_key -> payload（未提出）
+
+    # ---------------------------------------------------------
+    def run(self, records):
+        """
+        records: list of {"id", "anchor_data", "free_text"}（再開時も同じ入力を渡す）
+        Returns {id: tier2 result} in the usual layer_6 / layer_7 schema.
+        """
+        records = list(records)
+        keys = {}
+        in_flight = self._in_flight()
+        for record in records:
+            payload, cache_key = self.engine._prepare(record["free_text"])
+            keys[record["id"]] = cache_key
+            if cache_key not in self.scores and cache_key not in in_flight:
+                cached = self.engine._cache_get(cache_key)
+                if cached is not None:
+                    self.scores[cache_key] = cached
+                else:
+                    self._pending[cache_key] = payload
+
+        self._resume_submissions()
+        self._submit_pending()
+        self.wait()
+
+        results = {}
+        for record in records:
+            motivation = calculate_motivation(record["anchor_data"])
+            scores = self.scores.get(keys[record["id"]])
+            if isinstance(scores, dict) and "error" not in scores:
+                results[record["id"]] = self.engine._merge(scores, motivation)
+            else:
+                results[record["id"]] = {"error": (scores or {}).get("error", "No batch result"), "layer_7_motivation": motivation}
+        return results
+
+    def wait(self):
+        """未完了のバッチがなくなるまでポーリングする"""
+        while True:
+            open_batches = [b for b in self.state["batches"] if not b["collected"]]
+            if not open_batches:
+                return
+            for batch in open_batches:
+                info = self.transport.get_batch(batch["batch_id"])
+                batch["status"] = info["status"]
+                if info["status"] in TERMINAL_STATUSES:
+                    self._collect(batch, info)
+            self._save_state()
+            if any(not b["collected"] for b in self.state["batches"]):
+                time.sleep(self.poll_interval)
+
+    # ---------------------------------------------------------
+    def _in_flight(self):
+        return {k for b in self.state["batches"] if not b["collected"] for k in b["keys"]}
+
+    def _submit_pending(self):
+        items = list(self._pending.items())
+        for start in range(0, len(items), self.max_requests_per_batch):
+            chunk = items[start:start + self.max_requests_per_batch]
+            lines = [
+                json.dumps({"custom_id": key, "method": "POST", "url": "/v1/chat/completions",
+                            "body": self.engine._request(payload)}, ensure_ascii=False)
+                for key, payload in chunk
+            ]
+            file_id = self.transport.upload(("\n".join(lines) + "\n").encode("utf-8"))
+            # 作成する前に記録する（batch_id が空の行は再開時に _resume_submissions が片付ける）
+            # submitted_at は探索の打ち切り時刻。サーバとの時計のずれを見込んで 1 分前にしておく
+            batch = {"batch_id": None, "submit_id": uuid.uuid4().hex, "submitted_at": int(time.time()) - 60,
+                     "input_file_id": file_id, "status": "submitting", "collected": False, "keys": [key for key, _ in chunk]}
+            self.state["batches"].append(batch)
+            self._save_state()
+            self._create(batch)
+        self._pending.clear()
+
+    def _create(self, batch):
+        batch["batch_id"] = self.transport.create_batch(batch["input_file_id"], {SUBMIT_ID_KEY: batch["submit_id"]})
+        batch["status"] = "validating"
+        self._save_state()
+
+    def _resume_submissions(self):
+        """作成の途中で落ちたバッチ: サーバ側にあればその id を使い、無ければ作る"""
+        for batch in self.state["batches"]:
+            if batch.get("batch_id") is None and not batch["collected"]:
+                found = self.transport.find_batch({SUBMIT_ID_KEY: batch["submit_id"]}, batch["submitted_at"])
+                if found is None:
+                    self._create(batch)
+                else:
+                    batch["batch_id"], batch["status"] = found, "validating"
+                    self._save_state()
+
+    def _collect(self, batch, info):
+        rows = {}
+        for file_id in (info.get("output_file_id"), info.get("error_file_id")):
+            if not file_id:
+                continue
+            for line in self.transport.download(file_id).decode("utf-8").splitlines():
+                if line.strip():
+                    row = json.loads(line)
+                    rows[row["custom_id"]] = row
+
+        # エラーは今回の結果として返すだけで保存しない（再実行すると提出し直される）
+        with open(self.results_path, "a", encoding="utf-8") as f:
+            for key in batch["keys"]:
+                scores = self._parse_row(rows.get(key), info["status"])
+                self.scores[key] = scores
+                if "error" in scores:
+                    continue
+                if self.engine.cache:
+                    self.engine.cache.put(key, scores)
+                f.write(json.dumps({"key": key, "scores": scores}, ensure_ascii=False) + "\n")
+        batch["collected"] = True
+
+    @staticmethod
+    def _parse_row(row, status):
+        if row is None:
+            return {"error": f"Missing result (batch {status})"}
+        response = row.get("response")
+        if row.get("error") or not response or response.get("status_code") != 200:
+            return {"error": json.dumps(row.get("error") or (response or {}).get("body"), ensure_ascii=False)}
+        try:
+            return parse_big_five(response["body"]["choices"][0]["message"]["content"])
+        except (KeyError, ValueError, TypeError) as e:
+            return {"error": f"Unparseable result: {e}"}
+
+    # ---------------------------------------------------------
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {"batches": []}
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def _load_results(self):
+        scores = {}
+        if os.path.exists(self.results_path):
+            with open(self.results_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        scores[row["key"]] = row["scores"]
+        return scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk Tier 2 diagnostics via the Batch API")
+    parser.add_argument("input", help="JSONL of {id, anchor_data, free_text}")
+    parser.add_argument("--state", required=True, help="State file (re-run with the same path to resume)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output path (default: stdout)")
+    parser.add_argument("--base-url", default=os.environ.get("OPENAI_BASE_URL"), help="e.g. the local stub server")
+    parser.add_argument("--poll-interval", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    with open(args.input, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    transport = OpenAIBatchTransport(os.environ.get("OPENAI_API_KEY", "stub"), base_url=args.base_url)
+    results = Tier2BatchRunner(transport, args.state, poll_interval=args.poll_interval).run(records)
+
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for record in records:
+            dst.write(json.dumps({"id": record["id"], "result": results[record["id"]]}, ensure_ascii=False) + "\n")
+    finally:
+        if dst is not sys.stdout:
+            dst.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,146 +1,283 @@
+import asyncio
+import contextvars
 import json
 import os
-from openai import OpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import metrics
+from llm_cache import get_default_cache, make_key
+from llm_client import CircuitOpenError, chat_completion, chat_completion_async
+from tier2_lexicon import score_text
 
 # ---------------------------------------------------------
-# SYSTEM PROMPT v2.0 (Embedded)
+# SYSTEM PROMPT v3.0 (Big Five scoring only)
 # ---------------------------------------------------------
+TIER2_PROMPT_VERSION = "v3.0"  # プロンプトを変えたら上げる（キャッシュキーに含まれる）
+TIER2_MODEL = "gpt-4o"  # または gpt-3.5-turbo
+TIER2_TEMPERATURE = 0.2  # 決定論的にするため低めに設定
+# "llm": LLM で採点 / "lexicon": 同梱の語彙表で即時に採点 / "hedged": 語彙表の結果を用意しつつ、
+# LLM が TIER2_HEDGE_BUDGET 秒以内に返ればそちらを使う（間に合わなかった応答も裏でキャッシュされる）
+TIER2_SCORER = os.environ.get("SOLALENDAR_TIER2_SCORER", "llm")
+TIER2_HEDGE_BUDGET = float(os.environ.get("SOLALENDAR_TIER2_HEDGE_BUDGET", 2.0))
+
 TIER2_SYSTEM_PROMPT = """
 # Role Definition
 You are the "Tier 2 Psychometric Engine" for Solalendar.
-Your goal is to deterministically map user input to the "Solalendar Tier 2 Structure" (Big Five & VALS).
-You must strictly follow the defined logic for elemental conversion and cultural adjustments.
+Your only task is to score the user's journal text on the Big Five personality traits.
+Resource, VALS and element logic are computed elsewhere; do not output them.
 
 # Input Data Schema
-You will receive input in the following JSON format:
-1. [ANCHOR_DATA]:
-   - `curiosity_score` (int 1-5): Intellectual hunger.
-   - `confidence_score` (int 1-5): Self-efficacy.
-   - `action_score` (int 1-5): Impulse to act.
-   - `social_norm_flag` (boolean): Sensitivity to "Ryoshiki" (Social gaze/Reputation).
-   - `primary_driver` (string): "Ideals", "Achievement", or "Self-Expression".
-2. [FREE_TEXT]: User's journal text.
-
-# Inference Protocols (STRICTLY FOLLOW)
-
-## Phase 1: Big Five & Elemental Mapping
-Target: [FREE_TEXT]
-Method: Analyze linguistic features to score Big Five (0-100).
-Conversion Logic (Element Assignment):
-*Assign the "Dominant Element" based on the highest scoring trait cluster:*
-- **FIRE (Passion/Intuition)**: Correlates with High Extraversion (>60) AND High Openness (>60).
-- **EARTH (Sensation/Stability)**: Correlates with High Conscientiousness (>60) AND Low Openness (<50).
-- **AIR (Logic/Thinking)**: Correlates with Very High Openness (>70) AND Moderate/Low Neuroticism.
-- **WATER (Feeling/Emotion)**: Correlates with High Agreeableness (>60) OR High Neuroticism (>60).
-*If no clear peak exists, default to "Mutable (Mixed)".*
-
-## Phase 2: Resource Calculation (The Fuel)
-Target: [ANCHOR_DATA] ONLY.
-Formula:
-`Resource_Sum` = `curiosity_score` + `confidence_score` + `action_score` (Max 15)
-
-Thresholds:
-- **High Resources**: `Resource_Sum` >= 12
-- **Moderate Resources**: `Resource_Sum` between 8 and 11
-- **Low Resources**: `Resource_Sum` <= 7
-
-## Phase 3: Japan-VALS Type Determination (The Logic Tree)
-Combine [Phase 2 Resource] + [primary_driver] + [social_norm_flag].
-
-### Logic Branch A: High Resources (>=12)
-- Driver="Ideals" -> **Thinker** (Intellectual, Reflective)
-- Driver="Achievement" -> **Achiever** (Goal-oriented, Status-conscious)
-- Driver="Self-Expression" -> **Experiencer** (Active, Impulsive)
-*Note: If `Resource_Sum` is 15 (Max) -> Upgrade to **Innovator**.*
-
-### Logic Branch B: Moderate Resources (8-11)
-- Driver="Ideals" -> **Believer** (Conservative, Moral code)
-- Driver="Achievement" -> **Striver** (Approval seeking, Trendy)
-- Driver="Self-Expression" -> **Maker** (Practical, Constructive)
-
-### Logic Branch C: Low Resources (<=7) WITH Cultural Filter
-*CRITICAL JAPAN-VALS ADJUSTMENT:*
-- IF `social_norm_flag` is **TRUE** (High Ryoshiki):
-  - Do NOT classify as "Survivor". The user maintains social appearances.
-  - FORCE Classification -> **Believer** (Clinging to traditional values as safety).
-- IF `social_norm_flag` is **FALSE**:
-  - Classification -> **Survivor** (Focus on safety/needs, detached from society).
+{"FREE_TEXT": "User's journal text (Japanese)."}
+
+# Scoring Protocol
+Analyze linguistic features of [FREE_TEXT] and score each Big Five trait (0-100, 50 = neutral).
+If the text is empty or uninformative, return 50 for every trait.
 
 # Output Format (JSON Only)
 Response must be a valid JSON object.
 
 {
-  "layer_6_behavior": {
-    "big_five_scores": {
-      "openness": 0-100,
-      "conscientiousness": 0-100,
-      "extraversion": 0-100,
-      "agreeableness": 0-100,
-      "neuroticism": 0-100
-    },
-    "dominant_element": "Fire/Earth/Air/Water/Mutable",
-    "element_reasoning": "Why this element was chosen based on the mapping logic."
-  },
-  "layer_7_motivation": {
-    "resource_score": (int),
-    "resource_level": "High/Moderate/Low",
-    "ryoshiki_filter_active": (boolean),
-    "vals_type": "Innovator/Thinker/Achiever/Experiencer/Believer/Striver/Maker/Survivor",
-    "diagnosis": "Brief explanation of how Resources + Driver + Ryoshiki determined this type."
+  "big_five_scores": {
+    "openness": 0-100,
+    "conscientiousness": 0-100,
+    "extraversion": 0-100,
+    "agreeableness": 0-100,
+    "neuroticism": 0-100
   }
 }
 """
 
+# ---------------------------------------------------------
+# Phase 1 (Element Mapping) / Phase 2 (Resource) / Phase 3 (Japan-VALS)
+#   旧プロンプトで LLM に実行させていた決定論ロジックをローカルで実行する
+# ---------------------------------------------------------
+VALS_TREE = {
+    "High": {"Ideals": "Thinker", "Achievement": "Achiever", "Self-Expression": "Experiencer"},
+    "Moderate": {"Ideals": "Believer", "Achievement": "Striver", "Self-Expression": "Maker"},
+}
+
+
+def assign_element(big_five):
+    """
+    Big Five (0-100) -> Dominant Element.
+    - FIRE : Extraversion > 60 AND Openness > 60
+    - EARTH: Conscientiousness > 60 AND Openness < 50
+    - AIR  : Openness > 70 AND Neuroticism <= 60 (moderate/low)
+    - WATER: Agreeableness > 60 OR Neuroticism > 60
+    複数該当する場合はクラスタ強度（関連特性の平均）が最も高いものを採用。
+    """
+    o = big_five.get("openness", 50)
+    c = big_five.get("conscientiousness", 50)
+    e = big_five.get("extraversion", 50)
+    a = big_five.get("agreeableness", 50)
+    n = big_five.get("neuroticism", 50)
+
+    candidates = []
+    if e > 60 and o > 60:
+        candidates.append(((e + o) / 2, "Fire", f"Extraversion {e} and Openness {o} are both high (>60)."))
+    if c > 60 and o < 50:
+        candidates.append(((c + 100 - o) / 2, "Earth", f"Conscientiousness {c} is high while Openness {o} is low (<50)."))
+    if o > 70 and n <= 60:
+        candidates.append(((o + 100 - n) / 2, "Air", f"Openness {o} is very high (>70) with moderate/low Neuroticism {n}."))
+    if a > 60 or n > 60:
+        candidates.append((max(a, n), "Water", f"Agreeableness {a} or Neuroticism {n} is high (>60)."))
+
+    if not candidates:
+        return "Mutable", "No trait cluster passes its threshold; no clear peak (Mixed)."
+    _, element, reasoning = max(candidates, key=lambda x: x[0])
+    return element, reasoning
+
+
+def calculate_motivation(anchor_data):
+    """ANCHOR_DATA -> layer_7_motivation（テキストに依存しないので即時に返せる）"""
+    resource_score = int(anchor_data.get("curiosity_score", 0)) + int(anchor_data.get("confidence_score", 0)) + int(anchor_data.get("action_score", 0))
+    driver = anchor_data.get("primary_driver", "Ideals")
+    social_norm = bool(anchor_data.get("social_norm_flag", False))
+
+    if resource_score >= 12:
+        level = "High"
+    elif resource_score >= 8:
+        level = "Moderate"
+    else:
+        level = "Low"
+
+    ryoshiki_active = False
+    if level == "High" and resource_score == 15:
+        vals_type = "Innovator"
+        diagnosis = f"Resource_Sum {resource_score} is the maximum, so the High branch upgrades to Innovator."
+    elif level in VALS_TREE:
+        vals_type = VALS_TREE[level].get(driver, "Unknown")
+        diagnosis = f"{level} resources (Resource_Sum {resource_score}) with driver '{driver}' -> {vals_type}."
+    elif social_norm:
+        # Japan-VALS 補正: 世間体（良識）が強い場合は Survivor にしない
+        vals_type = "Believer"
+        ryoshiki_active = True
+        diagnosis = f"Low resources (Resource_Sum {resource_score}) but the Ryoshiki filter is active, so the user clings to traditional values -> Believer."
+    else:
+        vals_type = "Survivor"
+        diagnosis = f"Low resources (Resource_Sum {resource_score}) without the Ryoshiki filter -> Survivor."
+
+    return {
+        "resource_score": resource_score,
+        "resource_level": level,
+        "ryoshiki_filter_active": ryoshiki_active,
+        "vals_type": vals_type,
+        "diagnosis": diagnosis
+    }
+
+
+def parse_big_five(content):
+    """LLM の JSON 応答 -> {"openness": int, ...}"""
+    result = json.loads(content)
+    return {k: int(round(float(v))) for k, v in result["big_five_scores"].items()}
+
+
+def build_behavior(big_five):
+    """Big Five スコア -> layer_6_behavior"""
+    element, reasoning = assign_element(big_five)
+    return {
+        "big_five_scores": big_five,
+        "dominant_element": element,
+        "element_reasoning": reasoning
+    }
+
+
+_hedge_pool = None
+_hedge_lock = threading.Lock()
+
+
+def _get_hedge_pool():
+    # hedged モードで LLM を待つスレッド（予算切れ後も応答をキャッシュするまで走り続ける）
+    global _hedge_pool
+    with _hedge_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="tier2-hedge")
+        return _hedge_pool
+
+
 class SolalendarTier2:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None, scorer=None, hedge_budget=None):
         self.api_key = api_key
-        
+        # cache=None: プロセス共通キャッシュ / cache=False: キャッシュしない
+        self.cache = get_default_cache() if cache is None else cache
+        self.scorer = scorer or TIER2_SCORER
+        self.hedge_budget = TIER2_HEDGE_BUDGET if hedge_budget is None else hedge_budget
+
     def analyze(self, anchor_data, free_text):
         """
-        アンケート結果と自由記述をAIに送り、Tier 2構造データを取得する
+        アンケート結果はローカルで、自由記述の Big Five 採点だけを AI で処理し、
+        Tier 2構造データ（layer_6 / layer_7）を返す
         """
-        # APIキーがない場合はモック（ダミーデータ）を返す（エラー回避用）
-        if not self.api_key:
-            return self._get_mock_data()
+        motivation = self.motivation(anchor_data)
+        # APIキーがない場合は語彙表でローカル採点する（ネットワーク不要）
+        if not self.api_key or self.scorer == "lexicon":
+            return self._local(free_text, motivation, "lexicon" if self.api_key else "no_key")
+
+        payload, cache_key = self._prepare(free_text)
+        scores = self._cache_get(cache_key)
+        if scores is not None:
+            return self._merge(scores, motivation)
+
+        if self.scorer == "hedged":
+            future = _get_hedge_pool().submit(contextvars.copy_context().run, self._llm_scores, payload, cache_key)
+            try:
+                return self._merge(future.result(timeout=self.hedge_budget), motivation)
+            except FutureTimeout:
+                return self._local(free_text, motivation, "hedge_timeout")
+            except Exception:
+                return self._local(free_text, motivation, "hedge_error")
 
         try:
-            client = OpenAI(api_key=self.api_key)
-            
-            # AIへの入力データ構築
-            user_input_json = json.dumps({
-                "ANCHOR_DATA": anchor_data,
-                "FREE_TEXT": free_text
-            }, ensure_ascii=False)
-
-            response = client.chat.completions.create(
-                model="gpt-4o", # または gpt-3.5-turbo
-                messages=[
-                    {"role": "system", "content": TIER2_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_input_json}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.2 # 決定論的にするため低めに設定
-            )
-            
-            result_json = response.choices[0].message.content
-            return json.loads(result_json)
-            
+            return self._merge(self._llm_scores(payload, cache_key), motivation)
+        except CircuitOpenError:
+            # 障害中は待たずにローカル採点で応答する
+            return self._local(free_text, motivation, "circuit_open")
         except Exception as e:
             return {"error": str(e)}
 
-    def _get_mock_data(self):
-        """APIキーがない場合のシミュレーションデータ"""
+    async def analyze_async(self, anchor_data, free_text):
+        """analyze() の asyncio 版（AsyncOpenAI を使う）"""
+        motivation = self.motivation(anchor_data)
+        if not self.api_key or self.scorer == "lexicon":
+            return self._local(free_text, motivation, "lexicon" if self.api_key else "no_key")
+
+        payload, cache_key = self._prepare(free_text)
+        scores = self._cache_get(cache_key)
+        if scores is not None:
+            return self._merge(scores, motivation)
+
+        if self.scorer == "hedged":
+            task = asyncio.ensure_future(self._llm_scores_async(payload, cache_key))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # 置き去りの失敗を握りつぶす
+            try:
+                return self._merge(await asyncio.wait_for(asyncio.shield(task), self.hedge_budget), motivation)
+            except asyncio.TimeoutError:
+                return self._local(free_text, motivation, "hedge_timeout")
+            except Exception:
+                return self._local(free_text, motivation, "hedge_error")
+
+        try:
+            return self._merge(await self._llm_scores_async(payload, cache_key), motivation)
+        except CircuitOpenError:
+            return self._local(free_text, motivation, "circuit_open")
+        except Exception as e:
+            return {"error": str(e)}
+
+    def motivation(self, anchor_data):
+        """layer_7_motivation だけを即時に計算する（LLM 不要）"""
+        return calculate_motivation(anchor_data)
+
+    # ---------------------------------------------------------
+    # Request / Cache helpers (sync & async で共通)
+    # ---------------------------------------------------------
+    def _prepare(self, free_text):
+        # LLM に渡すのは自由記述のみ（アンケートはローカル計算）
+        payload = {"FREE_TEXT": free_text}
+        return payload, make_key(TIER2_MODEL, TIER2_PROMPT_VERSION, TIER2_TEMPERATURE, payload)
+
+    def _request(self, payload):
+        return {
+            "model": TIER2_MODEL,
+            "messages": [
+                {"role": "system", "content": TIER2_SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": TIER2_TEMPERATURE
+        }
+
+    def _llm_scores(self, payload, cache_key):
+        response = chat_completion(self.api_key, operation="tier2", **self._request(payload))
+        return self._finish(cache_key, response)
+
+    async def _llm_scores_async(self, payload, cache_key):
+        response = await chat_completion_async(self.api_key, operation="tier2", **self._request(payload))
+        return self._finish(cache_key, response)
+
+    def _local(self, free_text, motivation, reason):
+        """語彙表による採点（score_source で LLM の結果と区別できる）"""
+        metrics.REGISTRY.inc("solalendar_tier2_local_scores_total", (("reason", reason),),
+                             help_text="Tier 2 readings scored by the local lexicon")
+        with metrics.span("tier2.lexicon"):
+            result = self._merge(score_text(free_text), motivation)
+        result["score_source"] = "lexicon"
+        return result
+
+    def _cache_get(self, cache_key):
+        if not self.cache:
+            return None
+        value = self.cache.get(cache_key)
+        metrics.record_cache("tier2", value is not None)
+        return value
+
+    def _finish(self, cache_key, response):
+        scores = parse_big_five(response.choices[0].message.content)
+        if self.cache:
+            self.cache.put(cache_key, scores)
+        return scores
+
+    def _merge(self, scores, motivation):
         return {
-            "layer_6_behavior": {
-                "big_five_scores": {"openness": 50, "conscientiousness": 50, "extraversion": 50, "agreeableness": 50, "neuroticism": 50},
-                "dominant_element": "Mutable (Mock)",
-                "element_reasoning": "No API Key provided. Running in simulation mode."
-            },
-            "layer_7_motivation": {
-                "resource_score": 0,
-                "resource_level": "Unknown",
-                "ryoshiki_filter_active": False,
-                "vals_type": "Unknown",
-                "diagnosis": "Please enter OpenAI API Key to activate the engine."
-            }
-        }
\ No newline at end of file
+            "layer_6_behavior": build_behavior(scores),
+            "layer_7_motivation": motivation
+        }
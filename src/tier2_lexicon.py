@@ -0,0 +1,110 @@
+import math
+import re
+import unicodedata
+
+# ---------------------------------------------------------
+# Offline Big Five Scorer (Tier 2 fast path)
+#   自由記述（日本語）を同梱の語彙表で数ミリ秒以内に採点する。決定論的でネットワーク不要。
+#   - 文字 n-gram の最長一致で語彙を拾う（形態素解析器は使わない）
+#   - 直後の否定（ない / ません / なかった / ではない ...）で符号を反転
+#   - 感情語（ポジ / ネガ）と記号（! … ?）も特徴量にする
+#   - 特性ごとの合計を tanh で 0-100 に写す（50 = 中立、空・情報なしは全て 50）
+#   LLM の採点とは尺度が完全には一致しない。目安・ヘッジ用。
+# ---------------------------------------------------------
+BIG_FIVE_KEYS = ("openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism")
+
+# term -> {trait: weight}
+LEXICON = {}
+
+
+def _add(trait, weight, terms):
+    for term in terms.split():
+        LEXICON.setdefault(term, {})[trait] = weight
+
+
+_add("openness", 1.0, "新しい 挑戦 興味 好奇心 アイデア 発想 創作 芸術 音楽 読書 映画 美術館 旅行 旅 "
+                      "学び 学ぶ 勉強 哲学 想像 不思議 面白い 面白かった 発見 海外 異文化 表現 デザイン 研究 初めて")
+_add("openness", -1.0, "いつも通り 変わらない 退屈 つまらない 興味がない 面倒 慣れた 同じこと 無難")
+_add("conscientiousness", 1.0, "計画 予定 目標 締め切り 整理 準備 努力 継続 毎日 習慣 責任 完了 達成 "
+                               "確認 丁寧 頑張 管理 記録 早起き 片付け 間に合った やり遂げ")
+_add("conscientiousness", -1.0, "遅刻 忘れ サボ 先延ばし 後回し 適当 だらだら 寝坊 散らか 間に合わ 三日坊主 ギリギリ")
+_add("extraversion", 1.0, "友達 友人 仲間 みんな 飲み会 パーティー 会った 話した 遊び イベント 盛り上 "
+                          "ライブ 出かけ 誘 初対面 賑やか 笑 おしゃべり 大勢")
+_add("extraversion", -1.0, "一人 ひとり 家で 静か 引きこもり 人混み 人見知り 誰とも 話すのが苦手 一人の時間")
+_add("agreeableness", 1.0, "ありがとう 感謝 助け 手伝 優しい 思いやり 協力 支え 共感 相手の気持ち 家族 "
+                           "喜んで 許し 親切 譲 励ま")
+_add("agreeableness", -1.0, "腹が立 ムカつ 嫌い 文句 批判 喧嘩 対立 許せない 馬鹿 うざ 見下 言い返 責め")
+_add("neuroticism", 1.0, "不安 心配 怖い 落ち込 悲しい 辛い つらい 疲れ ストレス イライラ 焦 緊張 後悔 "
+                         "憂鬱 眠れない 悩 孤独 泣 最悪 自信がない 自己嫌悪 モヤモヤ")
+_add("neuroticism", -1.0, "安心 落ち着 穏やか リラックス 平気 大丈夫 前向き 満足 幸せ 自信がある 冷静")
+
+# 感情語（特性語と重なってもよい）: ポジ -> E+ / N-、ネガ -> N+
+SENTIMENT = {}
+for _term in "嬉しい 楽しい 楽しかった 良かった 最高 好き ワクワク 充実 気持ちいい 元気".split():
+    SENTIMENT[_term] = {"extraversion": 0.5, "neuroticism": -0.5}
+for _term in "嫌 悲しい 辛い 最悪 疲れ 不安 しんどい 虚しい 寂しい がっかり".split():
+    SENTIMENT[_term] = {"neuroticism": 0.5, "extraversion": -0.25}
+
+NEGATIONS = ("ない", "なく", "なかっ", "ません", "ありません", "ず")
+# 否定の後に続いてよいひらがな（漢字・カタカナ・記号・文末はどれでも可）。
+# 「好きないちご」「好きなくせに」「好きなかっこう」の「な」は連体形、「ずっと」「ずつ」は副詞なので否定にしない
+_NEGATION_FOLLOW = {"ない": "でだすよねしかけのとんらまわぞじがも", "なく": "てなもし", "なかっ": "た", "ず": "にとじも"}
+# 語の直後に、間を空けずに: 助詞（では / じゃ / で / は）か未然形の送り仮名 1 文字（焦らない・悩まない。
+# 「が」は「不安がない」の助詞も兼ねる）、続けて否定。「予定のはずだ」のように間に別の字があれば否定ではない
+_NEGATION = re.compile(
+    "(?:では|じゃ|で|は|[かがさざただばまらわ])?(?:"
+    + "|".join(re.escape(neg) + (f"(?=[^ぁ-ゖ]|[{_NEGATION_FOLLOW[neg]}]|$)"
+                                 if neg in _NEGATION_FOLLOW else "") for neg in NEGATIONS)
+    + ")"
+)
+SYMBOLS = {"!": {"extraversion": 0.3}, "?": {"openness": 0.2}, "…": {"neuroticism": 0.2}}
+SCALE = 4.0           # raw = SCALE で約 +38 点（tanh(1) * 50）
+
+_TERMS = {}
+for _table in (LEXICON, SENTIMENT):
+    for _term, _weights in _table.items():
+        merged = _TERMS.setdefault(_term, {})
+        for _trait, _w in _weights.items():
+            merged[_trait] = merged.get(_trait, 0.0) + _w
+_LENGTHS = sorted({len(t) for t in _TERMS}, reverse=True)
+
+
+def _normalize(text):
+    return unicodedata.normalize("NFKC", text or "").replace("...", "…")
+
+
+def features(text):
+    """特性ごとの raw 値と一致した語（デバッグ用）"""
+    text = _normalize(text)
+    raw = dict.fromkeys(BIG_FIVE_KEYS, 0.0)
+    hits = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in SYMBOLS:
+            for trait, w in SYMBOLS[ch].items():
+                raw[trait] += w
+            i += 1
+            continue
+        # 最長一致（長い語を優先し、一致した範囲は読み飛ばす）
+        for length in _LENGTHS:
+            term = text[i:i + length]
+            weights = _TERMS.get(term)
+            if weights is not None and len(term) == length:
+                sign = -1.0 if _NEGATION.match(text, i + length) else 1.0
+                for trait, w in weights.items():
+                    raw[trait] += sign * w
+                hits.append((term, sign))
+                i += length
+                break
+        else:
+            i += 1
+    return raw, hits
+
+
+def score_text(text):
+    """自由記述 -> {"openness": 0-100, ...}（parse_big_five と同じ形）"""
+    raw, _ = features(text)
+    # 長文ほど語が増えるので、長さの平方根で割って密度に近づける
+    length_norm = math.sqrt(max(len(text or "") / 200.0, 1.0))
+    return {k: int(round(50 + 50 * math.tanh(raw[k] / length_norm / SCALE))) for k in BIG_FIVE_KEYS}
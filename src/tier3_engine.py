@@ -1,48 +1,35 @@
 import json
-from openai import OpenAI
+import metrics
+from llm_cache import get_default_cache, make_key
+from json_stream import PartialJSONParser
+from llm_client import CircuitOpenError, chat_completion, chat_completion_async, chat_completion_stream
+from tier3_gap import analyze_gap, narrative_from_bank
 
 # ---------------------------------------------------------
-# SYSTEM PROMPT v3.0 (The Sage)
+# SYSTEM PROMPT v4.0 (The Sage / narrative only)
 # ---------------------------------------------------------
+TIER3_PROMPT_VERSION = "v4.0"  # プロンプトを変えたら上げる（キャッシュキーに含まれる）
+TIER3_MODEL = "gpt-4o"
+TIER3_TEMPERATURE = 0.7  # 少し創造性を高める
+
 TIER3_SYSTEM_PROMPT = """
 # Role Definition
 You are the "Tier 3 Integration Engine" for Solalendar.
-Your mission is to compare the user's "Tier 1 (Nature/Astrology)" and "Tier 2 (Nurture/Psychometrics)" to detect structural conflicts or harmonies.
-You must act as a wise "System Administrator of Fate," explaining the user's internal dynamics.
+You act as a wise "System Administrator of Fate," explaining the user's internal dynamics.
+The gap between Tier 1 (Nature/Astrology) and Tier 2 (Nurture/Psychometrics) has already been computed; write the message only.
 
 # Input Data Schema
-1. [TIER1_NATURE]:
-   - Sun Sign (The Core)
-   - Ascendant (The Interface)
-   - Dominant Element (Fire/Earth/Air/Water)
-2. [TIER2_CURRENT]:
-   - Big Five Dominant Element (Behavioral Strategy)
-   - VALS Type (Motivation)
-   - Resource Level
-
-# Analysis Logic (The Gap Theory)
-Compare the "Tier 1 Element" vs "Tier 2 Element".
-
-1. **Conflict (e.g., Water vs Fire, Air vs Earth)**
-   - Diagnosis: "Structural Stress". The user is suppressing their nature to adapt to society.
-   - Advice: Suggest ways to release the suppressed element safely.
-
-2. **Complement (e.g., Fire vs Air, Earth vs Water)**
-   - Diagnosis: "Evolutionary Growth". The user is successfully using tools (Tier 2) to enhance their core (Tier 1).
-   - Advice: Encourage this synergy.
-
-3. **Identity (e.g., Fire vs Fire)**
-   - Diagnosis: "Pure Resonance". The user is living exactly as designed.
-   - Advice: Focus on maximizing output, as there is no internal friction.
+- GAP: tier1_element, tier1_distribution, tier2_element, relationship_type, stress_level
+- VALS: vals_type (Motivation)
+
+# Tone by relationship_type
+- Conflict: "Structural Stress". The user suppresses their nature to adapt to society. Suggest a safe release of the suppressed element.
+- Complement: "Evolutionary Growth". Tier 2 tools enhance the Tier 1 core. Encourage the synergy.
+- Identity: "Pure Resonance". No internal friction. Focus on maximizing output.
+- Undetermined: "Still Taking Shape". Tier 2 shows no clear element (Mutable). Do not name a Tier 2 element; describe an open, undecided state and how to let the Tier 1 core lead.
 
 # Output Format (JSON Only)
 {
-  "gap_analysis": {
-    "tier1_element": "String",
-    "tier2_element": "String",
-    "relationship_type": "Conflict / Complement / Identity",
-    "stress_level": "High / Moderate / Low"
-  },
   "wisdom_message": {
     "headline": "A short, poetic title for their current state (e.g., 'The Dried Ocean')",
     "narrative": "A deep, insightful paragraph explaining WHY they feel the way they do based on the element gap. (approx 200 chars in Japanese)",
@@ -52,49 +39,146 @@ Compare the "Tier 1 Element" vs "Tier 2 Element".
 """
 
 class SolalendarTier3:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None, narrative="llm"):
         self.api_key = api_key
-        
+        # cache=None: プロセス共通キャッシュ / cache=False: キャッシュしない
+        self.cache = get_default_cache() if cache is None else cache
+        # "llm": 文章を LLM で生成 / "bank": 定型文バンクを使い LLM を呼ばない
+        self.narrative = narrative
+
     def integrate(self, tier1_data, tier2_data):
-        if not self.api_key:
-            return self._get_mock_data()
+        try:
+            gap, vals_type = self._analyze(tier1_data, tier2_data)
+            if self.narrative == "bank":
+                return self._merge(gap, narrative_from_bank(gap, vals_type))
+            if not self.api_key:
+                return self._get_mock_data(gap)
+
+            input_summary, cache_key = self._prepare(gap, vals_type)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return self._merge(gap, cached)
+
+            response = chat_completion(self.api_key, operation="tier3", **self._request(input_summary))
+            return self._merge(gap, self._finish(cache_key, response))
+        except CircuitOpenError:
+            # 障害中は待たずにシミュレーションデータで応答する
+            return self._get_mock_data(gap)
+        except Exception as e:
+            return {"error": str(e)}
 
+    async def integrate_async(self, tier1_data, tier2_data):
+        """integrate() の asyncio 版（AsyncOpenAI を使う）"""
         try:
-            client = OpenAI(api_key=self.api_key)
-            
-            # 必要なデータだけを抽出して軽量化
-            input_summary = {
-                "TIER1_NATURE": {
-                    "sun_sign": tier1_data['layer_3_env']['sun_sign'],
-                    "ascendant": tier1_data['layer_5_skin']['ascendant']
-                },
-                "TIER2_CURRENT": {
-                    "big5_element": tier2_data['layer_6_behavior']['dominant_element'],
-                    "vals_type": tier2_data['layer_7_motivation']['vals_type']
-                }
-            }
+            gap, vals_type = self._analyze(tier1_data, tier2_data)
+            if self.narrative == "bank":
+                return self._merge(gap, narrative_from_bank(gap, vals_type))
+            if not self.api_key:
+                return self._get_mock_data(gap)
 
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": TIER3_SYSTEM_PROMPT},
-                    {"role": "user", "content": json.dumps(input_summary, ensure_ascii=False)}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7 # 少し創造性を高める
-            )
-            
-            return json.loads(response.choices[0].message.content)
-            
+            input_summary, cache_key = self._prepare(gap, vals_type)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return self._merge(gap, cached)
+
+            response = await chat_completion_async(self.api_key, operation="tier3", **self._request(input_summary))
+            return self._merge(gap, self._finish(cache_key, response))
+        except CircuitOpenError:
+            return self._get_mock_data(gap)
         except Exception as e:
             return {"error": str(e)}
 
-    def _get_mock_data(self):
+    def integrate_stream(self, tier1_data, tier2_data):
+        """
+        integrate() のストリーミング版。
+        Yields (partial_result, open_key): gap_analysis comes first (local), then the
+        wisdom_message fields as tokens arrive; open_key is the string field still being
+        written. The last item is the complete result. Cache hits / bank / mock / errors
+        yield a single final item.
+        """
+        try:
+            gap, vals_type = self._analyze(tier1_data, tier2_data)
+            if self.narrative == "bank":
+                yield self._merge(gap, narrative_from_bank(gap, vals_type)), None
+                return
+            if not self.api_key:
+                yield self._get_mock_data(gap), None
+                return
+
+            input_summary, cache_key = self._prepare(gap, vals_type)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                yield self._merge(gap, cached), None
+                return
+
+            # gap は即時に出せる
+            yield self._merge(gap, {}), None
+
+            stream = chat_completion_stream(self.api_key, operation="tier3",
+                                            stream_options={"include_usage": True}, **self._request(input_summary))
+            parser = PartialJSONParser()
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    partial, open_key = parser.feed(delta)
+                    yield self._merge(gap, partial.get("wisdom_message") or {}), open_key
+
+            message = parser.result()["wisdom_message"]
+            if self.cache:
+                self.cache.put(cache_key, message)
+            yield self._merge(gap, message), None
+        except CircuitOpenError:
+            yield self._get_mock_data(gap), None
+        except Exception as e:
+            yield {"error": str(e)}, None
+
+    # ---------------------------------------------------------
+    # Request / Cache helpers (sync & async で共通)
+    # ---------------------------------------------------------
+    def _analyze(self, tier1_data, tier2_data):
+        gap = analyze_gap(tier1_data, tier2_data)
+        return gap, tier2_data['layer_7_motivation']['vals_type']
+
+    def _prepare(self, gap, vals_type):
+        # LLM には計算済みの gap と VALS だけを渡す
+        input_summary = {"GAP": gap, "VALS": {"vals_type": vals_type}}
+        return input_summary, make_key(TIER3_MODEL, TIER3_PROMPT_VERSION, TIER3_TEMPERATURE, input_summary)
+
+    def _request(self, input_summary):
+        return {
+            "model": TIER3_MODEL,
+            "messages": [
+                {"role": "system", "content": TIER3_SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps(input_summary, ensure_ascii=False)}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": TIER3_TEMPERATURE
+        }
+
+    def _cache_get(self, cache_key):
+        if not self.cache:
+            return None
+        value = self.cache.get(cache_key)
+        metrics.record_cache("tier3", value is not None)
+        return value
+
+    def _finish(self, cache_key, response):
+        message = json.loads(response.choices[0].message.content)["wisdom_message"]
+        if self.cache:
+            self.cache.put(cache_key, message)
+        return message
+
+    def _merge(self, gap, message):
+        return {"gap_analysis": gap, "wisdom_message": message}
+
+    def _get_mock_data(self, gap=None):
         return {
-            "gap_analysis": {"relationship_type": "Simulation", "stress_level": "Unknown"},
+            "gap_analysis": gap or {"relationship_type": "Simulation", "stress_level": "Unknown"},
             "wisdom_message": {
                 "headline": "System Integration Ready",
                 "narrative": "Tier 1とTier 2のデータが揃いました。APIキーを入力すると、これらを統合して『あなただけの処方箋』を生成します。",
                 "actionable_advice": "Enter API Key to unlock Wisdom."
             }
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,135 @@
+# ---------------------------------------------------------
+# Tier 3 Gap Engine (local, deterministic)
+#   Tier 1 の星座からエレメント分布を求め、Tier 2 のエレメントと
+#   関係マトリクスで突き合わせる。LLM は文章生成だけに使う。
+# ---------------------------------------------------------
+ELEMENTS = ("Fire", "Earth", "Air", "Water")
+
+# kerykeion 略称 / フルネームの両方を受け付ける
+SIGN_ELEMENT = {}
+SIGN_FULL_NAME = {}
+for _i, (_abbr, _full) in enumerate(zip(
+    ("Ari", "Tau", "Gem", "Can", "Leo", "Vir", "Lib", "Sco", "Sag", "Cap", "Aqu", "Pis"),
+    ("Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo", "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"),
+)):
+    SIGN_ELEMENT[_abbr] = SIGN_ELEMENT[_full] = ELEMENTS[_i % 4]
+    SIGN_FULL_NAME[_abbr] = SIGN_FULL_NAME[_full] = _full
+
+# (Tier 1, Tier 2) -> (relationship_type, stress_level)
+#   Conflict  : 正反対の性質（火×水, 風×土）は High、隣接する不調和（火×土, 風×水）は Moderate
+#   Complement: 火×風, 土×水
+#   Identity  : 同じエレメント
+#   Undetermined: Tier 2 が Mutable（下の MUTABLE_RELATIONSHIP）
+_PAIRS = {
+    frozenset(("Fire", "Water")): ("Conflict", "High"),
+    frozenset(("Air", "Earth")): ("Conflict", "High"),
+    frozenset(("Fire", "Earth")): ("Conflict", "Moderate"),
+    frozenset(("Air", "Water")): ("Conflict", "Moderate"),
+    frozenset(("Fire", "Air")): ("Complement", "Low"),
+    frozenset(("Earth", "Water")): ("Complement", "Low"),
+}
+RELATIONSHIP_MATRIX = {
+    (a, b): ("Identity", "Low") if a == b else _PAIRS[frozenset((a, b))]
+    for a in ELEMENTS for b in ELEMENTS
+}
+# Tier 2 が Mutable（特性に山がない）の場合はエレメント同士の関係が決まらないので、
+# Complement / Conflict のどちらにも寄せず Undetermined とし、ストレスは中間の Moderate にする。
+# 相手も Mutable の場合（グループ相性）も同じ。
+MUTABLE_RELATIONSHIP = ("Undetermined", "Moderate")
+
+
+def tier1_elements(tier1_data):
+    """
+    Sun / Moon / Ascendant のエレメント分布と支配エレメント。
+    同数の場合は Sun のエレメントを優先。
+    """
+    signs = {
+        "sun": tier1_data["layer_3_env"]["sun_sign"],
+        "moon": tier1_data["layer_4_runtime"].get("moon_sign"),
+        "ascendant": tier1_data["layer_5_skin"]["ascendant"],
+    }
+    distribution = {e: 0 for e in ELEMENTS}
+    for sign in signs.values():
+        if sign in SIGN_ELEMENT:
+            distribution[SIGN_ELEMENT[sign]] += 1
+
+    sun_element = SIGN_ELEMENT.get(signs["sun"])
+    top = max(distribution.values())
+    leaders = [e for e in ELEMENTS if distribution[e] == top]
+    dominant = sun_element if sun_element in leaders else leaders[0]
+    return dominant, distribution
+
+
+def normalize_element(value):
+    """'Mutable (Mock)' / 'fire' などを Fire/Earth/Air/Water/Mutable に揃える"""
+    word = (value or "").split(" ")[0].capitalize()
+    return word if word in ELEMENTS else "Mutable"
+
+
+def analyze_gap(tier1_data, tier2_data):
+    """gap_analysis を即時に返す（LLM 不要）"""
+    t1_element, distribution = tier1_elements(tier1_data)
+    t2_element = normalize_element(tier2_data["layer_6_behavior"]["dominant_element"])
+    if t2_element == "Mutable":
+        relationship, stress = MUTABLE_RELATIONSHIP
+    else:
+        relationship, stress = RELATIONSHIP_MATRIX[(t1_element, t2_element)]
+    return {
+        "tier1_element": t1_element,
+        "tier1_distribution": distribution,
+        "tier2_element": t2_element,
+        "relationship_type": relationship,
+        "stress_level": stress
+    }
+
+
+# ---------------------------------------------------------
+# Narrative Bank (relationship × VALS type)
+#   LLM を使わない場合の定型文。関係ごとの核となる文と VALS ごとの文を合成する。
+# ---------------------------------------------------------
+_RELATIONSHIP_TEXT = {
+    "Conflict": {
+        "headline": "The {t1} Under {t2}",
+        "narrative": "本来の{t1}の性質を、いまは{t2}の振る舞いで覆い隠して社会に適応しています。その摩擦が、理由のわからない疲れや違和感として表れています。",
+        "advice": "週に一度、{t1}の性質をそのまま出せる時間を意図的に確保してください。",
+    },
+    "Complement": {
+        "headline": "The {t1} Fed by {t2}",
+        "narrative": "本来の{t1}の核を、{t2}の戦略がうまく補っています。先天と後天が互いを押し上げる、成長の途中にいる状態です。",
+        "advice": "いまの{t2}的な習慣を、{t1}の目的に結びつけて続けてください。",
+    },
+    "Undetermined": {
+        "headline": "The {t1} Still Taking Shape",
+        "narrative": "本来の{t1}の性質に対して、いまの振る舞いにはまだはっきりした傾向が出ていません。どの方向にも動ける、形を決める前の状態です。",
+        "advice": "{t1}の性質が自然に出る場面を一つ選び、そこでの振る舞いを意識的に繰り返してください。",
+    },
+    "Identity": {
+        "headline": "Pure {t1} Resonance",
+        "narrative": "設計図どおりの{t1}の性質で生きており、内側の摩擦がほとんどありません。迷いが少ないぶん、出力を最大化できる時期です。",
+        "advice": "摩擦がないうちに、最も大きな目標へ力を集中させてください。",
+    },
+}
+
+_VALS_TEXT = {
+    "Innovator": ("資源に恵まれたイノベーターとして、変化を自ら起こす余力があります。", "その上で、新しい試みを一つ今月中に始めてください。"),
+    "Thinker": ("理想を重んじる思索家として、納得できる理由を求めています。", "その上で、考えを一枚の紙に書き出して判断の軸を言語化してください。"),
+    "Achiever": ("達成を原動力に、目に見える成果で自分を確かめています。", "その上で、成果ではなく過程を評価する指標を一つ持ってください。"),
+    "Experiencer": ("自己表現を求める体験者として、刺激と新しさに惹かれています。", "その上で、体験を記録して何に心が動いたかを振り返ってください。"),
+    "Believer": ("信念を守る人として、慣れ親しんだ価値観を安全基地にしています。", "その上で、信じる価値観の中で小さな変化を一つ許してください。"),
+    "Striver": ("承認を求める努力家として、周囲の評価に敏感になっています。", "その上で、他人の評価と切り離した自分だけの目標を一つ決めてください。"),
+    "Maker": ("実践を好む作り手として、手を動かすことで自分を確かめています。", "その上で、頭の中の構想を小さな形あるものにしてください。"),
+    "Survivor": ("いまは資源が限られ、安全と必要を守ることに力を使っています。", "その上で、休息と回復を最優先の予定として確保してください。"),
+}
+_VALS_DEFAULT = ("", "")
+
+
+def narrative_from_bank(gap, vals_type):
+    """relationship × VALS の定型文から wisdom_message を作る"""
+    base = _RELATIONSHIP_TEXT[gap["relationship_type"]]
+    vals_narrative, vals_advice = _VALS_TEXT.get(vals_type, _VALS_DEFAULT)
+    fmt = {"t1": gap["tier1_element"], "t2": gap["tier2_element"]}
+    return {
+        "headline": base["headline"].format(**fmt),
+        "narrative": base["narrative"].format(**fmt) + vals_narrative,
+        "actionable_advice": (base["advice"].format(**fmt) + vals_advice).strip(),
+    }
@@ -0,0 +1,222 @@
+import argparse
+import json
+import time
+import numpy as np
+from reading_results import ELEMENT_CODES, RELATIONSHIP_CODES, STRESS_CODES, VALS_CODES
+from tier2_engine import VALS_TREE
+from tier3_gap import ELEMENTS, MUTABLE_RELATIONSHIP, RELATIONSHIP_MATRIX, SIGN_ELEMENT, normalize_element
+
+# ---------------------------------------------------------
+# Group Compatibility (Tier 3, many-to-many)
+#   各プロフィールを小さな整数ベクトルにする:
+#     Tier 1 の支配エレメント (Sun / Moon / Asc の分布、同数なら Sun 優先) と分布 4 要素、
+#     Tier 2 の dominant_element、VALS タイプ
+#   同じベクトルの人は相性も同じなので、ユニークな型どうしの表 (U x U) を一度作り、
+#   N x N はその表の gather で求める。top-k は行ブロックごとに argpartition。
+#   python tier3_group.py --bench 10000
+# ---------------------------------------------------------
+MUTABLE = ELEMENT_CODES.index("Mutable")
+UNKNOWN_VALS = VALS_CODES.index("Unknown")
+
+# 相性スコア (0-100) の重み: 先天どうし / 後天どうし / エレメント分布の重なり / VALS
+WEIGHTS = {"nature": 0.35, "behavior": 0.25, "overlap": 0.20, "vals": 0.20}
+
+
+def _relationship_tables():
+    """(element, element) -> relationship / stress のコード表（Mutable を含む 5 x 5）"""
+    rel = np.zeros((len(ELEMENT_CODES), len(ELEMENT_CODES)), dtype=np.int8)
+    stress = np.zeros_like(rel)
+    for a, name_a in enumerate(ELEMENT_CODES):
+        for b, name_b in enumerate(ELEMENT_CODES):
+            if MUTABLE in (a, b):
+                relationship, level = MUTABLE_RELATIONSHIP
+            else:
+                relationship, level = RELATIONSHIP_MATRIX[(name_a, name_b)]
+            rel[a, b] = RELATIONSHIP_CODES.index(relationship)
+            stress[a, b] = STRESS_CODES.index(level)
+    return rel, stress
+
+
+def _vals_table():
+    """VALS 同士の近さ (0-1): 資源レベルが同じで 0.5、原動力が同じで 0.5"""
+    profile = {vals: (level, driver) for level, drivers in VALS_TREE.items() for driver, vals in drivers.items()}
+    profile["Innovator"] = ("High", None)
+    profile["Survivor"] = ("Low", None)
+    table = np.zeros((len(VALS_CODES), len(VALS_CODES)), dtype=np.float32)
+    for a, name_a in enumerate(VALS_CODES):
+        for b, name_b in enumerate(VALS_CODES):
+            if name_a in profile and name_b in profile:
+                (level_a, driver_a), (level_b, driver_b) = profile[name_a], profile[name_b]
+                table[a, b] = 0.5 * (level_a == level_b) + 0.5 * (driver_a is not None and driver_a == driver_b)
+    return table
+
+
+REL_TABLE, STRESS_TABLE = _relationship_tables()
+VALS_TABLE = _vals_table()
+_SIGN_CODE = {sign: ELEMENTS.index(element) for sign, element in SIGN_ELEMENT.items()}
+
+
+# ---------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------
+def encode_profiles(profiles):
+    """
+    profiles: iterable of (tier1_data, tier2_data) — SolalendarTier1.analyze() / SolalendarTier2.analyze() の出力
+    Returns {"signs": N x 3 int8 (sun, moon, asc のエレメント, 不明 -1), "tier2": int8, "vals": int8}
+    """
+    signs, tier2, vals = [], [], []
+    for tier1_data, tier2_data in profiles:
+        signs.append((
+            _SIGN_CODE.get(tier1_data["layer_3_env"]["sun_sign"], -1),
+            _SIGN_CODE.get(tier1_data["layer_4_runtime"].get("moon_sign"), -1),
+            _SIGN_CODE.get(tier1_data["layer_5_skin"]["ascendant"], -1),
+        ))
+        tier2.append(ELEMENT_CODES.index(normalize_element(tier2_data["layer_6_behavior"]["dominant_element"])))
+        vals_type = tier2_data["layer_7_motivation"].get("vals_type")
+        vals.append(VALS_CODES.index(vals_type) if vals_type in VALS_CODES else UNKNOWN_VALS)
+    return {
+        "signs": np.asarray(signs, dtype=np.int8).reshape(-1, 3),
+        "tier2": np.asarray(tier2, dtype=np.int8),
+        "vals": np.asarray(vals, dtype=np.int8),
+    }
+
+
+def tier1_columns(signs):
+    """signs (N x 3) -> (支配エレメント N, 分布 N x 4)。tier3_gap.tier1_elements と同じ規則"""
+    distribution = np.stack([(signs == e).sum(axis=1) for e in range(len(ELEMENTS))], axis=1).astype(np.int8)
+    leaders = distribution == distribution.max(axis=1, keepdims=True)
+    sun = signs[:, 0]
+    sun_leads = (sun >= 0) & leaders[np.arange(len(sun)), np.maximum(sun, 0)]
+    dominant = np.where(sun_leads, sun, leaders.argmax(axis=1)).astype(np.int8)
+    return dominant, distribution
+
+
+class GroupCompatibility:
+    """
+    N 人の相性（関係・ストレス・スコア）を計算する。
+    ids: 任意の表示用 ID（省略時は 0..N-1）
+    """
+
+    def __init__(self, encoded, ids=None):
+        self.tier1, self.distribution = tier1_columns(encoded["signs"])
+        self.tier2 = encoded["tier2"]
+        self.vals = encoded["vals"]
+        self.n = len(self.tier2)
+        self.ids = list(ids) if ids is not None else list(range(self.n))
+
+        # 同じ (tier1, tier2, vals, 分布) の人は同じ型
+        keys = np.column_stack([self.tier1, self.tier2, self.vals, self.distribution])
+        types, self.type_of = np.unique(keys, axis=0, return_inverse=True)
+        self.type_of = self.type_of.reshape(-1).astype(np.int32)
+        self._build_type_tables(types)
+
+    @classmethod
+    def from_results(cls, profiles, ids=None):
+        return cls(encode_profiles(profiles), ids)
+
+    def _build_type_tables(self, types):
+        t1, t2, vals, dist = types[:, 0], types[:, 1], types[:, 2], types[:, 3:].astype(np.int16)
+        nature = STRESS_TABLE[t1[:, None], t1[None, :]]
+        behavior = STRESS_TABLE[t2[:, None], t2[None, :]]
+        overlap = np.minimum(dist[:, None, :], dist[None, :, :]).sum(axis=2) / 3.0
+        score = 100 * (
+            WEIGHTS["nature"] * (1 - nature / 2.0)
+            + WEIGHTS["behavior"] * (1 - behavior / 2.0)
+            + WEIGHTS["overlap"] * overlap
+            + WEIGHTS["vals"] * VALS_TABLE[vals[:, None], vals[None, :]]
+        )
+        self.type_relationship = REL_TABLE[t1[:, None], t1[None, :]]
+        self.type_stress = np.maximum(nature, behavior)
+        self.type_score = score.astype(np.float32)
+
+    # ---------------------------------------------------------
+    # Matrices
+    # ---------------------------------------------------------
+    def matrices(self, rows=None):
+        """
+        rows (slice / index array, 省略時は全員) x N の
+        {"relationship": int8 (RELATIONSHIP_CODES), "stress": int8 (STRESS_CODES), "score": float32 0-100}
+        relationship は先天（Tier 1）どうし、stress は先天・後天の組のうち高い方。
+        """
+        row_types = self.type_of[rows if rows is not None else slice(None)]
+        grid = np.ix_(row_types, self.type_of)
+        return {
+            "relationship": self.type_relationship[grid],
+            "stress": self.type_stress[grid],
+            "score": self.type_score[grid],
+        }
+
+    def top_k(self, k=5, block=2048):
+        """
+        各人の相性上位 k 人（本人を除く）。Returns (indices N x k int32, scores N x k float32)、スコア降順。
+        同点の並びは不定。
+        """
+        k = min(k, self.n - 1)
+        indices = np.empty((self.n, max(k, 0)), dtype=np.int32)
+        scores = np.empty((self.n, max(k, 0)), dtype=np.float32)
+        if k <= 0:
+            return indices, scores
+        for start in range(0, self.n, block):
+            stop = min(start + block, self.n)
+            score = self.type_score[np.ix_(self.type_of[start:stop], self.type_of)]
+            score[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # 本人を除く
+            top = np.argpartition(-score, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(score, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            indices[start:stop] = np.take_along_axis(top, order, axis=1)
+            scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+        return indices, scores
+
+    # ---------------------------------------------------------
+    # Readable output
+    # ---------------------------------------------------------
+    def pair(self, i, j):
+        """2 人の相性を名前付きの dict で"""
+        a, b = self.type_of[i], self.type_of[j]
+        return {
+            "a": self.ids[i],
+            "b": self.ids[j],
+            "a_elements": {"tier1": ELEMENT_CODES[self.tier1[i]], "tier2": ELEMENT_CODES[self.tier2[i]]},
+            "b_elements": {"tier1": ELEMENT_CODES[self.tier1[j]], "tier2": ELEMENT_CODES[self.tier2[j]]},
+            "relationship_type": RELATIONSHIP_CODES[self.type_relationship[a, b]],
+            "stress_level": STRESS_CODES[self.type_stress[a, b]],
+            "score": round(float(self.type_score[a, b]), 1),
+        }
+
+    def matches(self, k=5):
+        """{id: [pair(...), ...]}（top_k を名前付きにしたもの）"""
+        indices, _ = self.top_k(k)
+        return {self.ids[i]: [self.pair(i, int(j)) for j in row] for i, row in enumerate(indices)}
+
+
+# ---------------------------------------------------------
+# Bench
+# ---------------------------------------------------------
+def synthetic(n, seed=0):
+    """ランダムな符号化済みプロフィール（計測用）"""
+    rng = np.random.default_rng(seed)
+    return {
+        "signs": rng.integers(0, len(ELEMENTS), (n, 3)).astype(np.int8),
+        "tier2": rng.integers(0, len(ELEMENT_CODES), n).astype(np.int8),
+        "vals": rng.integers(0, len(VALS_CODES), n).astype(np.int8),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Group compatibility benchmark (synthetic profiles)")
+    parser.add_argument("--bench", type=int, default=10000, help="Number of profiles")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    encoded = synthetic(args.bench)
+    start = time.perf_counter()
+    group = GroupCompatibility(encoded)
+    built = time.perf_counter()
+    group.top_k(args.k)
+    done = time.perf_counter()
+    print(json.dumps({"profiles": args.bench, "types": int(group.type_score.shape[0]),
+                      "build_ms": (built - start) * 1000, "top_k_ms": (done - built) * 1000}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
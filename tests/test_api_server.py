@@ -0,0 +1,126 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import uuid
+
+import pytest
+
+pytest.importorskip("openai")
+
+import api_server
+import llm_cache
+from llm_stub_server import serve_in_background as serve_stub
+
+ANCHOR = {"curiosity_score": 4, "confidence_score": 3, "action_score": 4, "social_norm_flag": True, "primary_driver": "Achievement"}
+
+
+@pytest.fixture
+def api():
+    server, url = api_server.serve_in_background(api_key="", tier1_workers=1, store=None)
+    yield server, url
+    server.shutdown()
+    server.service.close()
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    """ローカルのスタブ LLM に向けた API（キーはテストごとに変えて別クライアントにする）"""
+    # ディスクのキャッシュが効くとスタブまで届かないので、テスト中はメモリだけの空キャッシュにする
+    monkeypatch.setattr(llm_cache, "_DEFAULT_CACHE", llm_cache.LLMResponseCache(None))
+
+    def _start(latency=0.0, **service_kwargs):
+        stub, base_url = serve_stub(latency=latency)
+        monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+        server, url = api_server.serve_in_background(api_key=f"test-{uuid.uuid4().hex}", tier1_workers=1,
+                                                     store=None, **service_kwargs)
+        started.append((stub, server))
+        return stub.RequestHandlerClass.state, url
+    started = []
+    yield _start
+    for stub, server in started:
+        server.shutdown()
+        server.service.close()
+        stub.shutdown()
+
+
+def _post(url, body):
+    req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _post_concurrently(url, bodies):
+    results = [None] * len(bodies)
+
+    def _one(i):
+        results[i] = _post(url, bodies[i])
+    threads = [threading.Thread(target=_one, args=(i,)) for i in range(len(bodies))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_bad_request_is_400(api):
+    _, url = api
+    status, body = _post(url + "/v1/tier2", {"anchor": {}})
+    assert status == 400
+    assert "missing" in body["error"]
+
+
+@pytest.mark.parametrize("path, item", [("/v1/tier2/batch", "text"), ("/v1/tier2/batch", [1]), ("/v1/tier3/batch", "text")])
+def test_non_object_batch_item_is_400(api, path, item):
+    _, url = api
+    status, body = _post(url + path, {"items": [item]})
+    assert status == 400
+    assert body["error"] == "item must be an object"
+
+
+def test_unexpected_engine_error_is_500(api):
+    server, url = api
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("cache broken")
+    server.service.tier2_many = broken
+
+    status, body = _post(url + "/v1/tier2", {"anchor": {}})
+    assert status == 500
+    assert body == {"error": "Internal error: RuntimeError"}
+
+
+def test_tier2_and_tier3_against_the_stub(stub_api):
+    state, url = stub_api()
+    status, tier2 = _post(url + "/v1/tier2", {"anchor": ANCHOR, "free_text": f"stub run {uuid.uuid4().hex}"})
+    assert status == 200
+    assert "error" not in tier2["result"] and tier2["result"].get("score_source") != "lexicon"
+    assert state.stats["completions"] == 1
+
+    status, tier1 = _post(url + "/v1/tier1", {"record": {"year": 1990, "month": 5, "day": 3, "hour": 4, "minute": 5}})
+    assert status == 200
+    status, tier3 = _post(url + "/v1/tier3", {"tier1": tier1["result"], "tier2": tier2["result"]})
+    assert status == 200
+    assert tier3["result"]["wisdom_message"]["headline"]
+    assert state.stats["completions"] == 2
+
+
+def test_identical_inflight_requests_share_one_engine_call(stub_api):
+    state, url = stub_api(latency=0.5)
+    body = {"anchor": ANCHOR, "free_text": f"coalesce {uuid.uuid4().hex}"}
+    results = _post_concurrently(url + "/v1/tier2", [body] * 8)
+    assert [status for status, _ in results] == [200] * 8
+    assert all(r == results[0][1] for _, r in results)
+    assert state.stats["completions"] == 1
+
+
+def test_full_lane_answers_429(stub_api):
+    state, url = stub_api(latency=0.5, max_pending=1)
+    bodies = [{"anchor": ANCHOR, "free_text": f"distinct {i} {uuid.uuid4().hex}"} for i in range(4)]
+    statuses = sorted(status for status, _ in _post_concurrently(url + "/v1/tier2", bodies))
+    assert statuses[0] == 200
+    assert 429 in statuses
+    assert state.stats["completions"] == statuses.count(200)
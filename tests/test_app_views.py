@@ -0,0 +1,17 @@
+from app_views import wisdom_card_html
+
+
+def test_wisdom_card_escapes_llm_text():
+    card = wisdom_card_html({
+        "headline": "<script>alert(1)</script>",
+        "narrative": "a & <img src=x onerror=alert(1)>",
+        "actionable_advice": "<b>go</b>",
+    }, None)
+    assert "<script>" not in card and "<img" not in card and "<b>" not in card
+    assert "&lt;script&gt;" in card and "a &amp; &lt;img" in card and "&lt;b&gt;go" in card
+
+
+def test_wisdom_card_hides_an_unfinished_headline():
+    card = wisdom_card_html({"headline": "Half a hea"}, "headline")
+    assert "Half a hea" not in card
+    assert "wisdom-advice" not in card
@@ -0,0 +1,72 @@
+import pytest
+
+import llm_cache
+from llm_cache import LLMResponseCache, make_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.mark.parametrize("path", [None, "disk"])
+def test_entries_expire_after_ttl(clock, tmp_path, path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3") if path else None, ttl=60)
+    cache.put("k", {"v": 1})
+    clock.now += 60
+    assert cache.get("k") == {"v": 1}
+    clock.now += 1
+    assert cache.get("k") is None
+    assert cache.stats["misses"] == 1
+
+
+def test_expired_disk_rows_are_deleted_on_read(clock, tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    LLMResponseCache(path, ttl=60).put("k", {"v": 1})
+    clock.now += 61
+    cache = LLMResponseCache(path, ttl=60)  # メモリ層は空なのでディスクを引く
+    assert cache.get("k") is None
+    assert cache.stats["evictions"] == 1
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+
+def test_memory_tier_is_lru(clock):
+    cache = LLMResponseCache(None, max_memory_items=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a が新しくなるので b が先に追い出される
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats["evictions"] == 1
+
+
+def test_disk_tier_keeps_the_most_recently_accessed(clock, tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "cache.sqlite3"), max_memory_items=1, max_disk_items=50)
+    for i in range(100):  # 100 件目の put で件数チェックが走る
+        clock.now += 1
+        cache.put(f"k{i}", i)
+        if i == 80:
+            clock.now += 1
+            cache._memory.clear()
+            assert cache.get("k0") == 0  # ディスクから読むと accessed が更新される
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 50
+    cache._memory.clear()
+    assert cache.get("k0") == 0
+    assert cache.get("k1") is None and cache.get("k50") is None
+    assert cache.get("k51") == 51
+    assert cache.get("k99") == 99
+
+
+def test_keys_ignore_width_and_whitespace_differences():
+    assert make_key("m", "v1", 0.2, {"text": "ＡＢＣ  です\n"}) == make_key("m", "v1", 0.2, {"text": "ABC です"})
+    assert make_key("m", "v1", 0.2, {"text": "ABC"}) != make_key("m", "v2", 0.2, {"text": "ABC"})
@@ -0,0 +1,163 @@
+import asyncio
+import gc
+import threading
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("openai")
+
+import llm_client
+import llm_scheduler
+import metrics
+
+
+def test_async_clients_are_per_loop_and_closed_by_run_async():
+    async def _use():
+        client = llm_client.get_async_client("test-key")
+        assert llm_client.get_async_client("test-key") is client
+        return client
+
+    clients = [llm_client.run_async(_use()) for _ in range(5)]
+    assert len({id(c) for c in clients}) == 5
+    assert all(c.is_closed() for c in clients)
+    assert len(llm_client._async_clients) == 0
+
+
+def test_async_clients_do_not_outlive_their_loop():
+    async def _use():
+        llm_client.get_async_client("test-key")
+
+    for _ in range(5):
+        asyncio.run(_use())
+    gc.collect()
+    assert len(llm_client._async_clients) == 0
+
+
+@pytest.fixture
+def stub_key(monkeypatch):
+    from llm_stub_server import serve_in_background
+    server, url = serve_in_background()
+    monkeypatch.setenv("OPENAI_BASE_URL", url)
+    yield f"test-{uuid.uuid4().hex}", server.RequestHandlerClass.state
+    server.shutdown()
+
+
+def _request():
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "stream_options": {"include_usage": True}}
+
+
+def test_stream_holds_the_scheduler_ticket_until_consumed(stub_key):
+    api_key, _ = stub_key
+    scheduler = llm_scheduler.get_scheduler()
+    running = scheduler.running
+    stream = llm_client.chat_completion_stream(api_key, operation="test", **_request())
+    next(stream)
+    assert scheduler.running == running + 1
+    chunks = list(stream)
+    assert chunks[-1].usage.total_tokens > 0
+    assert scheduler.running == running
+
+
+def test_stream_failure_after_first_chunk_counts_against_the_breaker(monkeypatch):
+    import openai
+    api_key = f"test-{uuid.uuid4().hex}"
+
+    class BrokenStream:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def __iter__(self):
+            yield "first chunk"
+            raise openai.APIConnectionError(request=None)
+
+    class Client:
+        class chat:
+            class completions:
+                create = staticmethod(lambda **kwargs: BrokenStream())
+    monkeypatch.setitem(llm_client._clients, api_key, Client())
+    errors = ("solalendar_llm_requests_total", (("operation", "broken"), ("outcome", "error")))
+    calls = metrics.REGISTRY.counters.get(errors, 0)
+
+    stream = llm_client.chat_completion_stream(api_key, operation="broken", **_request())
+    assert next(stream) == "first chunk"
+    with pytest.raises(openai.APIConnectionError):
+        next(stream)
+    assert llm_client.get_breaker(api_key).failures == 1
+    assert metrics.REGISTRY.counters[errors] == calls + 1
+
+
+def test_breaker_state_transitions():
+    breaker = llm_client.CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow() and not breaker.allow()  # 試しは 1 件だけ
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0 and breaker.allow() and breaker.allow()
+
+
+def test_half_open_lets_exactly_one_concurrent_caller_through():
+    breaker = llm_client.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    barrier = threading.Barrier(16)
+    allowed = []
+
+    def _call():
+        barrier.wait()
+        allowed.append(breaker.allow())
+    threads = [threading.Thread(target=_call) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert allowed.count(True) == 1
+
+
+def test_5xx_is_retried_then_opens_the_breaker(stub_key, monkeypatch):
+    import openai
+    api_key, state = stub_key
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt, error=None: 0)
+    monkeypatch.setitem(llm_client._breakers, api_key, llm_client.CircuitBreaker(failure_threshold=1, reset_timeout=0.1))
+    request = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+
+    state.error_rate = 1.0
+    with pytest.raises(openai.InternalServerError):
+        llm_client.chat_completion(api_key, operation="test", **request)
+    assert state.stats["completions"] == llm_client.MAX_RETRIES + 1
+    assert llm_client.get_breaker(api_key).state == "open"
+
+    with pytest.raises(llm_client.CircuitOpenError):
+        llm_client.chat_completion(api_key, operation="test", **request)
+    assert state.stats["completions"] == llm_client.MAX_RETRIES + 1  # 開いている間はスタブまで届かない
+
+    state.error_rate = 0.0
+    time.sleep(0.11)
+    assert llm_client.chat_completion(api_key, operation="test", **request).choices
+    assert llm_client.get_breaker(api_key).state == "closed"
+
+
+def test_transient_errors_are_retried_until_success(stub_key, monkeypatch):
+    api_key, state = stub_key
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt, error=None: 0)
+    state.error_rate = 0.5
+    state.rng.seed(10)  # この seed では 2 回失敗してから成功する
+
+    response = llm_client.chat_completion(api_key, operation="test", model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}])
+    assert response.choices
+    assert (state.stats["completions"], state.stats["errors"]) == (3, 2)
+    assert llm_client.get_breaker(api_key).failures == 0
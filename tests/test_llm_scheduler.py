@@ -0,0 +1,33 @@
+import threading
+
+import pytest
+
+from llm_scheduler import LLMScheduler
+
+
+class Abort(BaseException):
+    """Streamlit の RerunException / StopException の代わり"""
+
+
+def test_aborted_waiter_does_not_leak_a_slot():
+    scheduler = LLMScheduler(concurrency=1)
+    first = scheduler.acquire(10)
+
+    def on_queue(status):
+        raise Abort()
+
+    with pytest.raises(Abort):
+        scheduler.acquire(10, on_queue=on_queue)
+    assert scheduler.status()["queued"] == 0
+
+    scheduler.release(first)
+    assert scheduler.running == 0
+
+    granted = []
+    thread = threading.Thread(target=lambda: granted.append(scheduler.acquire(10)))
+    thread.start()
+    thread.join(3)
+    assert granted, "acquire was not granted after the aborted waiter"
+    scheduler.release(granted[0])
+    assert scheduler.running == 0
+
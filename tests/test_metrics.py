@@ -0,0 +1,40 @@
+from metrics import LATENCY_BUCKETS, Registry, render_prometheus
+
+
+def _samples(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+
+def test_histogram_buckets_are_cumulative_and_upper_inclusive():
+    registry = Registry()
+    for value in (0.001, 0.0011, 0.05, 100.0):  # 0.001 と 0.05 はちょうど境界
+        registry.observe("latency_seconds", value, (("op", "x"),), "Latency")
+    samples = _samples(render_prometheus(registry))
+
+    assert samples['latency_seconds_bucket{op="x",le="0.0005"}'] == "0"
+    assert samples['latency_seconds_bucket{op="x",le="0.001"}'] == "1"
+    assert samples['latency_seconds_bucket{op="x",le="0.005"}'] == "2"
+    assert samples['latency_seconds_bucket{op="x",le="0.05"}'] == "3"
+    assert samples['latency_seconds_bucket{op="x",le="30"}'] == "3"
+    assert samples['latency_seconds_bucket{op="x",le="+Inf"}'] == "4"
+    assert samples['latency_seconds_count{op="x"}'] == "4"
+    assert float(samples['latency_seconds_sum{op="x"}']) == 100.0521
+    assert sum(key.startswith("latency_seconds_bucket") for key in samples) == len(LATENCY_BUCKETS) + 1
+
+
+def test_counters_headers_and_label_escaping():
+    registry = Registry()
+    registry.inc("requests_total", (("outcome", "ok"), ("operation", "tier2")), help_text="Requests")
+    registry.inc("requests_total", (("operation", "tier2"), ("outcome", "ok")), 2)
+    registry.inc("requests_total", (("operation", 'say "hi"\\'), ("outcome", "error")))
+    text = render_prometheus(registry)
+
+    assert text.count("# HELP requests_total Requests\n# TYPE requests_total counter\n") == 1
+    samples = _samples(text)
+    assert samples['requests_total{operation="tier2",outcome="ok"}'] == "3"  # ラベルの順序に依らず同じ系列
+    assert samples['requests_total{operation="say \\"hi\\"\\\\",outcome="error"}'] == "1"
+    assert text.endswith("\n")
+
+
+def test_empty_registry_renders_a_newline():
+    assert render_prometheus(Registry()) == "\n"
@@ -0,0 +1,77 @@
+import io
+import random
+
+import pytest
+
+pytest.importorskip("swisseph")
+pytest.importorskip("numpy")
+
+from reading_results import (ELEMENT_CODES, Tier1Result, Tier2Result, Tier3Result, read_stream, to_columns,
+                             write_stream)
+from tier1_engine import SolalendarTier1
+from tier2_engine import SolalendarTier2
+from tier3_engine import SolalendarTier3
+
+TEXTS = ("", "友達と飲み会！楽しかった", "締め切りを忘れて不安ではない", "一人で美術館へ。新しい発見があった…")
+DRIVERS = ("Ideals", "Achievement", "Self-Expression")
+
+
+@pytest.fixture(scope="module")
+def readings():
+    rng = random.Random(3)
+    tier2 = SolalendarTier2("")
+    out = []
+    for i in range(12):
+        tier1 = SolalendarTier1("p", rng.randint(1901, 2099), rng.randint(1, 12), rng.randint(1, 28),
+                                rng.randint(0, 23), rng.randint(0, 59)).analyze()
+        anchor = {"curiosity_score": rng.randint(1, 5), "confidence_score": rng.randint(1, 5),
+                  "action_score": rng.randint(1, 5), "social_norm_flag": rng.random() < 0.5,
+                  "primary_driver": DRIVERS[i % 3]}
+        t2 = tier2.analyze(anchor, TEXTS[i % len(TEXTS)])
+        narrative = "bank" if i % 2 else "llm"  # llm はキー無しなのでモック文面（extra 経由）
+        t3 = SolalendarTier3("", narrative=narrative).integrate(tier1, t2)
+        out.append((tier1, t2, t3))
+    return out
+
+
+@pytest.mark.parametrize("tier, cls", [(0, Tier1Result), (1, Tier2Result), (2, Tier3Result)])
+def test_dict_and_binary_round_trip(readings, tier, cls):
+    for reading in readings:
+        d = reading[tier]
+        obj = cls.from_dict(d)
+        assert obj.to_dict() == d
+        assert cls.decode(obj.encode()).to_dict() == d
+
+
+def test_real_tier1_output_needs_no_extra(readings):
+    """analyze() の出力はすべてコード化できる（extra が付くと 1 件が数百バイトの JSON に戻る）"""
+    for tier1, _, _ in readings:
+        obj = Tier1Result.from_dict(tier1)
+        assert obj.extra is None
+        assert len(obj.encode()) <= Tier1Result._STRUCT.size + 4
+
+
+def test_slots_have_no_instance_dict(readings):
+    obj = Tier1Result.from_dict(readings[0][0])
+    assert not hasattr(obj, "__dict__")
+
+
+def test_stream_round_trip(readings):
+    objs = [cls.from_dict(r[i]) for r in readings for i, cls in enumerate((Tier1Result, Tier2Result, Tier3Result))]
+    buf = io.BytesIO()
+    assert write_stream(buf, objs) == len(objs)
+    buf.seek(0)
+    back = list(read_stream(buf))
+    assert [type(o) for o in back] == [type(o) for o in objs]
+    assert [o.to_dict() for o in back] == [o.to_dict() for o in objs]
+
+
+def test_columns(readings):
+    cols = to_columns([Tier3Result.from_dict(r[2]) for r in readings])
+    assert cols["distribution"].shape == (len(readings), 4)
+    assert [ELEMENT_CODES[c] for c in cols["tier1_element"]] == [r[2]["gap_analysis"]["tier1_element"] for r in readings]
+
+
+def test_error_results_are_rejected():
+    with pytest.raises(ValueError):
+        Tier2Result.from_dict({"error": "boom"})
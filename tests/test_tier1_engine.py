@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("swisseph")
+
+from tier1_engine import SolalendarTier1
+
+
+@pytest.fixture
+def engine():
+    engine = SolalendarTier1("a", 1990, 5, 3, 4, 5)
+    first = engine.analyze()
+    assert set(engine.recomputed) == {"lpn", "infra", "planets", "runtime"}
+    return engine, first
+
+
+def test_second_analyze_recomputes_nothing(engine):
+    engine, first = engine
+    assert engine.analyze() == first
+    assert engine.recomputed == []
+
+
+def test_new_year_recomputes_only_infra(engine):
+    engine, first = engine
+    result = engine.refresh(engine.current_year + 1)
+    assert engine.recomputed == ["infra"]
+    assert {k: v for k, v in result.items() if k != "layer_2_infra"} == {k: v for k, v in first.items() if k != "layer_2_infra"}
+
+
+def test_name_change_recomputes_nothing(engine):
+    engine, first = engine
+    engine.name = "b"
+    assert engine.analyze() == first
+    assert engine.recomputed == []
+
+
+def test_birth_time_change_recomputes_only_the_chart(engine):
+    engine, first = engine
+    engine.hour = 16
+    engine.analyze()
+    assert sorted(engine.recomputed) == ["jdn", "planets", "utc_dt"]
+    assert engine.jul_day_ut == pytest.approx(first["layer_0_kernel"]["jdn"] + 0.5)
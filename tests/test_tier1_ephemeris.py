@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+swe = pytest.importorskip("swisseph")
+
+from tier1_ephemeris import BODIES, EphemerisTable, build_tables, verify
+
+# 1990-01-01 .. 1992-01-01 UT（全期間のビルドは遅いので2年分だけ）
+JD_START, JD_END = 2447892.5, 2448622.5
+
+
+@pytest.fixture(scope="module")
+def table_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("ephemeris")
+    build_tables(str(path), bodies=["Sun", "Moon"], jd_start=JD_START, jd_end=JD_END)
+    return str(path)
+
+
+def test_matches_swisseph_within_tolerance(table_dir):
+    report = verify(table_dir, samples=2000)
+    assert set(report) == {"Sun", "Moon"}
+    for body, err in report.items():
+        assert err <= BODIES[body][2], body
+
+
+def test_scalar_and_vectorized_lookup_agree(table_dir):
+    table = EphemerisTable(table_dir)
+    jds = np.linspace(JD_START, JD_END - 1e-6, 97)
+    for body in ("Sun", "Moon"):
+        assert np.allclose([table.longitude(body, jd) for jd in jds], table.longitudes(body, jds), atol=1e-9)
+
+
+def test_unknown_body_and_out_of_range(table_dir):
+    table = EphemerisTable(table_dir)
+    with pytest.raises(ValueError, match="Mars"):
+        table.longitude("Mars", JD_START)
+    with pytest.raises(ValueError, match="Mars"):
+        table.longitudes("Mars", [JD_START])
+    with pytest.raises(ValueError, match="outside"):
+        table.longitude("Sun", JD_END)
+    assert not table.covers(JD_START, "Mars")
@@ -0,0 +1,70 @@
+import datetime
+import os
+
+import pytest
+
+lunar_python = pytest.importorskip("lunar_python")
+
+import tier1_lunar
+from tier1_lunar import DATE_END, DATE_START, LunarTable, build_table, verify
+
+
+@pytest.fixture(scope="module")
+def table_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("lunar")
+    build_table(str(path))
+    return str(path)
+
+
+def test_matches_lunar_python_on_month_boundaries(table_dir):
+    """各旧暦月（閏月を含む）の初日と最終日が lunar_python の月と一致する"""
+    table = LunarTable(table_dir)
+    start, end = DATE_START.toordinal(), DATE_END.toordinal()
+    checked, mismatches = 0, []
+    for year in range(DATE_START.year - 1, DATE_END.year + 1):
+        for month in lunar_python.LunarYear.fromYear(year).getMonths():
+            first = int(month.getFirstJulianDay()) - 1721425
+            for ordinal, day in ((first, 1), (first + month.getDayCount() - 1, month.getDayCount())):
+                if not start <= ordinal < end:
+                    continue
+                date = datetime.date.fromordinal(ordinal)
+                _, lunar_month, lunar_day = table.record(date.year, date.month, date.day)
+                checked += 1
+                if (lunar_month, lunar_day) != (month.getMonth(), day):
+                    mismatches.append(date)
+    assert checked > 2 * 12 * 200
+    assert mismatches == []
+
+
+def test_matches_lunar_python_on_dense_sample(table_dir):
+    report = verify(table_dir, step=31)
+    assert report["checked"] > 2000
+    assert report["mismatches"] == []
+
+
+@pytest.mark.slow
+def test_matches_lunar_python_every_day(table_dir):
+    report = verify(table_dir, step=1)
+    assert report["checked"] == DATE_END.toordinal() - DATE_START.toordinal()
+    assert report["mismatches"] == []
+
+
+def test_range_edges(table_dir):
+    table = LunarTable(table_dir)
+    assert table.covers(1900, 1, 1) and table.covers(2100, 12, 31)
+    assert not table.covers(1899, 12, 31) and not table.covers(2101, 1, 1)
+    assert not table.covers(2001, 2, 29)
+    with pytest.raises(ValueError):
+        table.record(2101, 1, 1)
+    assert table.as_array().shape == (DATE_END.toordinal() - DATE_START.toordinal(), tier1_lunar.RECORD_SIZE)
+
+
+def test_build_leaves_no_temporary_files(table_dir):
+    assert sorted(os.listdir(table_dir)) == sorted(["meta.json", tier1_lunar.DATA_FILE])
+
+
+def test_runtime_layer_falls_back_to_lunar_python_without_a_table(table_dir, monkeypatch):
+    import tier1_engine
+    engine = tier1_engine.SolalendarTier1("a", 1990, 5, 3, 4, 5)
+    monkeypatch.setattr(tier1_engine, "get_lunar_table", lambda: None)
+    assert engine._get_runtime_layer() == LunarTable(table_dir).day_info(1990, 5, 3)
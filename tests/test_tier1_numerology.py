@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from tier1_numerology import life_path, pinnacles, reduce_number, reduce_single, verify
+
+
+def test_vectorized_and_scalar_match_the_legacy_loop():
+    report = verify(range(1890, 2111))
+    assert report["checked"] == 221 * 12 * 31
+    assert report["mismatches"] == 0
+
+
+@pytest.mark.slow
+def test_verify_full_range():
+    assert verify()["mismatches"] == 0
+
+
+def test_master_numbers_are_kept_only_by_reduce_number():
+    assert [reduce_number(n) for n in (11, 22, 33, 29, 1974)] == [11, 22, 33, 11, 3]
+    assert [reduce_single(n) for n in (11, 22, 33, 29)] == [2, 4, 6, 2]
+    assert life_path(1974, 11, 4) == reduce_number(1974 + 11 + 4)
+    pins, ends = pinnacles(1974, 11, 4)
+    assert len(pins) == 4 and ends[1] - ends[0] == ends[2] - ends[1] == 9
@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("swisseph")
+
+from tier1_engine import SolalendarTier1
+from tier1_store import PSCProfileStore, profile_key
+
+RECORD = {"name": "a", "year": 1990, "month": 5, "day": 3, "hour": 4, "minute": 5}
+
+
+@pytest.fixture(scope="module")
+def result():
+    return SolalendarTier1(**RECORD).analyze()
+
+
+def test_versions_do_not_wipe_each_other(tmp_path, result):
+    path = str(tmp_path / "profiles.sqlite3")
+    new = PSCProfileStore(path, version="new")
+    new.put(RECORD, result)
+    old = PSCProfileStore(path, version="old")  # ローリングデプロイ中の旧レプリカ
+    assert old.get(RECORD) is None
+    old.put(RECORD, {**result, "meta": {"version": "old"}})
+
+    reopened = PSCProfileStore(path, version="new")
+    assert reopened.versions() == {"new": 1, "old": 1}
+    assert reopened.get(RECORD)["meta"] == result["meta"]
+    assert old.get(RECORD)["meta"] == {"version": "old"}
+
+    assert reopened.purge() == 1
+    assert reopened.versions() == {"new": 1}
+
+
+def test_name_is_not_part_of_the_key():
+    assert profile_key(RECORD) == profile_key({**RECORD, "name": "b"})
+
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pytz")
+pytest.importorskip("swisseph")
+
+from tier1_chart import julian_day_ut
+from tier1_tz import julian_days_ut, local_to_utc, verify
+
+ZONES = ("Asia/Tokyo", "America/New_York", "Europe/London", "Australia/Lord_Howe", "Asia/Kathmandu", "America/Sao_Paulo")
+
+
+def test_matches_pytz_around_transitions():
+    report = verify(ZONES, samples=3000)
+    assert set(report) == set(ZONES)
+    assert all(r["checked"] > 0 and r["mismatches"] == 0 for r in report.values()), report
+
+
+@pytest.mark.slow
+def test_matches_pytz_for_all_common_zones():
+    assert all(r["mismatches"] == 0 for r in verify().values())
+
+
+def test_vectorized_julian_days_match_the_scalar_path():
+    rng = random.Random(0)
+    rows = [(rng.choice(ZONES), rng.randint(1900, 2100), rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23), rng.randint(0, 59))
+            for _ in range(2000)]
+    tz_strs, years, months, days, hours, minutes = zip(*rows)
+
+    expected = [julian_day_ut(local_to_utc(*row)) for row in rows]
+    np.testing.assert_allclose(julian_days_ut(list(tz_strs), years, months, days, hours, minutes), expected, rtol=0, atol=1e-8)
+
+    one_zone = [row for row in rows if row[0] == "Asia/Tokyo"]
+    np.testing.assert_allclose(julian_days_ut("Asia/Tokyo", *zip(*[row[1:] for row in one_zone])),
+                               [julian_day_ut(local_to_utc(*row)) for row in one_zone], rtol=0, atol=1e-8)
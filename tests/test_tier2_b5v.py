@@ -0,0 +1,65 @@
+import io
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tier2_b5v import FACTORS, SolalendarB5V
+
+NAN = math.nan
+# 列は O1 O2 C1 C2 E1 E2 A1 A2 N1 N2（item_ids の順）
+ROWS = [
+    [3, 3, 3, 3, 3, 3, 3, 3, 3, 3],
+    [5, 1, 1, 5, 4, 4, 5, NAN, NAN, NAN],
+    [1, 5, 5, 1, 2, 5, 1, 5, 5, 1],
+]
+# 手計算: 50 + 5 * Σ sign * (answer - 3)
+EXPECTED = [
+    [50, 50, 50, 50, 50],
+    [70, 30, 50, 60, 50],
+    [30, 70, 35, 30, 70],
+]
+
+
+@pytest.fixture
+def b5v():
+    return SolalendarB5V()
+
+
+def test_item_order(b5v):
+    assert b5v.item_ids == ("O1", "O2", "C1", "C2", "E1", "E2", "A1", "A2", "N1", "N2")
+
+
+def test_score_matrix_hand_computed(b5v):
+    assert b5v.score_matrix(ROWS).tolist() == EXPECTED
+
+
+def test_score_matrix_matches_calculate_bigfive(b5v):
+    for row in ROWS:
+        answers = {i: v for i, v in zip(b5v.item_ids, row) if not math.isnan(v)}
+        expected = b5v.calculate_bigfive(answers)
+        assert b5v.score_matrix([row])[0].tolist() == [expected[f] for f in FACTORS]
+
+
+def test_score_matrix_rejects_wrong_shape(b5v):
+    with pytest.raises(ValueError):
+        b5v.score_matrix([[3] * 9])
+
+
+def test_score_csv_by_header_and_chunks(b5v):
+    order = ["N2", "N1", "A2", "A1", "E2", "E1", "C2", "C1", "O2", "O1"]
+    lines = ["respondent,note," + ",".join(order)]
+    for n, row in enumerate(ROWS):
+        cells = dict(zip(b5v.item_ids, row))
+        lines.append(f"r{n},x," + ",".join("" if math.isnan(cells[i]) else str(int(cells[i])) for i in order))
+    chunks = list(b5v.score_csv(io.StringIO("\n".join(lines) + "\n"), id_column="respondent", chunksize=2))
+
+    assert [len(ids) for ids, _ in chunks] == [2, 1]
+    assert [i for ids, _ in chunks for i in ids] == ["r0", "r1", "r2"]
+    assert np.vstack([scores for _, scores in chunks]).tolist() == EXPECTED
+
+
+def test_score_csv_missing_columns(b5v):
+    with pytest.raises(ValueError, match="N2"):
+        list(b5v.score_csv(io.StringIO("O1,O2,C1,C2,E1,E2,A1,A2,N1\n3,3,3,3,3,3,3,3,3\n")))
@@ -0,0 +1,78 @@
+import pytest
+
+pytest.importorskip("openai")
+
+from llm_stub_server import serve_in_background
+from tier2_batch import OpenAIBatchTransport, Tier2BatchRunner
+
+ANCHOR = {"curiosity_score": 4, "confidence_score": 3, "action_score": 4, "social_norm_flag": True, "primary_driver": "Achievement"}
+
+
+class Crash(BaseException):
+    """プロセスが落ちた代わり"""
+
+
+@pytest.fixture
+def stub():
+    server, url = serve_in_background(batch_delay=0.02)
+    yield server.RequestHandlerClass.state, url
+    server.shutdown()
+
+
+def _records(tag):
+    return [{"id": i, "anchor_data": ANCHOR, "free_text": f"{tag} text {i}"} for i in range(5)]
+
+
+def _runner(transport, tmp_path):
+    return Tier2BatchRunner(transport, str(tmp_path / "run.state.json"), cache=False, poll_interval=0.02)
+
+
+def test_resume_after_crash_following_create_does_not_resubmit(stub, tmp_path):
+    state, url = stub
+
+    class DiesAfterCreate(OpenAIBatchTransport):
+        def create_batch(self, input_file_id, metadata=None):
+            super().create_batch(input_file_id, metadata)
+            raise Crash()
+
+    records = _records("after")
+    with pytest.raises(Crash):
+        _runner(DiesAfterCreate("k", base_url=url), tmp_path).run(records)
+    assert len(state.batches) == 1
+
+    results = _runner(OpenAIBatchTransport("k", base_url=url), tmp_path).run(records)
+    assert len(state.batches) == 1
+    assert all("error" not in r for r in results.values())
+
+
+def test_resume_after_crash_before_create_submits_once(stub, tmp_path):
+    state, url = stub
+
+    class DiesBeforeCreate(OpenAIBatchTransport):
+        def create_batch(self, input_file_id, metadata=None):
+            raise Crash()
+
+    records = _records("before")
+    with pytest.raises(Crash):
+        _runner(DiesBeforeCreate("k", base_url=url), tmp_path).run(records)
+    assert len(state.batches) == 0
+
+    results = _runner(OpenAIBatchTransport("k", base_url=url), tmp_path).run(records)
+    assert len(state.batches) == 1
+    assert all("error" not in r for r in results.values())
+
+
+def test_expired_batch_is_retried_on_rerun(stub, tmp_path):
+    state, url = stub
+
+    class Expires(OpenAIBatchTransport):
+        def get_batch(self, batch_id):
+            return {"status": "expired", "output_file_id": None, "error_file_id": None}
+
+    records = _records("expired")
+    results = _runner(Expires("k", base_url=url), tmp_path).run(records)
+    assert all("error" in r for r in results.values())
+
+    results = _runner(OpenAIBatchTransport("k", base_url=url), tmp_path).run(records)
+    assert len(state.batches) == 2
+    assert all("error" not in r for r in results.values())
@@ -0,0 +1,70 @@
+import pytest
+
+from tier2_lexicon import BIG_FIVE_KEYS, features, score_text
+
+
+def test_empty_text_is_neutral():
+    assert score_text("") == dict.fromkeys(BIG_FIVE_KEYS, 50)
+    assert score_text(None) == dict.fromkeys(BIG_FIVE_KEYS, 50)
+
+
+@pytest.mark.parametrize("text", [
+    "不安がずっと続いている",   # 「ずっと」は否定ではない
+    "心配でずっと眠れない",
+    "最近とても不安",
+])
+def test_anxious_text_raises_neuroticism(text):
+    assert score_text(text)["neuroticism"] > 50
+
+
+@pytest.mark.parametrize("text", [
+    "不安ではない",
+    "不安じゃない",
+    "不安はない",
+    "不安がない",
+    "不安ではありません",
+    "不安なく過ごせた",
+    "もう悩まない",
+])
+def test_negated_anxiety_lowers_neuroticism(text):
+    assert score_text(text)["neuroticism"] < 50
+
+
+@pytest.mark.parametrize("text, term", [
+    ("予定のはずだ", "予定"),       # 語と否定の間に別の字がある
+    ("好きないちご", "好き"),       # 連体形の「な」
+    ("好きなくせに", "好き"),
+    ("予定はずれだった", "予定"),
+])
+def test_look_alikes_are_not_negation(text, term):
+    _, hits = features(text)
+    assert hits[0] == (term, 1.0)
+
+
+@pytest.mark.parametrize("text, term", [
+    ("好きじゃない", "好き"),
+    ("予定はない", "予定"),
+    ("忘れないように", "忘れ"),
+    ("焦らずに進める", "焦"),
+])
+def test_negation_forms_flip_the_term(text, term):
+    _, hits = features(text)
+    assert hits[0] == (term, -1.0)
+
+
+def test_zutsu_is_not_negation():
+    _, hits = features("一つずつ整理する")
+    assert hits == [("整理", 1.0)]
+
+
+def test_longest_match_wins():
+    _, hits = features("一人の時間が好き")
+    assert hits[0] == ("一人の時間", 1.0)
+
+
+def test_scores_are_deterministic_and_bounded():
+    text = "友達と飲み会！楽しかった！でも締め切りを忘れて後悔…" * 20
+    scores = score_text(text)
+    assert scores == score_text(text)
+    assert all(0 <= v <= 100 for v in scores.values())
+    assert scores["extraversion"] > 50
@@ -0,0 +1,61 @@
+import pytest
+
+from reading_results import RELATIONSHIP_CODES
+from tier3_gap import ELEMENTS, MUTABLE_RELATIONSHIP, RELATIONSHIP_MATRIX, analyze_gap, narrative_from_bank, normalize_element
+
+
+def _tier1(sun, moon, asc):
+    return {"layer_3_env": {"sun_sign": sun}, "layer_4_runtime": {"moon_sign": moon}, "layer_5_skin": {"ascendant": asc}}
+
+
+def _tier2(element):
+    return {"layer_6_behavior": {"dominant_element": element}}
+
+
+@pytest.mark.parametrize("pair, expected", [
+    (("Fire", "Water"), ("Conflict", "High")),
+    (("Air", "Earth"), ("Conflict", "High")),
+    (("Fire", "Earth"), ("Conflict", "Moderate")),
+    (("Air", "Water"), ("Conflict", "Moderate")),
+    (("Fire", "Air"), ("Complement", "Low")),
+    (("Earth", "Water"), ("Complement", "Low")),
+])
+def test_element_matrix_is_symmetric(pair, expected):
+    a, b = pair
+    assert RELATIONSHIP_MATRIX[(a, b)] == RELATIONSHIP_MATRIX[(b, a)] == expected
+
+
+def test_element_matrix_covers_every_pair():
+    assert set(RELATIONSHIP_MATRIX) == {(a, b) for a in ELEMENTS for b in ELEMENTS}
+    assert all(RELATIONSHIP_MATRIX[(e, e)] == ("Identity", "Low") for e in ELEMENTS)
+    assert {rel for rel, _ in RELATIONSHIP_MATRIX.values()} | {MUTABLE_RELATIONSHIP[0]} == set(RELATIONSHIP_CODES)
+
+
+# Sun / Moon / Ascendant で支配エレメントがその要素になる組
+SIGNS_BY_ELEMENT = {
+    "Fire": ("Leo", "Aries", "Taurus"),
+    "Earth": ("Taurus", "Virgo", "Leo"),
+    "Air": ("Gemini", "Libra", "Leo"),
+    "Water": ("Cancer", "Pisces", "Leo"),
+}
+
+
+@pytest.mark.parametrize("element", ELEMENTS)
+def test_mutable_is_undetermined_not_complement(element):
+    gap = analyze_gap(_tier1(*SIGNS_BY_ELEMENT[element]), _tier2("Mutable (Mixed)"))
+    assert gap["tier1_element"] == element
+    assert (gap["tier2_element"], gap["relationship_type"], gap["stress_level"]) == ("Mutable", "Undetermined", "Moderate")
+
+    message = narrative_from_bank(gap, "Thinker")
+    assert "Mutable" not in message["headline"] + message["narrative"] + message["actionable_advice"]
+    assert element in message["headline"]
+
+
+def test_tier1_element_prefers_sun_on_ties():
+    gap = analyze_gap(_tier1("Cancer", "Aries", "Taurus"), _tier2("water"))
+    assert gap["tier1_distribution"] == {"Fire": 1, "Earth": 1, "Air": 0, "Water": 1}
+    assert (gap["tier1_element"], gap["relationship_type"]) == ("Water", "Identity")
+
+
+def test_normalize_element():
+    assert [normalize_element(v) for v in ("fire", "Mutable (Mock)", "", None, "Aether")] == ["Fire", "Mutable", "Mutable", "Mutable", "Mutable"]
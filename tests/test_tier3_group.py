@@ -0,0 +1,43 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from tier3_group import GroupCompatibility, synthetic
+
+
+@pytest.mark.parametrize("n, k, block", [(300, 5, 64), (50, 49, 7), (2, 3, 2048)])
+def test_top_k_matches_brute_force_sort(n, k, block):
+    group = GroupCompatibility(synthetic(n, seed=n))
+    indices, scores = group.top_k(k, block=block)
+
+    full = group.matrices()["score"].astype(np.float64)
+    np.fill_diagonal(full, -np.inf)
+    k = min(k, n - 1)
+    expected = -np.sort(-full, axis=1)[:, :k]
+
+    assert indices.shape == scores.shape == (n, k)
+    np.testing.assert_array_equal(scores, expected.astype(np.float32))
+    # 同点の並びは不定なので、選ばれた相手のスコアと重複・本人除外を確かめる
+    np.testing.assert_array_equal(np.take_along_axis(full, indices.astype(np.intp), axis=1), expected)
+    assert all(len(set(row)) == k and i not in row for i, row in enumerate(indices.tolist()))
+
+
+def test_single_profile_has_no_matches():
+    indices, scores = GroupCompatibility(synthetic(1)).top_k(5)
+    assert indices.shape == scores.shape == (1, 0)
+
+
+def test_pair_is_symmetric():
+    group = GroupCompatibility(synthetic(40, seed=1), ids=[f"p{i}" for i in range(40)])
+    for i, j in ((0, 1), (5, 30), (12, 39)):
+        ab, ba = group.pair(i, j), group.pair(j, i)
+        assert ab["score"] == ba["score"] and ab["stress_level"] == ba["stress_level"]
+        assert (ab["a"], ab["b"]) == (f"p{i}", f"p{j}")
+
+
+def test_mutable_pairs_are_undetermined():
+    from reading_results import ELEMENT_CODES, RELATIONSHIP_CODES, STRESS_CODES
+    from tier3_group import MUTABLE, REL_TABLE, STRESS_TABLE
+    for other in range(len(ELEMENT_CODES)):
+        assert RELATIONSHIP_CODES[REL_TABLE[MUTABLE, other]] == RELATIONSHIP_CODES[REL_TABLE[other, MUTABLE]] == "Undetermined"
+        assert STRESS_CODES[STRESS_TABLE[MUTABLE, other]] == "Moderate"